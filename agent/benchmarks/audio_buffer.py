@@ -0,0 +1,72 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per frame playout cost of the AudioRingBuffer against the previous bytearray
+buffer, for agent replies of increasing length delivered in one chunk.
+
+    python benchmarks/audio_buffer.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from av import AudioFrame
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from endpoints.audio_buffer import AudioRingBuffer
+
+SAMPLE_RATE = 24000
+FRAME = SAMPLE_RATE // 50
+
+def to_frame(audio_array):
+    return AudioFrame.from_ndarray(audio_array.reshape(1, -1), format="s16", layout="mono")
+
+def play_bytearray(reply):
+    buffer = bytearray(reply)
+    while len(buffer) >= FRAME * 2:
+        frame_data = buffer[:FRAME * 2]
+        buffer = buffer[FRAME * 2:]
+        to_frame(np.frombuffer(frame_data, dtype=np.int16))
+
+def play_ring(reply, ring):
+    ring.write(reply)
+    while len(ring):
+        to_frame(ring.read())
+
+def per_frame_us(fn, *args, frames):
+    start = time.perf_counter()
+    fn(*args)
+    return 1e6 * (time.perf_counter() - start) / frames
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, nargs="+", default=[1, 5, 15, 30, 60])
+    args = parser.parse_args()
+
+    ring = AudioRingBuffer(int(SAMPLE_RATE * max(args.seconds)), FRAME)
+    print(f"{'reply':>8} {'bytearray':>14} {'ring buffer':>14}")
+    for seconds in args.seconds:
+        reply = np.random.randint(-2000, 2000, int(SAMPLE_RATE * seconds), dtype=np.int16).tobytes()
+        frames = len(reply) // (FRAME * 2)
+        old = per_frame_us(play_bytearray, reply, frames=frames)
+        new = per_frame_us(play_ring, reply, ring, frames=frames)
+        print(f"{seconds:>7}s {old:>11.1f}us {new:>11.1f}us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Soak test of the bounded media pipeline against slow consumers. Each
+session streams microphone audio and camera frames into its live request
+queue, which a slow model connection drains, streams agent audio faster than
+real time into playout, and sends partial text to a Socket.IO client that
+reads slowly. Memory is reported as the test runs and should stay flat.
+
+    python benchmarks/backpressure_soak.py --sessions 10 --seconds 3600
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from google.genai.types import Blob
+from google.adk.agents.live_request_queue import LiveRequest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agent.emitter import MessageEmitter
+from agent.live_queue import BoundedLiveRequestQueue
+from endpoints.metrics import SessionMetrics
+from endpoints.webrtc_endpoint import AgentAudioTrack
+
+SAMPLE_RATE = 24000
+FRAME = 0.02
+
+class SlowClient:
+    """Socket.IO server stand-in whose client reads `rate` bytes per second"""
+
+    def __init__(self, sid, rate):
+        self.queue = asyncio.Queue()
+        self.rate = rate
+        self.manager = SimpleNamespace(eio_sid_from_sid=lambda sid, namespace: sid)
+        self.eio = SimpleNamespace(sockets={sid: self})
+
+    async def emit(self, event, data, room=None):
+        await self.queue.put(data)
+
+    async def read(self):
+        while True:
+            data = await self.queue.get()
+            await asyncio.sleep(len(data) / self.rate)
+
+async def microphone(queue):
+    chunk = bytes(int(SAMPLE_RATE * FRAME) * 2)
+    image = bytes(40000)
+    frames = 0
+    while True:
+        queue.send_realtime(Blob(data=chunk, mime_type="audio/pcm"))
+        if frames % 10 == 0:
+            queue.send_realtime(Blob(data=image, mime_type="image/jpeg"))
+        if frames % 100 == 99:
+            await queue.send_control(LiveRequest(audio_stream_end=True))
+        frames += 1
+        await asyncio.sleep(FRAME)
+
+async def model(queue, delay):
+    while True:
+        await queue.get()
+        await asyncio.sleep(delay)
+
+async def agent_reply(track, emitter, speed):
+    chunk = bytes(int(SAMPLE_RATE * 0.1) * 2)
+    while True:
+        await track.add_audio_data(chunk)
+        await emitter.send_text("partial text ")
+        await asyncio.sleep(0.1 / speed)
+
+async def speaker(track):
+    while True:
+        await track.recv()
+
+async def session(n, args, metrics):
+    queue = BoundedLiveRequestQueue(metrics=metrics)
+    track = AgentAudioTrack(metrics=metrics)
+    client = SlowClient(n, args.client_rate)
+    emitter = MessageEmitter(client, n, metrics=metrics)
+    await asyncio.gather(microphone(queue), model(queue, args.model_delay), agent_reply(track, emitter, args.reply_speed),
+                         speaker(track), client.read())
+
+def rss_mb():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+async def run(args):
+    metrics = SessionMetrics()
+    tracemalloc.start()
+    tasks = [asyncio.create_task(session(n, args, metrics)) for n in range(args.sessions)]
+
+    start = time.monotonic()
+    samples = []
+    while time.monotonic() - start < args.seconds:
+        await asyncio.sleep(args.report)
+        traced = tracemalloc.get_traced_memory()[0] / 2**20
+        samples.append(traced)
+        counters = metrics.counters
+        print(f"{time.monotonic() - start:7.0f}s traced={traced:7.2f}MB rss={rss_mb():7.1f}MB "
+              f"video_dropped={counters['live_video_dropped']} audio_dropped={counters['live_audio_dropped_bytes']}B "
+              f"deferred={counters['emits_deferred']} waits={counters['emit_waits']} "
+              f"text_dropped={counters['emit_text_dropped_bytes']}B", flush=True)
+
+    for task in tasks:
+        task.cancel()
+    # buffers fill up during the first half, memory should not grow in the second
+    half = len(samples) // 2
+    print(f"{args.sessions} sessions, peak traced memory {max(samples[:half] or samples):.2f}MB in the first half, "
+          f"{max(samples[half:]):.2f}MB in the second")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=60)
+    parser.add_argument("--report", type=float, default=10, help="seconds between memory reports")
+    parser.add_argument("--model-delay", type=float, default=0.25, help="seconds the model takes per request")
+    parser.add_argument("--client-rate", type=float, default=100, help="bytes per second the client reads")
+    parser.add_argument("--reply-speed", type=float, default=2, help="agent audio rate relative to real time")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Time to silence after the user interrupts the agent.
+
+Replays a scripted live event stream through GeminiAgent: a reply of PCM
+audio chunks delivered faster than real time, then an `interrupted` event
+part way through playout. The agent audio track is pulled like aiortc
+would, and the time from the interrupted event to the first silent frame
+is reported.
+
+    python benchmarks/barge_in.py --runs 20
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+import numpy as np
+import socketio
+from google.adk.events import Event
+from google.genai.types import Blob, Content, Part
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agent.agent import GeminiAgent
+from endpoints.media_executor import MediaExecutor
+from endpoints.webrtc_endpoint import AgentAudioTrack, WebRTCSession
+
+SAMPLE_RATE = 24000
+
+def audio_event(samples):
+    pcm = (np.sin(np.arange(samples) / 8) * 8000).astype(np.int16).tobytes()
+    blob = Blob(data=pcm, mime_type=f"audio/pcm;rate={SAMPLE_RATE}")
+    return Event(author="agent", partial=True, content=Content(role="model", parts=[Part(inline_data=blob)]))
+
+async def scripted_events(reply_seconds, chunk_seconds, interrupt_after, marks):
+    """Yield a reply's audio, then an interrupt while it is still playing"""
+    loop = asyncio.get_running_loop()
+    for _ in range(int(reply_seconds / chunk_seconds)):
+        yield audio_event(int(SAMPLE_RATE * chunk_seconds))
+        # the model streams faster than real time
+        await asyncio.sleep(chunk_seconds / 4)
+    await asyncio.sleep(interrupt_after)
+    marks["interrupted"] = loop.time()
+    yield Event(author="agent", interrupted=True)
+    # a live stream stays open until the session closes
+    await asyncio.Event().wait()
+
+async def speaker(track, marks, done):
+    """Pull frames like the RTP sender and note when silence starts"""
+    loop = asyncio.get_running_loop()
+    while not done.is_set():
+        frame = await track.recv()
+        if "interrupted" in marks and "silent" not in marks and not frame.to_ndarray().any():
+            marks["silent"] = loop.time()
+            done.set()
+
+async def run_once(executor, sio, args):
+    session = WebRTCSession("bench", executor, "audio")
+    session.agent_audio_track = AgentAudioTrack()
+    agent = GeminiAgent(sio, "bench", session, "audio")
+
+    marks = {}
+    done = asyncio.Event()
+    interrupt_after = random.uniform(0.2, args.reply_seconds / 2)
+    events = scripted_events(args.reply_seconds, args.chunk_seconds, interrupt_after, marks)
+    messaging = asyncio.create_task(agent.agent_to_client_messaging(events, "bench"))
+    await asyncio.wait_for(speaker(session.agent_audio_track, marks, done), timeout=args.reply_seconds + 5)
+    messaging.cancel()
+
+    stats = session.agent_audio_track.stats()
+    return marks["silent"] - marks["interrupted"], stats["time_to_silence_last_ms"] / 1000
+
+async def run(args):
+    executor = MediaExecutor(workers=1)
+    sio = socketio.AsyncServer(async_mode="aiohttp")
+    measured, reported = [], []
+    for _ in range(args.runs):
+        wall, metric = await run_once(executor, sio, args)
+        measured.append(1000 * wall)
+        reported.append(1000 * metric)
+    executor.shutdown()
+
+    print(f"{args.runs} interrupts, {args.reply_seconds}s replies")
+    for name, values in (("measured", measured), ("reported", reported)):
+        print(f"{name:9} time to silence p50={np.percentile(values, 50):6.1f}ms "
+              f"p95={np.percentile(values, 95):6.1f}ms max={max(values):6.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--reply-seconds", type=float, default=4)
+    parser.add_argument("--chunk-seconds", type=float, default=0.25)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
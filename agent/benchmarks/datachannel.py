@@ -0,0 +1,173 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Agent message latency and CPU per message over Socket.IO, with the
+coalescing MessageEmitter, against the RTCDataChannel with the
+DataChannelEmitter. Server and client of both run in this process over
+loopback, so CPU is for both ends.
+
+A scripted agent sends --messages text fragments at --rate a second, with
+a turn_complete every --turn fragments. Every fragment carries the time it
+was sent and the client measures the latency of each one. CPU is counted
+without that of the pacing loop, which is measured on its own first, but
+with the connection's keepalives and timers.
+
+    python benchmarks/datachannel.py --messages 2000 --rate 100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import socketio
+from aiohttp import web
+from aiortc import RTCPeerConnection
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agent.datachannel import LABEL, TEXT, DataChannelEmitter, decode_frame
+from agent.emitter import MessageEmitter
+
+MARKER = re.compile(r"<t=([0-9.]+)>")
+
+class Receiver:
+    """Collects the latency of every fragment the client gets"""
+
+    def __init__(self):
+        self.latencies = []
+        self.messages = 0
+        self.done = asyncio.Event()
+        self.expected = 0
+
+    def text(self, text):
+        now = time.perf_counter()
+        self.messages += 1
+        self.latencies.extend(now - float(t) for t in MARKER.findall(text))
+        if len(self.latencies) >= self.expected:
+            self.done.set()
+
+async def idle(args):
+    """CPU of the pacing loop alone, taken off every transport's CPU"""
+    cpu = time.process_time()
+    for n in range(args.messages):
+        f"<t={time.perf_counter():.6f}> word "
+        await asyncio.sleep(1 / args.rate)
+    return time.process_time() - cpu
+
+async def drive(emitter, receiver, args):
+    """Send fragments like the agent, return CPU seconds used"""
+    receiver.expected = args.messages
+    cpu = time.process_time()
+    for n in range(args.messages):
+        await emitter.send_text(f"<t={time.perf_counter():.6f}> word ")
+        if (n + 1) % args.turn == 0:
+            await emitter.send({"turn_complete": True, "interrupted": False})
+        await asyncio.sleep(1 / args.rate)
+    await emitter.flush()
+    await asyncio.wait_for(receiver.done.wait(), timeout=10)
+    return time.process_time() - cpu - args.idle_cpu
+
+async def run_socketio(args, window):
+    sio = socketio.AsyncServer(async_mode="aiohttp")
+    app = web.Application()
+    sio.attach(app)
+    connected = asyncio.get_running_loop().create_future()
+    sio.on("connect", lambda sid, environ: connected.set_result(sid))
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    receiver = Receiver()
+    client = socketio.AsyncClient()
+
+    @client.on("message")
+    def on_message(data):
+        message = json.loads(data)
+        if "data" in message:
+            receiver.text(message["data"])
+
+    await client.connect(f"http://127.0.0.1:{args.port}", transports=["websocket"])
+    sid = await connected
+    try:
+        emitter = MessageEmitter(sio, sid, window=window)
+        cpu = await drive(emitter, receiver, args)
+    finally:
+        await client.disconnect()
+        await runner.cleanup()
+    return cpu, receiver
+
+async def run_datachannel(args):
+    client, server = RTCPeerConnection(), RTCPeerConnection()
+    receiver = Receiver()
+    opened = asyncio.get_running_loop().create_future()
+
+    channel = client.createDataChannel(LABEL)
+
+    @channel.on("message")
+    def on_message(data):
+        kind, pts, text = decode_frame(data)
+        if kind == TEXT:
+            receiver.text(text)
+
+    @server.on("datachannel")
+    def on_datachannel(server_channel):
+        if server_channel.readyState == "open":
+            opened.set_result(server_channel)
+        else:
+            server_channel.on("open", lambda: opened.set_result(server_channel))
+
+    await client.setLocalDescription(await client.createOffer())
+    await server.setRemoteDescription(client.localDescription)
+    await server.setLocalDescription(await server.createAnswer())
+    await client.setRemoteDescription(server.localDescription)
+    server_channel = await asyncio.wait_for(opened, timeout=10)
+    try:
+        emitter = DataChannelEmitter(server_channel)
+        cpu = await drive(emitter, receiver, args)
+    finally:
+        await client.close()
+        await server.close()
+    return cpu, receiver
+
+def report(name, cpu, receiver, args):
+    ms = 1000 * np.array(receiver.latencies)
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    print(f"{name:>22} {p50:>7.2f} {p95:>7.2f} {p99:>7.2f}  {receiver.messages:>8} "
+          f"{1e6 * cpu / args.messages:>10.0f}us")
+
+async def main_async(args):
+    print(f"{args.messages} fragments at {args.rate}/s, turn_complete every {args.turn}")
+    args.idle_cpu = await idle(args)
+    print(f"{'transport':>22} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}  {'messages':>8} {'cpu/fragment':>11}")
+    report("socket.io, 30ms window", *await run_socketio(args, 0.03), args)
+    report("socket.io, no window", *await run_socketio(args, 0), args)
+    report("data channel", *await run_datachannel(args), args)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=100, help="fragments a second")
+    parser.add_argument("--turn", type=int, default=50, help="fragments per turn")
+    parser.add_argument("--port", type=int, default=8094)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
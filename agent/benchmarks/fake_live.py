@@ -0,0 +1,111 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Local stand-in for the live model, for benchmarks that run without network
+access or an API key. ScriptedLiveRunner answers run_live from a script
+instead of the Gemini Live API: after every `turn_seconds` of user audio it
+streams a reply of partial text and 24kHz PCM audio, faster than real time
+like the model does, then turn_complete. Some replies are interrupted.
+
+Every reply starts with a text marker "<t=...>" carrying the wall clock
+time it was produced, so clients can measure text and audio latency.
+"""
+
+import asyncio
+import random
+import time
+
+import numpy as np
+from google.adk.events import Event
+from google.adk.runners import InMemoryRunner
+from google.genai.types import Blob, Content, Part
+
+SAMPLE_RATE = 24000
+AUTHOR = "scripted_agent"
+
+def text_event(text):
+    return Event(author=AUTHOR, partial=True, content=Content(role="model", parts=[Part(text=text)]))
+
+def audio_event(pcm):
+    blob = Blob(data=pcm, mime_type=f"audio/pcm;rate={SAMPLE_RATE}")
+    return Event(author=AUTHOR, partial=True, content=Content(role="model", parts=[Part(inline_data=blob)]))
+
+class ScriptedLiveRunner(InMemoryRunner):
+    """InMemoryRunner whose run_live replays a scripted conversation"""
+
+    def __init__(self, agent, app_name, turn_seconds=3.0, reply_seconds=2.0, chunk_seconds=0.1,
+                 words_per_second=5, speed=4.0, interrupt_rate=0.1, seed=None):
+        super().__init__(agent=agent, app_name=app_name)
+        self.turn_seconds = turn_seconds
+        self.reply_seconds = reply_seconds
+        self.chunk_seconds = chunk_seconds
+        self.words_per_second = words_per_second
+        # how much faster than real time replies are produced
+        self.speed = speed
+        self.interrupt_rate = interrupt_rate
+        self.random = random.Random(seed)
+
+        samples = int(SAMPLE_RATE * chunk_seconds)
+        tone = np.sin(2 * np.pi * 220 * np.arange(samples) / SAMPLE_RATE) * 6000
+        self.chunk = tone.astype(np.int16).tobytes()
+
+    async def run_live(self, *, live_request_queue, session=None, run_config=None, **kwargs):
+        turns = asyncio.Queue()
+        reader = asyncio.create_task(self.read_requests(live_request_queue, turns))
+        try:
+            while True:
+                if await turns.get() is None:
+                    return
+                async for event in self.reply():
+                    yield event
+        finally:
+            reader.cancel()
+
+    async def read_requests(self, live_request_queue, turns):
+        """Consume user media like the model, starting a turn every turn_seconds of audio"""
+        heard = 0
+        while True:
+            request = await live_request_queue.get()
+            if request.close:
+                turns.put_nowait(None)
+                return
+            blob = request.blob
+            if blob and blob.mime_type.startswith("audio/"):
+                # 16 bit mono, "audio/pcm;rate=16000" or the default rate
+                rate = int(blob.mime_type.split("rate=")[1]) if "rate=" in blob.mime_type else SAMPLE_RATE
+                heard += len(blob.data) / 2 / rate
+            if heard >= self.turn_seconds or request.audio_stream_end:
+                heard = 0
+                if turns.empty():
+                    turns.put_nowait(True)
+
+    async def reply(self):
+        chunks = int(self.reply_seconds / self.chunk_seconds)
+        interrupt_at = self.random.randrange(chunks) if self.random.random() < self.interrupt_rate else None
+        words = self.words_per_second * self.chunk_seconds
+        pending_words = 0.0
+
+        yield text_event(f"<t={time.time():.6f}> ")
+        for n in range(chunks):
+            if n == interrupt_at:
+                yield Event(author=AUTHOR, interrupted=True)
+                return
+            yield audio_event(self.chunk)
+            pending_words += words
+            while pending_words >= 1:
+                pending_words -= 1
+                yield text_event("word ")
+            await asyncio.sleep(self.chunk_seconds / self.speed)
+        yield Event(author=AUTHOR, turn_complete=True)
@@ -0,0 +1,86 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+CPU spent logging agent events: the previous INFO f-string of every event
+written synchronously, versus the sampled per-session logger behind the
+queue handler, at INFO and with DEBUG enabled.
+
+    python benchmarks/logging_overhead.py --events 5000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import time
+
+from google.adk.events import Event
+from google.genai.types import Blob, Content, Part
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from logging_config import SampledLogger, log_format, setup_logging
+
+def make_events(count):
+    audio = Blob(data=os.urandom(9600), mime_type="audio/pcm;rate=24000")
+    events = []
+    for i in range(count):
+        part = Part(inline_data=audio) if i % 2 else Part(text="some partial text ")
+        events.append(Event(author="agent", partial=True, content=Content(role="model", parts=[part])))
+    return events
+
+def reset_logging():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+def old_path(events, devnull):
+    reset_logging()
+    logging.basicConfig(level=logging.INFO, format=log_format, stream=devnull)
+    logger = logging.getLogger("agent.agent")
+    for event in events:
+        logger.info(f"[AGENT TO CLIENT]: {event}")
+
+def new_path(events, devnull, level):
+    reset_logging()
+    listener = setup_logging(level=level, stream=devnull)
+    log = SampledLogger(logging.getLogger("agent.agent"), "bench")
+    for event in events:
+        log.debug("[AGENT TO CLIENT]: %s", event)
+    listener.stop()
+
+def cpu_per_event(fn, events, *args):
+    start = time.process_time()
+    fn(events, *args)
+    return 1e6 * (time.process_time() - start) / len(events)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5000)
+    args = parser.parse_args()
+
+    events = make_events(args.events)
+    with open(os.devnull, "w") as devnull:
+        old = cpu_per_event(old_path, events, devnull)
+        info = cpu_per_event(new_path, events, devnull, logging.INFO)
+        debug = cpu_per_event(new_path, events, devnull, logging.DEBUG)
+
+    # one event every 20ms of agent audio is ~50 events/s per session
+    print(f"{args.events} events, cpu per event and per session at 50 events/s")
+    for name, value in (("info every event", old), ("sampled, INFO", info), ("sampled, DEBUG", debug)):
+        print(f"{name:17} {value:8.2f}us/event {value * 50 / 1000:7.3f}ms/s per session")
+
+if __name__ == "__main__":
+    main()
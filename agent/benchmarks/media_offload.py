@@ -0,0 +1,114 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Event loop lag with N simultaneous video tracks, with JPEG encoding inline on
+the loop versus offloaded to the MediaExecutor.
+
+    python benchmarks/media_offload.py --tracks 8 --seconds 10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+import av
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from endpoints.media_executor import MediaExecutor
+from endpoints.video_sampler import VideoSampler
+
+def make_frames(count, width, height):
+    frames = []
+    for _ in range(count):
+        rgb = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
+        frames.append(av.VideoFrame.from_ndarray(rgb, format="rgb24").reformat(format="yuv420p"))
+    return frames
+
+async def measure_lag(lags, stop, interval=0.005):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - start - interval)
+
+async def video_track(frames, fps, sample_fps, executor, stop):
+    sampler = VideoSampler(fps=sample_fps, change_threshold=0)
+    tasks = set()
+
+    async def offload(frame):
+        if await executor.try_run(sampler.encode, frame) is None:
+            sampler.reject()
+
+    i = 0
+    while not stop.is_set():
+        frame = frames[i % len(frames)]
+        i += 1
+        if sampler.accept(frame):
+            if executor is None:
+                sampler.encode(frame)
+            else:
+                task = asyncio.create_task(offload(frame))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        await asyncio.sleep(1 / fps)
+    await asyncio.gather(*tasks)
+    return sampler
+
+def percentile(values, p):
+    return 1000 * float(np.percentile(values, p)) if values else 0.0
+
+async def run(args, offload):
+    frames = make_frames(8, args.width, args.height)
+    executor = MediaExecutor(workers=args.workers) if offload else None
+    stop = asyncio.Event()
+    lags = []
+
+    monitor = asyncio.create_task(measure_lag(lags, stop))
+    tracks = [asyncio.create_task(video_track(frames, args.fps, args.sample_fps, executor, stop))
+              for _ in range(args.tracks)]
+    await asyncio.sleep(args.seconds)
+    stop.set()
+    samplers = await asyncio.gather(*tracks)
+    await monitor
+    if executor:
+        executor.shutdown()
+
+    encoded = sum(s.encoded for s in samplers)
+    dropped = sum(s.dropped for s in samplers)
+    print(f"{'offload' if offload else 'inline ':8} "
+          f"lag p50={percentile(lags, 50):6.2f}ms p95={percentile(lags, 95):6.2f}ms "
+          f"p99={percentile(lags, 99):6.2f}ms max={1000 * max(lags):7.2f}ms "
+          f"encoded={encoded} dropped={dropped}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tracks", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--fps", type=float, default=30, help="incoming frame rate per track")
+    parser.add_argument("--sample-fps", type=float, default=5, help="encoded frame rate per track")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    print(f"{args.tracks} tracks at {args.width}x{args.height} {args.fps}fps, encoding {args.sample_fps}fps each")
+    asyncio.run(run(args, offload=False))
+    asyncio.run(run(args, offload=True))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Overload test for admission control: do the sessions already connected
+keep their latency when a flood of callers arrives?
+
+A server with the scripted agent of fake_live.py gets --existing peers,
+and once they have settled, --flood more peers within --flood-ramp
+seconds. The peers and the server are those of replay.py. Three runs:
+no flood, the flood with admission disabled, and the flood with
+admission set from the options below. Reported for each run:
+- latency of the existing peers' agent text and audio after the flood
+  started
+- how many flood peers were admitted, degraded, turned away with a 503,
+  or failed to connect otherwise
+
+    python benchmarks/overload.py --existing 4 --flood 12 --max-sessions 6
+
+With --slo-audio-p95-ms the exit status is 1 when, with admission, the
+existing peers' audio p95 is over it. Server and peers share the machine,
+so on a small one the flood's own clients add to the latency even when
+every flood offer is turned away; --max-sessions equal to --existing
+measures that floor.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from replay import audio_latencies, wait_ready
+
+REPLAY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay.py")
+
+def peers(args, sessions, ramp, start, until):
+    return subprocess.Popen([sys.executable, REPLAY, "--peers", "--port", str(args.port),
+                             "--sessions", str(sessions), "--clients", "1", "--client-index", "0",
+                             "--ramp", str(ramp), "--start", str(start), "--until", str(until),
+                             "--response-type", "audio"],
+                            stdout=subprocess.PIPE, text=True)
+
+def results(process):
+    output, _ = process.communicate(timeout=120)
+    return json.loads(output.strip().splitlines()[-1])
+
+def run_once(args, flood, admission):
+    env = dict(os.environ, LOG_LEVEL="WARNING",
+               LIVE_ADMISSION__ENABLED=str(admission),
+               LIVE_ADMISSION__DEGRADE_SESSIONS=str(args.degrade_sessions),
+               LIVE_ADMISSION__MAX_SESSIONS=str(args.max_sessions),
+               LIVE_ADMISSION__QUEUE_TIMEOUT=str(args.queue_timeout))
+    server = subprocess.Popen([sys.executable, REPLAY, "--serve", "--port", str(args.port), "--workers", "1",
+                               "--turn-seconds", str(args.turn_seconds), "--reply-seconds", str(args.reply_seconds)],
+                              env=env)
+    try:
+        asyncio.run(wait_ready(args.port, server))
+        # both client processes start now, so loading the flood's is not part of the flood
+        start = time.time()
+        flood_start = start + args.settle
+        until = flood_start + args.seconds
+        existing = peers(args, args.existing, 1.0, start, until)
+        flooding = peers(args, flood, args.flood_ramp, flood_start, until) if flood else None
+        existing_results = results(existing)
+        flood_results = results(flooding) if flooding else []
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    # latency of the existing peers once the flood started
+    connected = [r for r in existing_results if r["ok"]]
+    text = [ms for r in connected for m, ms in zip(r["markers"], r["text_ms"]) if m >= flood_start]
+    for r in connected:
+        r["markers"] = [m for m in r["markers"] if m >= flood_start]
+    audio = [t for r in connected for t in audio_latencies(r, args.reply_seconds)]
+    return {
+        "existing": len(connected),
+        "text_ms": np.percentile(text, [50, 95]) if text else [np.nan] * 2,
+        "audio_ms": np.percentile(audio, [50, 95]) if audio else [np.nan] * 2,
+        "admitted": sum(r["ok"] and not r["degraded"] for r in flood_results),
+        "degraded": sum(r["ok"] and r["degraded"] for r in flood_results),
+        # turned away with a 503, or failed some other way
+        "rejected": sum(not r["ok"] and "503" in r.get("error", "") for r in flood_results),
+        "failed": sum(not r["ok"] and "503" not in r.get("error", "") for r in flood_results),
+    }
+
+def report(name, run):
+    text, audio = run["text_ms"], run["audio_ms"]
+    print(f"{name:>20} {run['existing']:>8} {text[0]:>7.1f} {text[1]:>7.1f} {audio[0]:>7.0f} {audio[1]:>7.0f} "
+          f"{run['admitted']:>8} {run['degraded']:>8} {run['rejected']:>8} {run['failed']:>6}", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--existing", type=int, default=4, help="peers connected before the flood")
+    parser.add_argument("--flood", type=int, default=12, help="peers arriving at once")
+    parser.add_argument("--flood-ramp", type=float, default=1.0)
+    parser.add_argument("--settle", type=float, default=5, help="seconds before the flood")
+    parser.add_argument("--seconds", type=float, default=20, help="seconds from the flood to the end")
+    parser.add_argument("--degrade-sessions", type=int, default=5)
+    parser.add_argument("--max-sessions", type=int, default=6)
+    parser.add_argument("--queue-timeout", type=float, default=2.0)
+    parser.add_argument("--turn-seconds", type=float, default=3)
+    parser.add_argument("--reply-seconds", type=float, default=2)
+    parser.add_argument("--slo-audio-p95-ms", type=float)
+    parser.add_argument("--port", type=int, default=8096)
+    args = parser.parse_args()
+
+    print(f"{args.existing} existing peers, a flood of {args.flood} over {args.flood_ramp}s, "
+          f"degraded from {args.degrade_sessions} and full at {args.max_sessions} sessions")
+    print(f"{'run':>20} {'existing':>8} {'text ms p50/p95':>15} {'audio ms p50/p95':>15} "
+          f"{'admitted':>8} {'degraded':>8} {'rejected':>8} {'failed':>6}")
+    report("no flood", run_once(args, 0, True))
+    report("flood, no admission", run_once(args, args.flood, False))
+    admitted = run_once(args, args.flood, True)
+    report("flood, admission", admitted)
+    if args.slo_audio_p95_ms is not None and not admitted["audio_ms"][1] <= args.slo_audio_p95_ms:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
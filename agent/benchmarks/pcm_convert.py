@@ -0,0 +1,94 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per frame cost and upstream bytes of converting microphone audio for the
+live model: the previous 24kHz resampler with to_ndarray().tobytes() against
+the per-track 16kHz PcmConverter, for 48kHz stereo frames as decoded from
+Opus and for frames that already are 16kHz mono.
+
+Also checks that two tracks interleaved through one resampler come out
+different from each track through its own.
+
+    python benchmarks/pcm_convert.py --frames 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from av import AudioFrame, AudioResampler
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from endpoints.pcm import PcmConverter
+
+def make_frames(count, rate, layout):
+    channels = 2 if layout == "stereo" else 1
+    samples = rate // 50
+    frames = []
+    for n in range(count):
+        t = (np.arange(samples) + n * samples) / rate
+        tone = (np.sin(2 * np.pi * (180 + 40 * (n % 7)) * t) * 8000).astype(np.int16)
+        frame = AudioFrame.from_ndarray(np.repeat(tone, channels).reshape(1, -1), format="s16", layout=layout)
+        frame.sample_rate = rate
+        frame.pts = n * samples
+        frames.append(frame)
+    return frames
+
+def old_convert(resampler, frame):
+    return b"".join(f.to_ndarray().tobytes() for f in resampler.resample(frame))
+
+def per_frame(convert, frames):
+    out = 0
+    start = time.perf_counter()
+    for frame in frames:
+        out += len(convert(frame))
+    return 1e6 * (time.perf_counter() - start) / len(frames), out / (len(frames) * 0.02)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=5000)
+    args = parser.parse_args()
+
+    inputs = [("48kHz stereo", make_frames(args.frames, 48000, "stereo")),
+              ("16kHz mono", make_frames(args.frames, 16000, "mono"))]
+    print(f"{'input':>13} {'path':>16} {'per frame':>10} {'upstream':>12}")
+    for name, frames in inputs:
+        resampler = AudioResampler(format="s16", layout="mono", rate=24000)
+        for path, convert in (("24kHz resampler", lambda f: old_convert(resampler, f)),
+                              ("16kHz converter", PcmConverter().convert)):
+            us, rate = per_frame(convert, frames)
+            print(f"{name:>13} {path:>16} {us:>8.1f}us {rate / 1000:>8.1f}KB/s")
+
+    # two tracks through one resampler against one resampler each
+    a, b = make_frames(200, 48000, "stereo"), make_frames(200, 48000, "stereo")[::-1]
+    own_a, own_b = PcmConverter(), PcmConverter()
+    shared = AudioResampler(format="s16", layout="mono", rate=16000)
+    interleaved, separate = [], []
+    for frame_a, frame_b in zip(a, b):
+        interleaved.append(old_convert(shared, frame_a))
+        old_convert(shared, frame_b)
+        separate.append(own_a.convert(frame_a))
+        own_b.convert(frame_b)
+    x = np.frombuffer(b"".join(interleaved), dtype=np.int16).astype(np.int32)
+    y = np.frombuffer(b"".join(separate), dtype=np.int16).astype(np.int32)
+    n = min(len(x), len(y))
+    print(f"track through a shared resampler differs by up to {np.abs(x[:n] - y[:n]).max()} "
+          f"from the same track through its own")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Event loop cost of recording sessions: the SessionRecorder, which buffers
+on the loop and writes from its own thread, against writing every payload
+to its file from the loop, and against not recording.
+
+--sessions sessions each record 20ms of user audio every 20ms, 100ms of
+agent audio every 100ms, a JPEG every second and a text event every
+100ms, for --seconds. Reported: time spent on the loop in the recording
+calls, how late a 5ms timer runs, and what the recorder dropped.
+With --fsync every write is also synced, to stand in for a slow disk.
+
+    python benchmarks/recorder.py --sessions 16 --seconds 10
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from endpoints.recorder import RecordingWriter, SessionRecorder
+
+USER_AUDIO = os.urandom(640)
+AGENT_AUDIO = os.urandom(4800)
+JPEG = os.urandom(40000)
+
+class DirectRecorder:
+    """Writes every payload to its file as it comes, on the loop"""
+
+    def __init__(self, root, sid, fsync):
+        directory = os.path.join(root, sid)
+        os.makedirs(directory)
+        self.fsync = fsync
+        self.files = {name: open(os.path.join(directory, name), "ab", buffering=0)
+                      for name in ("user_audio.pcm", "agent_audio.pcm", "video.jpg", "events.jsonl")}
+
+    def write(self, name, data):
+        f = self.files[name]
+        f.write(data)
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def user_audio(self, pcm):
+        self.write("user_audio.pcm", pcm)
+
+    def agent_audio(self, pcm):
+        self.write("agent_audio.pcm", pcm)
+
+    def video_frame(self, jpeg):
+        self.write("video.jpg", jpeg)
+
+    def event(self, kind, **fields):
+        self.write("events.jsonl", f'{{"event": "{kind}", "text": "{fields["text"]}"}}\n'.encode())
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+class SyncingWriter(RecordingWriter):
+    def write(self, path, data):
+        super().write(path, data)
+        if self.fsync:
+            os.fsync(self.files[path].fileno())
+
+async def session(recorder, seconds, spent):
+    """Record like a live session, adding the time spent in the recorder"""
+    start = time.perf_counter()
+    tick = 0
+    while tick * 0.02 < seconds:
+        t = time.perf_counter()
+        if recorder:
+            recorder.user_audio(USER_AUDIO)
+            if tick % 5 == 0:
+                recorder.agent_audio(AGENT_AUDIO)
+                recorder.event("text", text="some partial text ")
+            if tick % 50 == 0:
+                recorder.video_frame(JPEG)
+        spent.append(time.perf_counter() - t)
+        tick += 1
+        await asyncio.sleep(max(0, start + tick * 0.02 - time.perf_counter()))
+
+async def lag_monitor(lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + 0.005
+        await asyncio.sleep(0.005)
+        lags.append(loop.time() - expected)
+
+async def run(kind, args, root):
+    writer = None
+    if kind == "recorder":
+        writer = SyncingWriter()
+        writer.fsync = args.fsync
+        recorders = [SessionRecorder(root, f"s{n}", writer) for n in range(args.sessions)]
+    elif kind == "direct":
+        recorders = [DirectRecorder(root, f"s{n}", args.fsync) for n in range(args.sessions)]
+    else:
+        recorders = [None] * args.sessions
+
+    spent, lags, stop = [], [], asyncio.Event()
+    monitor = asyncio.create_task(lag_monitor(lags, stop))
+    await asyncio.gather(*(session(r, args.seconds, spent) for r in recorders))
+    stop.set()
+    await monitor
+
+    dropped = 0
+    for r in recorders:
+        if r:
+            r.close()
+        if isinstance(r, SessionRecorder):
+            dropped += sum(s.dropped_bytes for s in r.streams.values())
+    if writer:
+        writer.shutdown()
+
+    lag = 1000 * np.array(lags)
+    print(f"{kind:>9} {1000 * sum(spent) / args.seconds:>10.2f} {np.mean(spent) * 1e6:>9.1f} "
+          f"{np.percentile(lag, 50):>8.2f} {np.percentile(lag, 99):>8.2f} {lag.max():>8.2f} {dropped:>10}")
+
+async def main_async(args):
+    print(f"{args.sessions} sessions for {args.seconds}s{', fsync' if args.fsync else ''}")
+    print(f"{'recording':>9} {'loop ms/s':>10} {'us/tick':>9} {'lag p50':>8} {'lag p99':>8} {'lag max':>8} "
+          f"{'dropped B':>10}")
+    for kind in ("none", "direct", "recorder"):
+        root = tempfile.mkdtemp(dir=args.dir)
+        try:
+            await run(kind, args, root)
+        finally:
+            shutil.rmtree(root)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--fsync", action="store_true", help="sync every write to disk")
+    parser.add_argument("--dir", help="where to write, the temporary directory by default")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+if __name__ == "__main__":
+    main()
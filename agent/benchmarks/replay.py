@@ -0,0 +1,444 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+End to end benchmark of the server with the scripted live agent from
+fake_live.py in place of the Gemini Live API, so it runs offline and in CI.
+
+The server runs in its own process, through main.run, with --workers
+worker processes when more than one is given. N synthetic aiortc peers, in
+separate client processes, connect over Socket.IO, negotiate through /offer
+and stream audio (and video) for the length of the run. Audio and video are
+synthetic unless media files are given with --audio and --video, or a
+session recording made by the server with --recording.
+
+Reported per run: /offer round trip, text latency from the agent producing
+a reply to the client receiving it, audio latency from the agent producing
+a reply to the client hearing it, and server CPU and memory per session.
+
+    python benchmarks/replay.py --sessions 4 8 16 --workers 1 2 --seconds 20
+
+With --max-audio-p95-ms or --max-text-p95-ms the exit status is 1 when a
+run is slower than that or a peer failed to connect, for use in CI.
+
+With --datachannel the peers take agent messages over an RTCDataChannel
+instead of Socket.IO. To record the sessions of a run, set
+LIVE_RECORDER__DIRECTORY and ask for a profile with record = true; one of
+those recordings then replays the same user audio and video on every run:
+
+    python benchmarks/replay.py --recording recordings/20250101-120000-abc
+
+To compare latency profiles, give the server a config with --config and
+have the peers ask for one of its profiles with --profile.
+"""
+
+import argparse
+import asyncio
+import fractions
+import json
+import math
+import os
+import re
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+MARKER = re.compile(r"<t=([0-9.]+)>")
+
+######################################################################
+# Server
+######################################################################
+def serve(args):
+    # quiet workers, the supervisor passes this on through the environment
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.config:
+        # workers read the same config
+        os.environ["LIVE_CONFIG"] = args.config
+    import main
+    from agent.agent import AgentPool, APP_NAME, root_agent
+    from fake_live import ScriptedLiveRunner
+
+    runner = ScriptedLiveRunner(root_agent, APP_NAME, turn_seconds=args.turn_seconds,
+                                reply_seconds=args.reply_seconds, interrupt_rate=args.interrupt_rate)
+    command = [sys.executable, os.path.abspath(__file__), "--serve",
+               "--turn-seconds", str(args.turn_seconds), "--reply-seconds", str(args.reply_seconds),
+               "--interrupt-rate", str(args.interrupt_rate)]
+    main.run(args, AgentPool(runner=runner), worker_command=command)
+
+def process_tree(pid):
+    """pid and all of its descendants"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat:
+                ppid = int(stat.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, todo = [], [pid]
+    while todo:
+        pid = todo.pop()
+        tree.append(pid)
+        todo.extend(children.get(pid, ()))
+    return tree
+
+def usage(pid):
+    """CPU seconds and resident MB of a process tree"""
+    cpu, rss = 0.0, 0.0
+    ticks, page = os.sysconf("SC_CLK_TCK"), os.sysconf("SC_PAGE_SIZE")
+    for pid in process_tree(pid):
+        try:
+            with open(f"/proc/{pid}/stat") as stat:
+                fields = stat.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{pid}/statm") as statm:
+                rss += int(statm.read().split()[1]) * page / 2**20
+        except OSError:
+            continue
+        cpu += (int(fields[11]) + int(fields[12])) / ticks
+    return cpu, rss
+
+######################################################################
+# Peers
+######################################################################
+def speech_track(args):
+    from aiortc import MediaStreamTrack
+    from av import AudioFrame
+
+    class SpeechTrack(MediaStreamTrack):
+        """Bursts of a voice-like tone with pauses, paced in real time"""
+        kind = "audio"
+        rate = 48000
+        samples = 960
+
+        def __init__(self, talk=1.5, pause=0.7):
+            super().__init__()
+            self.talk = talk
+            self.period = talk + pause
+            t = np.arange(self.rate) / self.rate
+            self.tone = ((np.sin(2 * np.pi * 180 * t) + 0.3 * np.sin(2 * np.pi * 540 * t)) * 5000).astype(np.int16)
+            self.silence = np.zeros(self.samples, dtype=np.int16)
+            self.start = None
+            self.pts = 0
+
+        async def recv(self):
+            if self.start is None:
+                self.start = time.time()
+            else:
+                self.pts += self.samples
+                wait = self.start + self.pts / self.rate - time.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            if (self.pts / self.rate) % self.period < self.talk:
+                offset = self.pts % (self.rate - self.samples)
+                samples = self.tone[offset:offset + self.samples]
+            else:
+                samples = self.silence
+            frame = AudioFrame.from_ndarray(samples.reshape(1, -1), format="s16", layout="mono")
+            frame.sample_rate = self.rate
+            frame.pts = self.pts
+            frame.time_base = fractions.Fraction(1, self.rate)
+            return frame
+
+    if args.recording:
+        from endpoints.recorder import Recording, RecordedAudioTrack
+        return RecordedAudioTrack(Recording(args.recording))
+    if args.audio:
+        from aiortc.contrib.media import MediaPlayer
+        return MediaPlayer(args.audio, loop=True).audio
+    return SpeechTrack()
+
+def camera_track(args):
+    from aiortc import VideoStreamTrack
+    from av import VideoFrame
+
+    class CameraTrack(VideoStreamTrack):
+        """A bar sweeping across a gradient, so frames keep changing"""
+
+        def __init__(self, width=320, height=240, frames=60):
+            super().__init__()
+            gradient = np.tile(np.linspace(0, 255, width, dtype=np.uint8), (height, 1))
+            self.frames = []
+            for n in range(frames):
+                image = np.stack([gradient, gradient[::-1], np.full_like(gradient, 96)], axis=-1)
+                x = n * width // frames
+                image[:, x:x + width // 10] = 255
+                self.frames.append(image)
+            self.count = 0
+
+        async def recv(self):
+            pts, time_base = await self.next_timestamp()
+            frame = VideoFrame.from_ndarray(self.frames[self.count % len(self.frames)], format="rgb24")
+            frame.pts = pts
+            frame.time_base = time_base
+            self.count += 1
+            return frame
+
+    if args.recording:
+        from endpoints.recorder import Recording, RecordedVideoTrack
+        return RecordedVideoTrack(Recording(args.recording))
+    if args.video:
+        from aiortc.contrib.media import MediaPlayer
+        return MediaPlayer(args.video, loop=True).video
+    return CameraTrack()
+
+async def listen(track, onsets):
+    """Note when agent audio starts after a silence"""
+    silent = True
+    while True:
+        try:
+            frame = await track.recv()
+        except Exception:
+            return
+        loud = np.abs(frame.to_ndarray()).max() > 500
+        if loud and silent:
+            onsets.append(time.time())
+        silent = not loud
+
+async def run_peer(url, args, delay, until, http):
+    import socketio
+    from aiortc import RTCPeerConnection, RTCSessionDescription
+
+    await asyncio.sleep(delay)
+    result = {"ok": False, "offer_ms": None, "degraded": False, "text_ms": [], "markers": [], "onsets": []}
+    client = socketio.AsyncClient(reconnection=False)
+
+    def on_text(text):
+        now = time.time()
+        for marker in MARKER.findall(text):
+            result["markers"].append(float(marker))
+            result["text_ms"].append(1000 * (now - float(marker)))
+
+    @client.on("message")
+    async def on_message(data):
+        message = json.loads(data) if isinstance(data, str) else data
+        on_text(message.get("data") or "")
+
+    pc = RTCPeerConnection()
+    if args.datachannel:
+        from agent.datachannel import LABEL, TEXT, decode_frame
+        channel = pc.createDataChannel(LABEL)
+
+        @channel.on("message")
+        def on_frame(frame):
+            kind, pts, text = decode_frame(frame)
+            if kind == TEXT:
+                on_text(text)
+
+    try:
+        await client.connect(url, transports=["websocket"])
+        pc.addTrack(speech_track(args))
+        if not args.no_video:
+            pc.addTrack(camera_track(args))
+
+        @pc.on("track")
+        def on_track(track):
+            if track.kind == "audio":
+                asyncio.ensure_future(listen(track, result["onsets"]))
+
+        await pc.setLocalDescription(await pc.createOffer())
+        start = time.time()
+        async with http.post(f"{url}/offer", json={
+            "sdp": pc.localDescription.sdp,
+            "type": pc.localDescription.type,
+            "socketId": client.get_sid(),
+            "responseType": args.response_type,
+            # unset, the profile decides
+            "vad": True if args.vad else None,
+            "profile": args.profile,
+        }) as response:
+            answer = await response.json()
+        result["offer_ms"] = 1000 * (time.time() - start)
+        result["degraded"] = answer.get("degraded", False)
+        await pc.setRemoteDescription(RTCSessionDescription(sdp=answer["sdp"], type=answer["type"]))
+        result["ok"] = True
+        await asyncio.sleep(until - time.time())
+    except Exception as e:
+        result["error"] = repr(e)
+    finally:
+        await pc.close()
+        await client.disconnect()
+    return result
+
+async def run_peers(args):
+    import aiohttp
+    url = f"http://127.0.0.1:{args.port}"
+    if args.start:
+        # started early so the process is loaded when its peers connect
+        await asyncio.sleep(max(0.0, args.start - time.time()))
+    # peers of all client processes interleave over the ramp
+    indexes = range(args.client_index, args.sessions[0], args.clients)
+    async with aiohttp.ClientSession() as http:
+        results = await asyncio.gather(*(run_peer(url, args, i * args.ramp / args.sessions[0], args.until, http)
+                                         for i in indexes))
+    print(json.dumps(results))
+
+######################################################################
+# Benchmark
+######################################################################
+def audio_latencies(result, reply_seconds):
+    """Agent reply to first audible frame, for each reply the client heard about"""
+    latencies = []
+    for marker in result["markers"]:
+        onsets = [t for t in result["onsets"] if marker <= t < marker + reply_seconds]
+        if onsets:
+            latencies.append(1000 * (onsets[0] - marker))
+    return latencies
+
+def percentiles(values, *points):
+    if not values:
+        return [math.nan] * len(points)
+    return [np.percentile(values, p) for p in points]
+
+async def wait_ready(port, process, timeout=60):
+    import aiohttp
+    deadline = time.time() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.time() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("server exited")
+            try:
+                async with http.get(f"http://127.0.0.1:{port}/ready") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+def run_once(args, workers, sessions):
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port),
+                               "--workers", str(workers), "--turn-seconds", str(args.turn_seconds),
+                               "--reply-seconds", str(args.reply_seconds), "--interrupt-rate", str(args.interrupt_rate)]
+                              + (["--config", args.config] if args.config else []))
+    try:
+        asyncio.run(wait_ready(args.port, server))
+        # let workers settle before the baseline
+        time.sleep(1)
+        _, rss_idle = usage(server.pid)
+
+        until = time.time() + args.ramp + args.seconds
+        clients = [subprocess.Popen([sys.executable, os.path.abspath(__file__), "--peers",
+                                     "--port", str(args.port), "--sessions", str(sessions),
+                                     "--clients", str(args.clients), "--client-index", str(n),
+                                     "--ramp", str(args.ramp), "--until", str(until),
+                                     "--response-type", args.response_type]
+                                    + (["--profile", args.profile] if args.profile else [])
+                                    + (["--datachannel"] if args.datachannel else [])
+                                    + (["--vad"] if args.vad else []) + (["--no-video"] if args.no_video else [])
+                                    + (["--audio", args.audio] if args.audio else [])
+                                    + (["--video", args.video] if args.video else [])
+                                    + (["--recording", args.recording] if args.recording else []),
+                                    stdout=subprocess.PIPE, text=True)
+                   for n in range(min(args.clients, sessions))]
+
+        # measure once every peer is connected and has had a first turn
+        time.sleep(args.ramp + args.turn_seconds)
+        cpu_start, window_start = usage(server.pid)[0], time.time()
+        time.sleep(max(0.0, until - time.time() - 1))
+        cpu_end, rss = usage(server.pid)
+        window = time.time() - window_start
+
+        results = []
+        for client in clients:
+            output, _ = client.communicate(timeout=60)
+            results += json.loads(output.strip().splitlines()[-1])
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    connected = [r for r in results if r["ok"]]
+    return {
+        "workers": workers,
+        "sessions": sessions,
+        "connected": len(connected),
+        "errors": sorted({r["error"] for r in results if "error" in r}),
+        "offer_ms": percentiles([r["offer_ms"] for r in connected], 50, 95),
+        "text_ms": percentiles([t for r in connected for t in r["text_ms"]], 50, 95, 99),
+        "audio_ms": percentiles([t for r in connected for t in audio_latencies(r, args.reply_seconds)], 50, 95, 99),
+        "replies": sum(len(r["markers"]) for r in connected),
+        "cpu_ms": 1000 * (cpu_end - cpu_start) / window / max(1, len(connected)),
+        "mb": (rss - rss_idle) / max(1, len(connected)),
+    }
+
+def report(run):
+    offer, text, audio = run["offer_ms"], run["text_ms"], run["audio_ms"]
+    print(f"{run['workers']:>7} {run['sessions']:>8} {run['connected']:>9} "
+          f"{offer[0]:>6.0f} {offer[1]:>6.0f}  {text[0]:>6.1f} {text[1]:>6.1f} {text[2]:>6.1f}  "
+          f"{audio[0]:>6.0f} {audio[1]:>6.0f} {audio[2]:>6.0f} {run['replies']:>7}  "
+          f"{run['cpu_ms']:>9.1f} {run['mb']:>10.2f}", flush=True)
+    for error in run["errors"]:
+        print(f"        error: {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[4])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument("--seconds", type=float, default=20, help="seconds every peer stays connected")
+    parser.add_argument("--ramp", type=float, default=2, help="seconds over which peers connect")
+    parser.add_argument("--clients", type=int, default=2, help="client processes running the peers")
+    parser.add_argument("--response-type", default="audio", choices=["audio", "text"])
+    parser.add_argument("--vad", action="store_true", help="ask the server to gate user audio on speech")
+    parser.add_argument("--datachannel", action="store_true", help="take agent messages over a data channel")
+    parser.add_argument("--config", help="server config file, to compare profiles")
+    parser.add_argument("--profile", help="profile the peers ask for in /offer")
+    parser.add_argument("--no-video", action="store_true")
+    parser.add_argument("--audio", help="recording to send instead of synthetic speech")
+    parser.add_argument("--video", help="recording to send instead of the synthetic camera")
+    parser.add_argument("--recording", help="session recording whose user audio and video to send")
+    parser.add_argument("--turn-seconds", type=float, default=3, help="user audio between agent replies")
+    parser.add_argument("--reply-seconds", type=float, default=2)
+    parser.add_argument("--interrupt-rate", type=float, default=0.1)
+    parser.add_argument("--port", type=int, default=8093)
+    parser.add_argument("--max-audio-p95-ms", type=float)
+    parser.add_argument("--max-text-p95-ms", type=float)
+    # server and client processes
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--peers", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--client-index", type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--until", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--start", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--host", default="127.0.0.1", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-id", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--drain-timeout", type=float, default=5, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        args.workers = args.workers[0]
+        serve(args)
+        return
+    if args.peers:
+        asyncio.run(run_peers(args))
+        return
+
+    print(f"{'workers':>7} {'sessions':>8} {'connected':>9} {'offer p50/p95 ms':>13}  "
+          f"{'text p50/p95/p99 ms':>20}  {'audio p50/p95/p99 ms':>20} {'replies':>7}  "
+          f"{'cpu ms/s':>9} {'MB/session':>10}")
+    failed = False
+    for workers in args.workers:
+        for sessions in args.sessions:
+            run = run_once(args, workers, sessions)
+            report(run)
+            failed |= run["connected"] < sessions
+            failed |= args.max_audio_p95_ms is not None and not run["audio_ms"][1] <= args.max_audio_p95_ms
+            failed |= args.max_text_p95_ms is not None and not run["text_ms"][1] <= args.max_text_p95_ms
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
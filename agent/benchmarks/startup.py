@@ -0,0 +1,119 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Startup profile of the server: src/main.py is started --runs times and
+polled from outside for when its port is bound, /healthz answers and
+/ready succeeds. Then the server's own profile from /ready is read for
+the time of each phase and the import time of each heavy module.
+
+Agent sessions created ahead of time are in memory, so this runs offline.
+
+    python benchmarks/startup.py --runs 5
+
+With --max-ready-ms the exit status is 1 when the median time to ready is
+slower than that, for use in CI.
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+MAIN = os.path.join(os.path.dirname(__file__), "..", "src", "main.py")
+
+def get(url):
+    """Status and body of a GET, (None, None) while nothing answers"""
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+    except OSError:
+        return None, None
+
+def bound(port):
+    try:
+        socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+        return True
+    except OSError:
+        return False
+
+def start_once(args):
+    """Client side times in ms to bound, healthy and ready, and the server's profile"""
+    env = dict(os.environ, LOG_LEVEL="WARNING")
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, MAIN, "--port", str(args.port), "--workers", "1"],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    times = {}
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        while "ready" not in times:
+            if process.poll() is not None:
+                raise RuntimeError(f"server exited with {process.returncode}")
+            if time.perf_counter() - start > 60:
+                raise RuntimeError("server did not become ready")
+            elapsed = 1000 * (time.perf_counter() - start)
+            if "bound" not in times:
+                if bound(args.port):
+                    times["bound"] = elapsed
+            elif "healthy" not in times:
+                if get(url + "/healthz")[0] == 200:
+                    times["healthy"] = elapsed
+            else:
+                status, body = get(url + "/ready")
+                if status == 200:
+                    times["ready"] = elapsed
+                    profile = json.loads(body)
+            # slow enough not to compete with the server's imports on a small machine
+            time.sleep(0.005 if "bound" not in times else args.interval)
+    finally:
+        process.terminate()
+        process.wait()
+    return times, profile
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8095)
+    parser.add_argument("--interval", type=float, default=0.025, help="seconds between probes once bound")
+    parser.add_argument("--max-ready-ms", type=float)
+    args = parser.parse_args()
+
+    runs = [start_once(args) for _ in range(args.runs)]
+
+    print(f"{args.runs} starts, median ms from process start")
+    print(f"{'client side':>28} {'ms':>8}")
+    for name in ("bound", "healthy", "ready"):
+        print(f"{name:>28} {np.median([times[name] for times, _ in runs]):>8.0f}")
+    print(f"{'server phases':>28}")
+    for name in runs[0][1]["phases_ms"]:
+        print(f"{name:>28} {np.median([p['phases_ms'][name] for _, p in runs]):>8.0f}")
+    print(f"{'preloaded imports':>28}")
+    for name in runs[0][1]["imports_ms"]:
+        print(f"{name:>28} {np.median([p['imports_ms'][name] for _, p in runs]):>8.0f}")
+
+    ready = np.median([times["ready"] for times, _ in runs])
+    if args.max_ready_ms is not None and ready > args.max_ready_ms:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
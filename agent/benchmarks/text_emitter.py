@@ -0,0 +1,123 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Socket.IO emits and server CPU per session when streaming partial agent
+text, one emit per fragment versus the coalescing MessageEmitter.
+
+A local Socket.IO server streams fragments to N clients that run in a
+separate process, so only the server's CPU is measured.
+
+    python benchmarks/text_emitter.py --sessions 20 --seconds 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import socketio
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from agent.emitter import MessageEmitter, JSON, OBJECT
+
+WORDS = "the quick brown fox jumps over a lazy dog while the model keeps talking".split()
+
+async def direct_stream(sio, sid, seconds, rate):
+    """The previous path, one json.dumps and emit per fragment"""
+    emits = 0
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        message = {"mime_type": "text/plain", "data": random.choice(WORDS) + " "}
+        await sio.emit('message', json.dumps(message), room=sid)
+        emits += 1
+        await asyncio.sleep(1 / rate)
+    return emits
+
+async def coalesced_stream(sio, sid, seconds, rate, payload):
+    emitter = MessageEmitter(sio, sid, payload=payload)
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        await emitter.send_text(random.choice(WORDS) + " ")
+        await asyncio.sleep(1 / rate)
+    await emitter.send({"turn_complete": True, "interrupted": None})
+    return emitter.emits
+
+async def run_clients(url, count, seconds):
+    clients = []
+    for _ in range(count):
+        client = socketio.AsyncClient()
+        await client.connect(url, transports=["websocket"])
+        clients.append(client)
+    await asyncio.sleep(seconds)
+    for client in clients:
+        await client.disconnect()
+
+async def serve(args):
+    sio = socketio.AsyncServer(async_mode="aiohttp")
+    app = web.Application()
+    sio.attach(app)
+    sids = []
+
+    @sio.event
+    async def connect(sid, environ, auth=None):
+        sids.append(sid)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", args.port).start()
+
+    modes = [("per fragment", lambda sid: direct_stream(sio, sid, args.seconds, args.rate)),
+             ("coalesced json", lambda sid: coalesced_stream(sio, sid, args.seconds, args.rate, JSON)),
+             ("coalesced object", lambda sid: coalesced_stream(sio, sid, args.seconds, args.rate, OBJECT))]
+
+    clients = subprocess.Popen([sys.executable, __file__, "--client", "--port", str(args.port),
+                                "--sessions", str(args.sessions),
+                                "--seconds", str(args.seconds * len(modes) + 10)])
+    while len(sids) < args.sessions:
+        await asyncio.sleep(0.1)
+
+    print(f"{args.sessions} sessions, {args.rate} fragments/s each for {args.seconds}s")
+    for name, stream in modes:
+        cpu = time.process_time()
+        emits = sum(await asyncio.gather(*(stream(sid) for sid in sids)))
+        cpu = time.process_time() - cpu
+        print(f"{name:17} emits/s/session={emits / args.seconds / args.sessions:7.1f} "
+              f"cpu/session={1000 * cpu / args.seconds / args.sessions:6.2f}ms/s")
+
+    clients.terminate()
+    await runner.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rate", type=float, default=100, help="text fragments per second per session")
+    parser.add_argument("--port", type=int, default=8091)
+    parser.add_argument("--client", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.client:
+        asyncio.run(run_clients(f"http://127.0.0.1:{args.port}", args.sessions, args.seconds))
+    else:
+        asyncio.run(serve(args))
+
+if __name__ == "__main__":
+    main()
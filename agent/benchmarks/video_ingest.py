@@ -0,0 +1,127 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+CPU per second of video for one session's ingest: the previous path that
+converts selected frames to a PIL image and saves them as JPEG, against
+libav encoding in YUV, with and without a mosaic. Frames are decoded
+yuv420p as they come out of the WebRTC decoder; the decode itself is the
+same for all paths and not counted.
+
+Runs once selecting every frame, for the encode cost, and once with the
+default sampling of a moving scene, for what a session actually spends.
+Then checks that a mosaic still goes out for a mostly static scene, one
+that changes once halfway, within columns x rows / fps seconds of each
+view.
+
+    python benchmarks/video_ingest.py --seconds 20
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import av
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from endpoints.video_sampler import VideoSampler
+
+def make_frames(count, width, height):
+    """A smooth scene panning 2 pixels a frame, with a cut every 90 frames"""
+    rng = np.random.default_rng(1)
+    frames = []
+    for n in range(count):
+        if n % 90 == 0:
+            small = rng.integers(0, 255, (height // 16, (width + 180) // 16, 3), dtype=np.uint8)
+            scene = np.asarray(Image.fromarray(small).resize((width + 180, height), Image.BICUBIC))
+        offset = 2 * (n % 90)
+        rgb = np.ascontiguousarray(scene[:, offset:offset + width])
+        frames.append(av.VideoFrame.from_ndarray(rgb, format="rgb24").reformat(format="yuv420p"))
+    return frames
+
+class PilSampler(VideoSampler):
+    """The previous encode: downscale, convert to RGB for PIL and save as JPEG"""
+
+    def encode(self, frame):
+        start = time.perf_counter()
+        try:
+            width, height = self.target_size(frame.width, frame.height)
+            if (width, height) != (frame.width, frame.height):
+                frame = frame.reformat(width=width, height=height)
+            img_buffer = io.BytesIO()
+            frame.to_image().save(img_buffer, format="JPEG", quality=75)
+            return img_buffer.getvalue()
+        finally:
+            self.last_encode_time = time.perf_counter() - start
+            self.encoded += 1
+            self.encoding = False
+
+def run(sampler, frames, fps):
+    """Feed frames at fps of stream time, return CPU seconds and the images sent"""
+    images = []
+    cpu = time.process_time()
+    for n, frame in enumerate(frames):
+        if sampler.accept(frame, now=n / fps):
+            image = sampler.encode(frame)
+            if image:
+                images.append(image)
+    return time.process_time() - cpu, images
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--mosaic", default="2x2")
+    args = parser.parse_args()
+
+    frames = make_frames(int(args.seconds * args.fps), args.width, args.height)
+    mosaic = tuple(int(n) for n in args.mosaic.split("x"))
+    paths = [("pil", lambda **kw: PilSampler(**kw)),
+             ("libav", lambda **kw: VideoSampler(**kw)),
+             (f"libav {args.mosaic}", lambda **kw: VideoSampler(mosaic=mosaic, **kw))]
+
+    print(f"{len(frames)} frames of {args.width}x{args.height} at {args.fps}fps")
+    print(f"{'sampling':>9} {'path':>11} {'cpu/s video':>12} {'per frame':>10} {'images':>7} {'bytes/image':>12}")
+    for sampling, kwargs in (("every", dict(fps=0, change_threshold=0)), ("default", {})):
+        for name, make in paths:
+            sampler = make(**kwargs)
+            cpu, images = run(sampler, frames, args.fps)
+            for image in images:
+                # every image must decode as a JPEG of the sampler's size
+                assert Image.open(io.BytesIO(image)).size == sampler.target_size(args.width, args.height)
+            size = sum(map(len, images)) // len(images) if images else 0
+            print(f"{sampling:>9} {name:>11} {1000 * cpu / args.seconds:>10.1f}ms "
+                  f"{1e6 * cpu / len(frames):>8.0f}us {len(images):>7} {size:>12}")
+
+    # static but for one change halfway: both views must go out, each in a partly filled mosaic
+    half = len(frames) // 2
+    static = [frames[0]] * half + [frames[half + 45]] * (len(frames) - half)
+    sampler = VideoSampler(mosaic=mosaic)
+    sent = []
+    for n, frame in enumerate(static):
+        if sampler.accept(frame, now=n / args.fps) and sampler.encode(frame):
+            sent.append(n / args.fps)
+    period = mosaic[0] * mosaic[1] * sampler.min_interval
+    print(f"static scene with a {args.mosaic} mosaic: images at {', '.join(f'{t:.1f}s' for t in sent)}")
+    assert len(sent) == 2 and sent[0] <= period + 1 and sent[1] <= half / args.fps + period + 1, sent
+
+if __name__ == "__main__":
+    main()
@@ -14,133 +14,313 @@
 
 import asyncio
 import logging
-import json
-import base64
 
-from google.genai.types import (
-    Part,
-    Content,
-    Blob,
-)
+from google.genai.types import Part
 
 from google.adk.runners import InMemoryRunner
-from google.adk.agents import LiveRequestQueue
 from google.adk.agents.run_config import RunConfig
 
 from google.adk.agents import Agent
 
+from logging_config import SampledLogger
+from runtime_config import AgentConfig, QueueConfig
+
+from .datachannel import DataChannelEmitter
+from .emitter import MessageEmitter
+from .live_queue import BoundedLiveRequestQueue
+
 logger = logging.getLogger(__name__)
 
-root_agent = Agent(
-   # A unique name for the agent.
-   name="google_search_agent",
-   # The Large Language Model (LLM) that agent will use.
-   model="gemini-2.0-flash-exp", # if this model does not work, try below
-   # model="gemini-2.0-flash-live-001",
-   # A short description of the agent's purpose.
-   description="Agent to answer questions.",
-   # Instructions to set the agent's behavior.
-   instruction="Answer the users questions.",
-   # Add google_search tool to perform grounding with Google search.
-   # tools=[google_search],
-)
+def build_agent(config):
+   """Build an agent from its definition in the config"""
+   return Agent(
+      # A unique name for the agent.
+      name=config.name,
+      # The Large Language Model (LLM) that agent will use, if
+      # gemini-2.0-flash-exp does not work try gemini-2.0-flash-live-001
+      model=config.model,
+      # A short description of the agent's purpose.
+      description=config.description,
+      # Instructions to set the agent's behavior.
+      instruction=config.instruction,
+      # Add google_search tool to perform grounding with Google search.
+      # tools=[google_search],
+   )
+
+root_agent = build_agent(AgentConfig())
+
+APP_NAME = "google_live_agent"
+USER_ID = "Brian"
+
+class AgentPool():
+   """
+   Shared runner for root_agent plus a pool of pre-created sessions, so
+   starting an agent for a new client does not build anything on the
+   critical path of WebRTC negotiation.
+   """
+
+   def __init__(self, agent=root_agent, size=4, user_id=USER_ID, runner=None):
+      # a runner can be passed in, e.g. a scripted stand-in for benchmarks
+      self.runner = runner or InMemoryRunner(
+         app_name=APP_NAME,
+         agent=agent,
+      )
+      self.size = size
+      self.user_id = user_id
+      self.sessions = []
+      self.refill_task = None
+
+   async def start(self):
+      """Pre-create the pool of sessions"""
+      await self.refill()
+      logger.info("Agent pool ready with %d sessions", len(self.sessions))
+
+   async def refill(self):
+      while len(self.sessions) < self.size:
+         self.sessions.append(await self.create_session())
+
+   async def create_session(self):
+      return await self.runner.session_service.create_session(
+         app_name=APP_NAME,
+         user_id=self.user_id,
+      )
+
+   async def acquire_session(self):
+      """Take a ready session from the pool, topping it up in the background"""
+      session = self.sessions.pop() if self.sessions else await self.create_session()
+      if self.refill_task is None or self.refill_task.done():
+         self.refill_task = asyncio.create_task(self.refill())
+      return session
+
+   async def release_session(self, session):
+      """Drop a finished session from the session service"""
+      await self.runner.session_service.delete_session(
+         app_name=APP_NAME,
+         user_id=session.user_id,
+         session_id=session.id,
+      )
+
+   def create_agent(self, sio, sid, session, responseType="text", queues=None):
+      return GeminiAgent(sio, sid, session, responseType, pool=self, queues=queues)
+
+class AgentRegistry():
+   """
+   An AgentPool for each agent definition in the config, so clients can
+   be given different agents through their profile.
+   """
+
+   def __init__(self, pools):
+      self.pools = pools
+
+   @classmethod
+   def from_config(cls, agents, pool_size=4):
+      return cls({name: AgentPool(build_agent(agent), size=pool_size) for name, agent in agents.items()})
+
+   async def start(self):
+      # a pool can serve several agent names
+      for pool in {id(pool): pool for pool in self.pools.values()}.values():
+         await pool.start()
+
+   def create_agent(self, sio, sid, session, responseType="text", profile=None):
+      """Create an agent of the profile's agent definition, the default one without a profile"""
+      pool = self.pools[profile.agent if profile else "default"]
+      return pool.create_agent(sio, sid, session, responseType, profile.queues if profile else None)
 
 class GeminiAgent():
-   def __init__(self, sio, sid, webrtc_endpoint, responseType="text"):
+   def __init__(self, sio, sid, session, responseType="text", pool=None, queues=None):
       self.sio = sio
       self.sid = sid
-      self.webrtc_endpoint = webrtc_endpoint
+      # the WebRTCSession this agent speaks through
+      self.session = session
       self.responseType = responseType
-      self.live_request_queue = None
+      self.pool = pool
+      # depths of the live request queue and the emitter
+      self.queues = queues or QueueConfig()
+      self.agent_session = None
+      # created up front so media that arrives while the agent starts is queued,
+      # bounded so a slow model connection drops stale media instead of growing
+      self.live_request_queue = self.create_queue()
       self.live_events = None
+      self.messaging_task = None
+      # set when a client resumes with settings the live connection was not opened with
+      self.reconfigured = False
+      # over the client's data channel when it has one, otherwise coalescing
+      # partial text into fewer socket io messages
+      self.emitter = self.create_emitter()
+      # rate limited log for per-event messages
+      self.event_log = SampledLogger(logger, sid)
+
+   def create_queue(self):
+      return BoundedLiveRequestQueue(video_frames=self.queues.video_frames, audio_bytes=self.queues.audio_bytes,
+                                     control=self.queues.control,
+                                     metrics=self.session.metrics if self.session else None)
+
+   def create_emitter(self):
+      metrics = self.session.metrics if self.session else None
+      channel = self.session and self.session.data_channel
+      if channel is not None and channel.readyState == "open":
+         return DataChannelEmitter(channel, clock=self.session.audio_position, window=self.queues.emit_window,
+                                   metrics=metrics, max_wait=self.queues.emit_max_wait)
+      return MessageEmitter(self.sio, self.sid, window=self.queues.emit_window, metrics=metrics,
+                            max_backlog=self.queues.emit_max_backlog, max_pending=self.queues.emit_max_pending,
+                            max_wait=self.queues.emit_max_wait, payload=self.queues.emit_payload)
+
+   def update_transport(self):
+      """Switch to the data channel once the client opened it, back to Socket.IO if it closed"""
+      if self.session is None:
+         return
+      emitter = self.create_emitter()
+      if type(emitter) is type(self.emitter):
+         return
+      old, self.emitter = self.emitter, emitter
+      logger.info("Agent messages for session %s now go over %s", self.sid, type(self.emitter).__name__)
+      # text already held by the old transport still goes out there
+      asyncio.create_task(old.flush()).add_done_callback(lambda _: old.close())
 
    async def start(self):
       logger.info("Starting GeminiAgent...")
 
       is_audio = self.responseType == "audio"
-      await self.start_agent_session(user_id="Brian", is_audio=is_audio)
+      await self.start_agent_session(is_audio=is_audio)
 
       # Start the agent to client messaging loop
-      asyncio.create_task(self.agent_to_client_messaging(self.live_events, self.sid))
+      self.messaging_task = asyncio.create_task(self.agent_to_client_messaging(self.live_events, self.sid))
 
-   async def start_agent_session(self, user_id, is_audio=False):
+   async def start_agent_session(self, is_audio=False):
       """Starts an agent session"""
-      logger.info(f"Starting agent session for user {user_id} with is_audio={is_audio}")
+      if self.pool is None:
+         self.pool = AgentPool(size=0)
 
-      # Create a Runner
-      runner = InMemoryRunner(
-         app_name="google_live_agent",
-         agent=root_agent,
-      )
-
-      # Create a Session
-      session = await runner.session_service.create_session(
-         app_name="google_live_agent",
-         user_id=user_id,
-      )
+      # Take a ready session from the shared runner, or keep the
+      # conversation when a resumed agent reconnects to the model
+      if self.agent_session is None:
+         self.agent_session = await self.pool.acquire_session()
+      logger.info("Starting agent session %s for user %s with is_audio=%s",
+                  self.agent_session.id, self.agent_session.user_id, is_audio)
 
       # Set response modality
       modality = "AUDIO" if is_audio else "TEXT"
       run_config = RunConfig(response_modalities=[modality])
 
-      # Create a LiveRequestQueue for this session
-      self.live_request_queue = LiveRequestQueue()
-
       # Start agent session
-      self.live_events = runner.run_live(
-         session=session,
+      self.live_events = self.pool.runner.run_live(
+         session=self.agent_session,
          live_request_queue=self.live_request_queue,
          run_config=run_config,
       )
 
+   @property
+   def live(self):
+      """True while the live connection to the model is open"""
+      return self.messaging_task is not None and not self.messaging_task.done()
+
+   def detach(self):
+      """Stop speaking through the session, the client went away. Events from the model are dropped meanwhile."""
+      self.session = None
+      self.emitter.close()
+
+   def attach(self, sio, sid, session, responseType=None, queues=None):
+      """Speak through the session of a client that resumed, with the response type and queues it asks for now"""
+      responseType = responseType or self.responseType
+      queues = queues or self.queues
+      # the live connection has the modality and the queue depths it was opened with
+      self.reconfigured = (responseType, queues) != (self.responseType, self.queues)
+      self.responseType = responseType
+      self.queues = queues
+      self.sio = sio
+      self.sid = sid
+      self.session = session
+      self.emitter = self.create_emitter()
+      self.event_log = SampledLogger(logger, sid)
+      self.live_request_queue.queue.metrics = session.metrics
+
+   async def resume(self):
+      """
+      Reopen the live connection if it closed while the client was away, or
+      restart it if the client resumed with another response type or queues.
+      The conversation is kept either way.
+      """
+      if self.live and not self.reconfigured:
+         return
+      if self.live:
+         logger.info("Restarting agent session %s with responseType=%s", self.agent_session.id, self.responseType)
+         self.live_request_queue.close()
+         self.messaging_task.cancel()
+      else:
+         logger.info("Reconnecting agent session %s to the model", self.agent_session.id)
+      self.reconfigured = False
+      self.live_request_queue = self.create_queue()
+      await self.start()
+
    async def close(self):
       """Closes the agent session"""
       logger.info("Closing agent session...")
 
       # Cleanup the session
       if self.live_request_queue:
+          logger.info("Live queue stats for session %s: %s", self.sid, self.live_request_queue.queue.stats())
           self.live_request_queue.close()
+      if self.messaging_task:
+          self.messaging_task.cancel()
+      self.messaging_task = None
+      self.emitter.close()
+      if self.agent_session:
+          await self.pool.release_session(self.agent_session)
+      self.agent_session = None
       self.live_request_queue = None
       self.live_events = None
 
    async def agent_to_client_messaging(self, live_events, sid):
       """Agent to client communication"""
-      logger.info(f"Agent to client messaging started for session {sid}")
-
-      while True:
-         async for event in live_events:
-               logger.info(f"[AGENT TO CLIENT]: {event}")
-               # If the turn complete or interrupted, send it
-               if event.turn_complete or event.interrupted:
-                  message = {
-                     "turn_complete": event.turn_complete,
-                     "interrupted": event.interrupted,
-                  }
-                  await self.sio.emit('message', json.dumps(message), room=sid)
-                  logger.info(f"[AGENT TO CLIENT]: {message}")
-                  continue
-
-               # Read the Content and its first Part
-               part: Part = (
-                  event.content and event.content.parts and event.content.parts[0]
-               )
-               if not part:
-                  continue
-
-               # If it's audio, send through WebRTC channel
-               is_audio = part.inline_data and part.inline_data.mime_type.startswith("audio/pcm")
-               if is_audio:
-                  audio_data = part.inline_data and part.inline_data.data
-                  if audio_data and self.webrtc_endpoint:
-                     await self.webrtc_endpoint.send_audio_to_client(audio_data)
-                     logger.info(f"[AGENT TO CLIENT]: audio/pcm via WebRTC: {len(audio_data)} bytes.")
-                     continue
-
-               # If it's text and a parial text, send it
-               if part.text and event.partial:
-                  message = {
-                     "mime_type": "text/plain",
-                     "data": part.text
-                  }
-                  await self.sio.emit('message', json.dumps(message), room=sid)
-                  logger.info(f"[AGENT TO CLIENT]: text/plain: {message}")
+      logger.info("Agent to client messaging started for session %s", sid)
+
+      async for event in live_events:
+         if self.session is None:
+            # parked until the client resumes
+            continue
+         self.event_log.debug("[AGENT TO CLIENT]: %s", event)
+         if self.session:
+            self.session.mark("first_agent_event")
+            self.session.metrics.inc("agent_events")
+         # If the turn complete or interrupted, send it
+         if event.turn_complete or event.interrupted:
+            # Stop playing the agent's audio before telling the client
+            if event.interrupted and self.session:
+               self.session.interrupt()
+            message = {
+               "turn_complete": event.turn_complete,
+               "interrupted": event.interrupted,
+            }
+            if self.session:
+               self.session.record("turn", **message)
+            # flushes any pending text first
+            await self.emitter.send(message)
+            logger.info("[AGENT TO CLIENT]: %s", message)
+            continue
+
+         # Read the Content and its first Part
+         part: Part = (
+            event.content and event.content.parts and event.content.parts[0]
+         )
+         if not part:
+            continue
+
+         # If it's audio, send through WebRTC channel
+         is_audio = part.inline_data and part.inline_data.mime_type.startswith("audio/pcm")
+         if is_audio:
+            audio_data = part.inline_data and part.inline_data.data
+            if audio_data and self.session:
+               await self.session.send_audio_to_client(audio_data)
+               self.event_log.debug("[AGENT TO CLIENT]: audio/pcm via WebRTC: %d bytes.", len(audio_data))
+               continue
+
+         # If it's text and a parial text, send it
+         if part.text and event.partial:
+            if self.session:
+               self.session.mark("first_agent_text")
+               self.session.record("text", text=part.text)
+            await self.emitter.send_text(part.text)
+            self.event_log.debug("[AGENT TO CLIENT]: text/plain: %d chars", len(part.text))
+
+      # the model closed the live connection, a resumed client reopens it
+      logger.info("Live events ended for session %s", self.sid)
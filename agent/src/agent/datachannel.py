@@ -0,0 +1,197 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Agent messages over an RTCDataChannel on the client's peer connection.
+
+Every message is one binary frame: a 1 byte kind, the 4 byte agent audio
+pts in samples (big endian, wrapping) the message lines up with, then for
+text the UTF-8 fragment. Control kinds are flags, so a turn that is both
+complete and interrupted is a single frame.
+"""
+
+import asyncio
+import logging
+import struct
+import time
+
+logger = logging.getLogger(__name__)
+
+# label of the channel the client opens for agent messages
+LABEL = "agent"
+
+TEXT = 0x01
+TURN_COMPLETE = 0x02
+INTERRUPTED = 0x04
+
+HEADER = struct.Struct("!BI")
+
+def encode_frame(kind, pts, text=""):
+    return HEADER.pack(kind, pts & 0xFFFFFFFF) + text.encode()
+
+def decode_frame(data):
+    """Return (kind, pts, text) of a frame"""
+    kind, pts = HEADER.unpack_from(data)
+    return kind, pts, bytes(data[HEADER.size:]).decode()
+
+def message_frame(message, pts):
+    """The frame of a turn_complete / interrupted message as sent to Socket.IO"""
+    kind = (TURN_COMPLETE if message.get("turn_complete") else 0) | (INTERRUPTED if message.get("interrupted") else 0)
+    return encode_frame(kind, pts)
+
+class DataChannelEmitter:
+    """
+    Sends agent messages to one client over its data channel, with the
+    interface of MessageEmitter.
+
+    Text fragments are held for up to `window` seconds or `max_bytes` and
+    sent as one frame, stamped with the position of the agent audio queued
+    when its first fragment arrived so captions line up with what is heard.
+    Any other message flushes pending text first. While the channel has
+    `max_buffered` bytes not yet sent, text keeps coalescing and other
+    messages are held behind it, as with a slow Socket.IO client, and the
+    held text is dropped if the channel is still behind after `max_wait`
+    seconds.
+    """
+
+    def __init__(self, channel, clock=None, window=0.03, max_bytes=1024, max_buffered=65536, metrics=None,
+                 max_wait=0.5):
+        self.channel = channel
+        # agent audio pts in samples that a message sent now lines up with
+        self.clock = clock or (lambda: 0)
+        self.window = window
+        self.max_bytes = max_bytes
+        self.max_buffered = max_buffered
+        self.max_wait = max_wait
+        self.metrics = metrics
+        # (pts, text) fragments, and frames of messages held behind them
+        self.pending = []
+        self.pending_bytes = 0
+        self.pending_bytes = 0
+        self.behind_since = None
+        self.flush_timer = None
+
+        self.fragments = 0
+        self.emits = 0
+        self.deferred = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.dropped_bytes = 0
+
+    @property
+    def open(self):
+        return self.channel.readyState == "open"
+
+    def backlogged(self):
+        return self.channel.bufferedAmount >= self.max_buffered
+
+    def behind(self):
+        """Seconds since the channel fell behind, from the first time it is seen"""
+        now = asyncio.get_running_loop().time()
+        if self.behind_since is None:
+            self.behind_since = now
+        return now - self.behind_since
+
+    def drop_text(self):
+        """Give up on the held text of a channel that stays behind"""
+        dropped = self.pending_bytes
+        self.timeouts += 1
+        self.dropped_bytes += dropped
+        if self.metrics:
+            self.metrics.inc("emit_timeouts")
+            self.metrics.inc("emit_text_dropped_bytes", dropped)
+        self.pending = [item for item in self.pending if not isinstance(item, tuple)]
+        self.pending_bytes = 0
+
+    async def send_text(self, text):
+        """Queue a partial text fragment"""
+        self.fragments += 1
+        self.pending.append((self.clock(), text))
+        self.pending_bytes += len(text)
+        if self.pending_bytes >= self.max_bytes and not self.backlogged():
+            await self.flush()
+        elif self.flush_timer is None:
+            self.flush_timer = asyncio.get_running_loop().call_later(self.window, self.schedule_flush)
+
+    async def send(self, message):
+        """Flush pending text, then send a turn_complete / interrupted message"""
+        # stamped now, when the audio it follows has been queued
+        frame = message_frame(message, self.clock())
+        if self.backlogged() and self.open:
+            self.waits += 1
+            if self.metrics:
+                self.metrics.inc("emit_waits")
+            self.pending.append(frame)
+            self.behind()
+            if self.flush_timer is None:
+                self.flush_timer = asyncio.get_running_loop().call_later(self.window, self.schedule_flush)
+            return
+        await self.flush()
+        self.write(frame)
+
+    def schedule_flush(self):
+        self.flush_timer = None
+        if self.backlogged() and self.open:
+            if self.behind() < self.max_wait:
+                self.deferred += 1
+                if self.metrics:
+                    self.metrics.inc("emits_deferred")
+                self.flush_timer = asyncio.get_running_loop().call_later(self.window, self.schedule_flush)
+                return
+            self.drop_text()
+        asyncio.create_task(self.flush())
+
+    async def flush(self):
+        """Send pending text as a single frame, and held messages in order"""
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        self.behind_since = None
+        items, self.pending = self.pending, []
+        self.pending_bytes = 0
+        text = []
+        for item in items:
+            if isinstance(item, tuple):
+                text.append(item)
+                continue
+            if text:
+                self.write(self.text_frame(text))
+                text = []
+            self.write(item)
+        if text:
+            self.write(self.text_frame(text))
+
+    def text_frame(self, fragments):
+        """One frame of consecutive (pts, text) fragments, at the pts of the first"""
+        return encode_frame(TEXT, fragments[0][0], "".join(text for _, text in fragments))
+
+    def write(self, frame):
+        if not self.open:
+            # the client went away, like a Socket.IO emit to a closed socket
+            return
+        self.emits += 1
+        start = time.perf_counter()
+        self.channel.send(frame)
+        if self.metrics:
+            self.metrics.inc("emits")
+            self.metrics.inc("datachannel_messages")
+            self.metrics.observe("emit_seconds", time.perf_counter() - start)
+
+    def close(self):
+        """Drop pending text and held messages and stop the flush timer"""
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        self.pending = []
+        self.pending_bytes = 0
@@ -0,0 +1,177 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import json
+import time
+
+logger = logging.getLogger(__name__)
+
+# how messages are handed to socket io
+JSON = "json"        # a JSON string, what the app parses today
+OBJECT = "object"    # a dict, encoded once by the socket io serializer (JSON or msgpack)
+
+def socket_backlog(sio, sid):
+    """Packets queued by engine io for a Socket.IO client and not yet written"""
+    eio_sid = sio.manager.eio_sid_from_sid(sid, "/")
+    socket = sio.eio.sockets.get(eio_sid) if eio_sid is not None else None
+    return socket.queue.qsize() if socket else 0
+
+class MessageEmitter:
+    """
+    Sends agent messages to one Socket.IO client, coalescing partial text.
+
+    Text fragments are held for up to `window` seconds or `max_bytes` and
+    sent as one message. Any other message (turn complete, interrupted)
+    flushes pending text first so ordering is kept.
+
+    While the client has `max_backlog` packets it has not read yet, text
+    keeps coalescing instead of being sent and other messages are held
+    behind it, so the caller, which also carries the agent audio, never
+    waits for the client. A client still behind after `max_wait` seconds,
+    or with `max_pending` bytes of text held, loses the held text; the
+    other messages go out anyway.
+    """
+
+    def __init__(self, sio, sid, window=0.03, max_bytes=1024, payload=JSON, metrics=None,
+                 max_backlog=8, max_pending=16384, max_wait=0.5):
+        self.sio = sio
+        self.sid = sid
+        # session metrics for emit counts and latency, if any
+        self.metrics = metrics
+        self.window = window
+        self.max_bytes = max_bytes
+        self.payload = payload
+        self.max_backlog = max_backlog
+        self.max_pending = max_pending
+        self.max_wait = max_wait
+        # text fragments, and messages held behind them while the client is behind
+        self.pending = []
+        self.pending_bytes = 0
+        self.behind_since = None
+        self.flush_timer = None
+        # keeps timer flushes and direct sends in order
+        self.lock = asyncio.Lock()
+
+        self.fragments = 0
+        self.emits = 0
+        self.deferred = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.dropped_bytes = 0
+
+    def backlog(self):
+        return socket_backlog(self.sio, self.sid)
+
+    def backlogged(self):
+        return self.backlog() >= self.max_backlog
+
+    def behind(self):
+        """Seconds since the client fell behind, from the first time it is seen"""
+        now = asyncio.get_running_loop().time()
+        if self.behind_since is None:
+            self.behind_since = now
+        return now - self.behind_since
+
+    def drop_text(self):
+        """Give up on the held text of a client that stays behind"""
+        self.timeouts += 1
+        self.dropped_bytes += self.pending_bytes
+        if self.metrics:
+            self.metrics.inc("emit_timeouts")
+            self.metrics.inc("emit_text_dropped_bytes", self.pending_bytes)
+        self.pending = [item for item in self.pending if not isinstance(item, str)]
+        self.pending_bytes = 0
+
+    async def send_text(self, text):
+        """Queue a partial text fragment"""
+        self.fragments += 1
+        self.pending.append(text)
+        self.pending_bytes += len(text)
+
+        if self.pending_bytes >= self.max_pending and self.backlogged():
+            self.drop_text()
+            await self.flush()
+        elif self.pending_bytes >= self.max_bytes and not self.backlogged():
+            await self.flush()
+        elif self.flush_timer is None:
+            self.flush_timer = asyncio.get_running_loop().call_later(self.window, self.schedule_flush)
+
+    async def send(self, message):
+        """Flush pending text, then send a message, or hold both while the client is behind"""
+        if self.backlogged():
+            self.waits += 1
+            if self.metrics:
+                self.metrics.inc("emit_waits")
+            self.pending.append(message)
+            self.behind()
+            if self.flush_timer is None:
+                self.flush_timer = asyncio.get_running_loop().call_later(self.window, self.schedule_flush)
+            return
+        await self.flush(message)
+
+    def schedule_flush(self):
+        self.flush_timer = None
+        if self.backlogged():
+            if self.behind() < self.max_wait:
+                # hold the text back and keep coalescing until the client catches up
+                self.deferred += 1
+                if self.metrics:
+                    self.metrics.inc("emits_deferred")
+                self.flush_timer = asyncio.get_running_loop().call_later(self.window, self.schedule_flush)
+                return
+            self.drop_text()
+        asyncio.create_task(self.flush())
+
+    async def flush(self, *messages):
+        """Send pending text as a single message, held messages in order, then messages"""
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        self.behind_since = None
+        items = self.pending + list(messages)
+        self.pending = []
+        self.pending_bytes = 0
+
+        async with self.lock:
+            text = []
+            for item in items:
+                if isinstance(item, str):
+                    text.append(item)
+                    continue
+                if text:
+                    await self.emit({"mime_type": "text/plain", "data": "".join(text)})
+                    text = []
+                await self.emit(item)
+            if text:
+                await self.emit({"mime_type": "text/plain", "data": "".join(text)})
+
+    async def emit(self, message):
+        """Hand one message to Socket.IO, with the lock held"""
+        payload = json.dumps(message) if self.payload == JSON else message
+        self.emits += 1
+        start = time.perf_counter()
+        await self.sio.emit('message', payload, room=self.sid)
+        if self.metrics:
+            self.metrics.inc("emits")
+            self.metrics.observe("emit_seconds", time.perf_counter() - start)
+
+    def close(self):
+        """Drop pending text and held messages and stop the flush timer"""
+        if self.flush_timer is not None:
+            self.flush_timer.cancel()
+            self.flush_timer = None
+        self.pending = []
+        self.pending_bytes = 0
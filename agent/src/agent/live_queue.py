@@ -0,0 +1,173 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import collections
+
+from google.genai.types import Blob
+from google.adk.agents import LiveRequestQueue
+from google.adk.agents.live_request_queue import LiveRequest
+
+# lanes of the live queue and their overflow policies
+VIDEO = "video"        # drop the oldest frame
+AUDIO = "audio"        # merge into the pending chunk, drop the oldest samples
+CONTROL = "control"    # senders wait for space, never dropped
+
+class LiveQueue:
+    """
+    Bounded, ordered stand-in for the asyncio.Queue inside LiveRequestQueue.
+
+    Requests keep their order, but each kind of request has its own bound.
+    At most `video_frames` images wait to be sent, older ones are dropped.
+    Consecutive audio chunks are merged into one request, and at most
+    `audio_bytes` of audio wait, the oldest samples are dropped beyond that.
+    Control requests (content, activity and stream end, close) are never
+    dropped; `put` waits while `control` of them are pending.
+    """
+
+    def __init__(self, video_frames=2, audio_bytes=96000, control=16, metrics=None):
+        self.video_frames = video_frames
+        self.audio_bytes = audio_bytes
+        self.control = control
+        self.metrics = metrics
+        # [lane, request] or, for audio, [lane, [mime_type, bytearray]]
+        self.entries = collections.deque()
+        self.pending = {VIDEO: 0, AUDIO: 0, CONTROL: 0}
+        self.ready = asyncio.Event()
+        self.space = asyncio.Event()
+        self.space.set()
+
+        self.video_dropped = 0
+        self.audio_coalesced = 0
+        self.audio_dropped_bytes = 0
+        self.control_waits = 0
+
+    @staticmethod
+    def lane(request):
+        blob = request.blob
+        if blob is None or request.activity_start or request.activity_end or request.audio_stream_end or request.close:
+            return CONTROL
+        if blob.mime_type and blob.mime_type.startswith("audio/"):
+            return AUDIO
+        return VIDEO
+
+    def qsize(self):
+        return len(self.entries)
+
+    def empty(self):
+        return not self.entries
+
+    def put_nowait(self, request):
+        lane = self.lane(request)
+        if lane == VIDEO:
+            self.put_video(request)
+        elif lane == AUDIO:
+            self.put_audio(request.blob)
+        else:
+            # accepted even when full, so close always gets through
+            self.entries.append([CONTROL, request])
+            self.pending[CONTROL] += 1
+            if self.pending[CONTROL] >= self.control:
+                self.space.clear()
+        self.ready.set()
+
+    async def put(self, request):
+        """Queue a request, waiting while the control lane is full"""
+        if self.lane(request) == CONTROL and self.pending[CONTROL] >= self.control:
+            self.control_waits += 1
+            self.count("live_control_waits")
+            while self.pending[CONTROL] >= self.control:
+                await self.space.wait()
+        self.put_nowait(request)
+
+    def put_video(self, request):
+        if self.pending[VIDEO] >= self.video_frames:
+            for i, (lane, _) in enumerate(self.entries):
+                if lane == VIDEO:
+                    del self.entries[i]
+                    break
+            self.pending[VIDEO] -= 1
+            self.video_dropped += 1
+            self.count("live_video_dropped")
+        self.entries.append([VIDEO, request])
+        self.pending[VIDEO] += 1
+
+    def put_audio(self, blob):
+        last = self.entries[-1] if self.entries else None
+        if last is not None and last[0] == AUDIO and last[1][0] == blob.mime_type:
+            last[1][1] += blob.data
+            self.audio_coalesced += 1
+            self.count("live_audio_coalesced")
+        else:
+            self.entries.append([AUDIO, [blob.mime_type, bytearray(blob.data)]])
+        self.pending[AUDIO] += len(blob.data)
+
+        # drop the oldest samples, a whole number of 16 bit samples at a time
+        while self.pending[AUDIO] > self.audio_bytes:
+            excess = self.pending[AUDIO] - self.audio_bytes
+            excess += excess & 1
+            for i, (lane, item) in enumerate(self.entries):
+                if lane == AUDIO:
+                    break
+            data = item[1]
+            if len(data) <= excess:
+                del self.entries[i]
+                excess = len(data)
+            else:
+                del data[:excess]
+            self.pending[AUDIO] -= excess
+            self.audio_dropped_bytes += excess
+            self.count("live_audio_dropped_bytes", excess)
+
+    async def get(self):
+        while not self.entries:
+            self.ready.clear()
+            await self.ready.wait()
+        lane, item = self.entries.popleft()
+        if lane == AUDIO:
+            mime_type, data = item
+            self.pending[AUDIO] -= len(data)
+            return LiveRequest(blob=Blob(data=bytes(data), mime_type=mime_type))
+        self.pending[lane] -= 1
+        if lane == CONTROL and self.pending[CONTROL] < self.control:
+            self.space.set()
+        return item
+
+    def count(self, name, value=1):
+        if self.metrics:
+            self.metrics.inc(name, value)
+
+    def stats(self):
+        return {
+            "pending": self.qsize(),
+            "video_dropped": self.video_dropped,
+            "audio_coalesced": self.audio_coalesced,
+            "audio_dropped_bytes": self.audio_dropped_bytes,
+            "control_waits": self.control_waits,
+        }
+
+class BoundedLiveRequestQueue(LiveRequestQueue):
+    """LiveRequestQueue backed by a LiveQueue, so a slow model connection cannot grow it without bound"""
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self._queue = LiveQueue(**kwargs)
+
+    @property
+    def queue(self):
+        return self._queue
+
+    async def send_control(self, request):
+        """Send a control request, waiting while too many are pending"""
+        await self._queue.put(request)
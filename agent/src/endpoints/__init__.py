@@ -1,2 +1,17 @@
-from .socket_endpoint import SocketEndpoint
-from .webrtc_endpoint import WebRTCEndpoint
+import importlib
+
+# imported on first use, so the light endpoints (metrics, health) are
+# served while the media stack behind the others is still loading
+EXPORTS = {
+    "SocketEndpoint": "socket_endpoint",
+    "WebRTCEndpoint": "webrtc_endpoint",
+    "MetricsEndpoint": "metrics",
+    "MetricsRegistry": "metrics",
+    "LoopLagMonitor": "metrics",
+    "HealthEndpoint": "health",
+}
+
+def __getattr__(name):
+    if name not in EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(f".{EXPORTS[name]}", __name__), name)
@@ -0,0 +1,167 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import collections
+import dataclasses
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# load levels, from the worst signal
+NORMAL = 0
+DEGRADED = 1
+FULL = 2
+
+# a media job average older than this no longer says anything about load
+MEDIA_STALE_SECONDS = 5.0
+
+class Overloaded(Exception):
+    """The worker has no room for another session, try again after retry_after seconds"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Decides whether /offer takes a new session, from the load of the worker:
+    sessions (live ones and agents parked for a resume), event loop lag, and
+    the media executor's backlog and job time.
+
+    Below every degrade threshold a session gets the profile it asked for.
+    Past one it gets the degraded profile, by default the same without
+    video. Past a max threshold the offer waits, first come first served,
+    for up to queue_timeout for the load to drop. It is turned away with
+    Overloaded when that runs out or queue_size offers are already waiting.
+    """
+
+    def __init__(self, config, sessions, lag_monitor=None, executor=None, profiles=None, metrics=None,
+                 poll=0.1):
+        self.config = config
+        # number of live and parked sessions
+        self.sessions = sessions
+        self.lag_monitor = lag_monitor
+        self.executor = executor
+        # named profiles, for the degraded one
+        self.profiles = profiles or {}
+        self.metrics = metrics
+        self.poll = poll
+        self.waiting = collections.deque()
+        # offers admitted but not yet registered as sessions
+        self.admitting = 0
+
+    def signals(self):
+        """Each load signal and its value"""
+        signals = {"sessions": self.sessions() + self.admitting}
+        if self.lag_monitor:
+            signals["loop_lag"] = self.lag_monitor.peak
+        if self.executor:
+            recent = time.perf_counter() - self.executor.last_job < MEDIA_STALE_SECONDS
+            signals["media_seconds"] = self.executor.job_seconds if recent else 0.0
+            signals["media_pending"] = self.executor.pending
+        return signals
+
+    def level(self):
+        """NORMAL, DEGRADED or FULL, with the signal that decided it"""
+        c = self.config
+        limits = {
+            "sessions": (c.degrade_sessions, c.max_sessions),
+            "loop_lag": (c.degrade_loop_lag, c.max_loop_lag),
+            "media_seconds": (c.degrade_media_seconds, c.max_media_seconds),
+        }
+        if self.executor:
+            # jobs queued behind busy threads, and a pool that turns jobs away
+            limits["media_pending"] = (self.executor.workers + 1, self.executor.max_pending)
+        level, reason = NORMAL, None
+        for name, value in self.signals().items():
+            degrade, full = limits[name]
+            if full and value >= full:
+                return FULL, name
+            if degrade and value >= degrade and level == NORMAL:
+                level, reason = DEGRADED, name
+        return level, reason
+
+    async def admit(self, profile):
+        """
+        The profile to start a session with, once there is room for it.
+        Raises Overloaded when there is not. Call `admitted` once the
+        session is registered.
+        """
+        if not self.config.enabled:
+            self.admitting += 1
+            return profile
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        level, reason = self.level()
+        if level == FULL or self.waiting:
+            if len(self.waiting) >= self.config.queue_size:
+                self.reject("queue full")
+            self.count("offers_queued")
+            level, reason = await self.wait(reason)
+        self.admitting += 1
+        waited = loop.time() - start
+        if self.metrics and waited:
+            self.metrics.observe("admission_wait_seconds", waited)
+        if level == DEGRADED:
+            self.count("offers_degraded")
+            logger.info("Admitting a session degraded because of %s, after %.0fms", reason, 1000 * waited)
+            return self.degrade(profile)
+        self.count("offers_admitted")
+        return profile
+
+    async def wait(self, reason):
+        """Wait in line until the worker is below FULL, or raise Overloaded"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.config.queue_timeout
+        ticket = object()
+        self.waiting.append(ticket)
+        try:
+            while True:
+                if self.waiting[0] is ticket:
+                    level, reason = self.level()
+                    if level != FULL:
+                        return level, reason
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    self.reject(f"full because of {reason}")
+                await asyncio.sleep(min(self.poll, remaining))
+        finally:
+            self.waiting.remove(ticket)
+
+    def admitted(self):
+        """An admitted offer has registered its session, or failed"""
+        self.admitting -= 1
+
+    def degrade(self, profile):
+        if self.config.degraded_profile:
+            return self.profiles[self.config.degraded_profile]
+        return dataclasses.replace(profile, video=dataclasses.replace(profile.video, enabled=False))
+
+    def reject(self, reason):
+        self.count("offers_rejected")
+        logger.warning("Turning away an offer, %s", reason)
+        raise Overloaded(reason, self.config.retry_after)
+
+    def count(self, name):
+        if self.metrics:
+            self.metrics.inc(name)
+
+    def collect_metrics(self):
+        """Gauges for a metrics scrape"""
+        if self.metrics:
+            self.metrics.set("admission_waiting", len(self.waiting))
+            self.metrics.set("admission_level", self.level()[0])
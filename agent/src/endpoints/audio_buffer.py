@@ -0,0 +1,134 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+
+class AudioRingBuffer:
+    """
+    Fixed capacity ring buffer of 16 bit PCM samples.
+
+    Storage is allocated once. Writes copy the incoming chunk in, reads hand
+    back a view of the next frame without moving the rest of the buffer, so
+    the cost per frame does not depend on how much audio is queued. When a
+    write does not fit, the overflow policy either discards the oldest queued
+    samples or the newest incoming ones.
+    """
+
+    def __init__(self, capacity, frame_size, overflow=DROP_OLDEST):
+        if overflow not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown overflow policy {overflow}")
+        self.capacity = capacity
+        self.frame_size = frame_size
+        self.overflow = overflow
+        self.data = np.zeros(capacity, dtype=np.int16)
+        self.start = 0
+        self.size = 0
+        self.dropped = 0
+        # samples ever written and ever taken from the head (read or dropped)
+        self.total_in = 0
+        self.total_out = 0
+        # scratch frame for reads that wrap around or need padding
+        self.scratch = np.zeros(frame_size, dtype=np.int16)
+        # shared frame of silence, must not be written to
+        self.silence = np.zeros(frame_size, dtype=np.int16)
+        self.silence.flags.writeable = False
+
+    def __len__(self):
+        return self.size
+
+    def write(self, pcm):
+        """Append PCM bytes (or an int16 array), applying the overflow policy"""
+        samples = pcm if isinstance(pcm, np.ndarray) else np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2)
+        count = len(samples)
+        free = self.capacity - self.size
+
+        if count > free:
+            if self.overflow == DROP_NEWEST:
+                self.dropped += count - free
+                samples = samples[:free]
+                count = free
+            else:
+                if count > self.capacity:
+                    self.dropped += count - self.capacity
+                    samples = samples[-self.capacity:]
+                    count = self.capacity
+                excess = count - (self.capacity - self.size)
+                if excess > 0:
+                    self.dropped += excess
+                    self.discard(excess)
+
+        if count == 0:
+            return 0
+
+        end = (self.start + self.size) % self.capacity
+        first = min(count, self.capacity - end)
+        self.data[end:end + first] = samples[:first]
+        if first < count:
+            self.data[:count - first] = samples[first:]
+        self.size += count
+        self.total_in += count
+        return count
+
+    def read(self):
+        """
+        Return the next frame of samples, padded with silence if fewer are
+        queued. The returned array is only valid until the next write or read.
+        """
+        if self.size == 0:
+            return self.silence
+
+        count = min(self.frame_size, self.size)
+        if count == self.frame_size and self.start + count <= self.capacity:
+            frame = self.data[self.start:self.start + count]
+        else:
+            frame = self.scratch
+            first = min(count, self.capacity - self.start)
+            frame[:first] = self.data[self.start:self.start + first]
+            frame[first:count] = self.data[:count - first]
+            frame[count:] = 0
+
+        self.start = (self.start + count) % self.capacity
+        self.size -= count
+        self.total_out += count
+        return frame
+
+    def peek_level(self):
+        """Return the peak amplitude of the next frame without consuming it"""
+        count = min(self.frame_size, self.size)
+        if count == 0:
+            return 0
+        first = min(count, self.capacity - self.start)
+        level = int(np.abs(self.data[self.start:self.start + first], dtype=np.int32).max())
+        if first < count:
+            level = max(level, int(np.abs(self.data[:count - first], dtype=np.int32).max()))
+        return level
+
+    def discard(self, count):
+        """Drop up to count samples from the head of the buffer"""
+        count = min(count, self.size)
+        self.start = (self.start + count) % self.capacity
+        self.size -= count
+        self.total_out += count
+        return count
+
+    def clear(self):
+        """Discard all queued samples"""
+        self.discard(self.size)
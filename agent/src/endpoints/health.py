@@ -0,0 +1,65 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from aiohttp import web
+import logging
+
+logger = logging.getLogger(__name__)
+
+class HealthEndpoint:
+    """
+    Liveness and readiness probes, served from the moment the port is bound.
+
+    /healthz answers 200 while the process runs. /ready answers 503 until
+    the server is ready and 200 after, with the startup profile either way.
+    Routes whose handlers are loaded later are registered up front with
+    `defer`, and answer 503 until `serve` gives them their handler.
+    """
+
+    def __init__(self, app, cors, profile):
+        logger.info("Initializing HealthEndpoint")
+        self.app = app
+        self.cors = cors
+        self.profile = profile
+        self.handlers = {}
+        self.addRoutes()
+
+    def addRoutes(self):
+        self.cors.add(self.app.router.add_get("/healthz", self.healthz))
+        self.cors.add(self.app.router.add_get("/ready", self.readiness))
+
+    def defer(self, method, path):
+        """Register a route now, for a handler that is loaded in the background"""
+        async def handler(request):
+            target = self.handlers.get(path)
+            if target is None:
+                # the client retries, a router or load balancer waits for /ready
+                return web.Response(status=503, headers={"Retry-After": "1"}, text="starting")
+            return await target(request)
+        self.cors.add(self.app.router.add_route(method, path, handler))
+
+    def serve(self, path, handler):
+        """Start answering a deferred route"""
+        self.handlers[path] = handler
+
+    def set_ready(self):
+        self.profile.ready = True
+        self.profile.mark("ready")
+        logger.info("Ready, startup profile %s", self.profile.report())
+
+    async def healthz(self, request):
+        return web.Response(text="ok")
+
+    async def readiness(self, request):
+        return web.json_response(self.profile.report(), status=200 if self.profile.ready else 503)
@@ -0,0 +1,79 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class MediaExecutor:
+    """
+    Thread pool for CPU heavy media work (JPEG encoding) so the event loop
+    only coordinates.
+
+    libav releases the GIL while encoding, so threads run in parallel. The
+    number of jobs queued or running is bounded: callers either wait for a
+    slot with run() or give up immediately with try_run().
+    """
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.max_pending = max_pending or self.workers * 4
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="media")
+        self.slots = asyncio.Semaphore(self.max_pending)
+        self.pending = 0
+        self.rejected = 0
+        # moving average of the run time of a job, without the wait for a thread
+        self.job_seconds = 0.0
+        self.last_job = 0.0
+        # jobs finish on several threads at once
+        self.timing_lock = threading.Lock()
+        logger.info("Media executor started with %d workers, %d pending jobs max", self.workers, self.max_pending)
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the pool, waiting for a free slot if it is full"""
+        async with self.slots:
+            return await self._run(fn, *args)
+
+    async def try_run(self, fn, *args):
+        """Run fn(*args) on the pool, or return None straight away if it is full"""
+        if self.slots.locked():
+            self.rejected += 1
+            return None
+        async with self.slots:
+            return await self._run(fn, *args)
+
+    async def _run(self, fn, *args):
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, self._timed, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            end = time.perf_counter()
+            with self.timing_lock:
+                self.job_seconds += 0.1 * (end - start - self.job_seconds)
+                self.last_job = end
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,259 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from aiohttp import web
+import asyncio
+import bisect
+import collections
+import logging
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "liveapp"
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# seconds, from sub millisecond media work up to slow agent starts
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    "audio_frames_in": "Audio frames received from the client",
+    "audio_chunks_sent": "Audio chunks sent to the agent",
+    "audio_frames_out": "Agent audio frames sent to the client",
+    "video_frames_in": "Video frames received from the client",
+    "video_frames_dropped": "Video frames dropped before encoding",
+    "video_frames_encoded": "Video frames encoded and sent to the agent",
+    "video_encode_seconds": "Time to downscale and JPEG encode a video frame",
+    "agent_events": "Events received from the live agent",
+    "emits": "Agent messages sent to the client, over Socket.IO or the data channel",
+    "emit_seconds": "Time to hand a message to Socket.IO or the data channel",
+    "event_loop_lag_seconds": "How late the event loop runs a timer",
+    "offer_to_answer_seconds": "Time from /offer to the SDP answer",
+    "offer_to_agent_started_seconds": "Time from /offer until the agent is started",
+    "offer_to_first_agent_event_seconds": "Time from /offer to the first live agent event",
+    "offer_to_first_agent_text_seconds": "Time from /offer to the first agent text",
+    "offer_to_first_agent_audio_seconds": "Time from /offer to the first agent audio",
+    "startup_bound_seconds": "Time from process start until the port was bound",
+    "startup_preloaded_seconds": "Time from process start until the media stack and the ADK were imported",
+    "startup_agents_started_seconds": "Time from process start until agent sessions were created ahead of time",
+    "startup_ready_seconds": "Time from process start until /ready succeeded",
+    "sessions": "Active sessions",
+    "resumable_sessions": "Agents parked for clients that may resume",
+    "sessions_parked": "Agents parked when their client went away",
+    "sessions_resumed": "Parked agents resumed by a reconnecting client",
+    "sessions_expired": "Parked agents closed because no client resumed them in time",
+    "sessions_evicted": "Parked agents closed to make room for newer ones",
+    "offer_to_agent_resumed_seconds": "Time from /offer until a parked agent is reattached",
+    "media_jobs_pending": "Jobs queued or running on the media executor",
+    "media_jobs_rejected": "Jobs turned away because the media executor was full",
+    "live_queue_depth": "Requests waiting in the agent's live request queue",
+    "live_video_dropped": "Video frames dropped because the live request queue was full",
+    "live_audio_coalesced": "Audio chunks merged into a pending live request",
+    "live_audio_dropped_bytes": "Audio bytes dropped because the live request queue was full",
+    "live_control_waits": "Times a control request waited for space in the live request queue",
+    "emits_deferred": "Text flushes held back because the client was behind",
+    "emit_waits": "Messages held back until a slow client caught up",
+    "emit_timeouts": "Times a client stayed behind for emit_max_wait and its held text was dropped",
+    "emit_text_dropped_bytes": "Agent text dropped for clients that stayed behind",
+    "datachannel_opened": "Sessions whose client opened a data channel for agent messages",
+    "datachannel_messages": "Agent messages sent over the data channel",
+    "recorded_bytes": "Bytes of media and events buffered for a session recording",
+    "recording_flushes": "Recording buffers handed to the writer thread",
+    "recording_dropped_bytes": "Recording bytes dropped because the writer was behind",
+    "recording_write_errors": "Recording writes that failed",
+    "offers_admitted": "Offers admitted with the profile they asked for",
+    "offers_degraded": "Offers admitted with the degraded profile because the worker was loaded",
+    "offers_queued": "Offers that waited for the worker to have room",
+    "offers_rejected": "Offers turned away with a Retry-After because the worker was full",
+    "admission_wait_seconds": "Time an admitted offer waited for room",
+    "admission_waiting": "Offers waiting for room",
+    "admission_level": "Load level of the worker, 0 normal, 1 degraded, 2 full",
+    "media_job_seconds": "Moving average of the run time of media executor jobs",
+    "playout_depth_seconds": "Agent audio queued for playout",
+    "playout_underruns": "Times agent audio playout ran dry mid-reply",
+    "playout_overflow_samples": "Agent audio samples dropped because the playout buffer was full",
+    "playout_latency_seconds": "Last arrival to playout latency of agent audio",
+}
+
+def escape(value):
+    """Escape a Prometheus label value"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Histogram:
+    """Cumulative bucket histogram in the Prometheus layout"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+class SessionMetrics:
+    """
+    Counters, gauges and histograms for one session. Counters and
+    histograms are also added to the process wide totals of the parent.
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.counters = collections.Counter()
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1):
+        self.counters[name] += value
+        if self.parent is not None:
+            self.parent.counters[name] += value
+
+    def set(self, name, value):
+        self.gauges[name] = value
+
+    def observe(self, name, value):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+        if self.parent is not None:
+            self.parent.observe(name, value)
+
+class MetricsRegistry:
+    """
+    Process wide metrics plus the metrics of every live session, rendered in
+    the Prometheus text format. Collectors are called on each scrape to
+    refresh gauges, so nothing is polled in between.
+    """
+
+    def __init__(self):
+        self.process = SessionMetrics()
+        self.sessions = {}
+        self.collectors = []
+
+    def session(self, sid):
+        """Create and register the metrics of a session"""
+        metrics = self.sessions[sid] = SessionMetrics(self.process)
+        return metrics
+
+    def remove(self, sid, metrics):
+        if self.sessions.get(sid) is metrics:
+            del self.sessions[sid]
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.error(f"Error collecting metrics: {e}")
+
+        series = [("", self.process)] + [(f'session="{escape(sid)}"', m) for sid, m in list(self.sessions.items())]
+        lines = []
+
+        for kind in ("counter", "gauge", "histogram"):
+            names = sorted({name for _, m in series for name in self.values(m, kind)})
+            for name in names:
+                metric = f"{PREFIX}_{name}" + ("_total" if kind == "counter" else "")
+                lines.append(f"# HELP {metric} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {metric} {kind}")
+                for labels, m in series:
+                    value = self.values(m, kind).get(name)
+                    if value is None:
+                        continue
+                    if kind == "histogram":
+                        self.render_histogram(lines, metric, labels, value)
+                    else:
+                        lines.append(f"{metric}{{{labels}}} {value}" if labels else f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def values(metrics, kind):
+        return {"counter": metrics.counters, "gauge": metrics.gauges, "histogram": metrics.histograms}[kind]
+
+    @staticmethod
+    def render_histogram(lines, metric, labels, histogram):
+        sep = "," if labels else ""
+        for bound, count in histogram.cumulative():
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{metric}_bucket{{{labels}{sep}le="{le}"}} {count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{metric}_sum{suffix} {histogram.sum}")
+        lines.append(f"{metric}_count{suffix} {histogram.count}")
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes from a short sleep"""
+
+    def __init__(self, metrics, interval=0.1, window=10):
+        self.metrics = metrics
+        self.interval = interval
+        self.lag = 0.0
+        # the last `window` samples, for the worst recent lag
+        self.recent = collections.deque(maxlen=window)
+        self.task = None
+
+    @property
+    def peak(self):
+        """The worst lag of the last `window` samples"""
+        return max(self.recent, default=0.0)
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - start - self.interval)
+            self.recent.append(self.lag)
+            self.metrics.observe("event_loop_lag_seconds", self.lag)
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+
+######################################################################
+# Metrics API
+######################################################################
+class MetricsEndpoint:
+
+    def __init__(self, app, cors, registry):
+        logger.info("Initializing MetricsEndpoint")
+        self.app = app
+        self.cors = cors
+        self.registry = registry
+        self.addRoutes()
+
+    def addRoutes(self):
+        metricsRoute = self.app.router.add_get("/metrics", self.metrics)
+        self.cors.add(metricsRoute)
+
+    async def metrics(self, request):
+        return web.Response(
+            headers={"Content-Type": CONTENT_TYPE},
+            text=self.registry.render(),
+        )
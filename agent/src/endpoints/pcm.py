@@ -0,0 +1,70 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from av import AudioResampler
+
+# the live model takes 16 bit mono PCM at 16kHz
+UPSTREAM_RATE = 16000
+
+def pcm_bytes(frame):
+    """The samples of a packed s16 frame, copied once out of its plane"""
+    return bytes(memoryview(frame.planes[0])[:frame.samples * 2 * len(frame.layout.channels)])
+
+class PcmConverter:
+    """
+    Converts the frames of one audio track to 16 bit mono PCM at `rate`.
+
+    Frames already in that format are copied straight out of their buffer.
+    Anything else goes through a resampler, created for the track's input
+    format when the first frame arrives and again if the format changes,
+    so no resampler state is shared between tracks.
+    """
+
+    def __init__(self, rate=UPSTREAM_RATE):
+        self.rate = rate
+        self.resampler = None
+        self.input_format = None
+        self.passthrough_frames = 0
+        self.resampled_frames = 0
+
+    def is_native(self, frame):
+        return (frame.sample_rate == self.rate and frame.format.name == "s16"
+                and len(frame.layout.channels) == 1)
+
+    def passthrough(self, frame):
+        self.passthrough_frames += 1
+        return pcm_bytes(frame)
+
+    def resample(self, frame):
+        input_format = (frame.format.name, frame.layout.name, frame.sample_rate)
+        if input_format != self.input_format:
+            self.resampler = AudioResampler(format="s16", layout="mono", rate=self.rate)
+            self.input_format = input_format
+        self.resampled_frames += 1
+        frames = self.resampler.resample(frame)
+        if len(frames) == 1:
+            return pcm_bytes(frames[0])
+        return b"".join(pcm_bytes(f) for f in frames)
+
+    def convert(self, frame):
+        if self.is_native(frame):
+            return self.passthrough(frame)
+        return self.resample(frame)
+
+    def stats(self):
+        return {
+            "input_format": self.input_format,
+            "passthrough_frames": self.passthrough_frames,
+            "resampled_frames": self.resampled_frames,
+        }
@@ -0,0 +1,235 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import collections
+import logging
+
+import numpy as np
+
+from .audio_buffer import AudioRingBuffer, DROP_OLDEST
+
+logger = logging.getLogger(__name__)
+
+IDLE = "idle"
+PLAYING = "playing"
+BUFFERING = "buffering"
+
+class PlayoutScheduler:
+    """
+    Paces agent audio against the event loop clock with an adaptive jitter
+    buffer.
+
+    Frames are released every frame_duration of wall time and stamped with
+    a sample counter, so pts never drifts from the clock. The first chunk
+    of a reply starts playing straight away. If the buffer runs dry
+    mid-reply, playout waits until target_depth is queued again, and each
+    such underrun raises the target by one frame up to max_depth. The
+    target decays back while playout is stable. If the caller stalls for
+    longer than max_lag, the clock jumps ahead and queued silence is dropped
+    to catch up.
+    """
+
+    def __init__(self, sample_rate=24000, frame_duration=0.02, target_depth=0.04, max_depth=0.2,
+                 idle_timeout=0.1, max_lag=0.1, max_buffer_seconds=30, overflow=DROP_OLDEST,
+                 silence_level=64):
+        self.sample_rate = sample_rate
+        self.frame_duration = frame_duration
+        self.frame_size = int(sample_rate * frame_duration)
+        self.min_target = max(self.frame_size, int(sample_rate * target_depth))
+        self.max_target = int(sample_rate * max_depth)
+        self.target = self.min_target
+        self.idle_timeout = idle_timeout
+        self.max_lag = max_lag
+        # peak amplitude at or below which a frame counts as silence
+        self.silence_level = silence_level
+
+        self.buffer = AudioRingBuffer(int(sample_rate * max_buffer_seconds), self.frame_size, overflow)
+        self.state = IDLE
+        self.buffering_since = None
+        self.start_time = None
+        self.frames = 0
+        self.stable_frames = 0
+        # (buffer position, arrival time) of each written chunk
+        self.arrivals = collections.deque()
+
+        # fade applied to the last frame played when the agent is interrupted
+        self.fade_ramp = np.linspace(1.0, 0.0, self.frame_size, dtype=np.float32)
+        self.fade_frame = np.zeros(self.frame_size, dtype=np.int16)
+        self.fading = False
+        self.interrupted_at = None
+
+        self.underruns = 0
+        self.interrupts = 0
+        self.silence_last = 0.0
+        self.silence_max = 0.0
+        self.stalls = 0
+        self.dropped_silence = 0
+        self.latency_last = 0.0
+        self.latency_max = 0.0
+        self.latency_total = 0.0
+        self.latency_count = 0
+
+    def write(self, pcm):
+        """Queue agent PCM for playout"""
+        position = self.buffer.total_in
+        if self.buffer.write(pcm):
+            self.arrivals.append((position, asyncio.get_running_loop().time()))
+
+    def clear(self):
+        """Drop all queued audio"""
+        self.buffer.clear()
+        self.arrivals.clear()
+        self.state = IDLE
+
+    def interrupt(self, fade_out=True):
+        """
+        Drop all queued audio because the user barged in. With fade_out the
+        next frame ramps the current audio down to zero instead of cutting it.
+        """
+        if self.state == IDLE and len(self.buffer) == 0:
+            return
+        if fade_out and len(self.buffer):
+            np.multiply(self.buffer.read(), self.fade_ramp, out=self.fade_frame, casting="unsafe")
+            self.fading = True
+        self.clear()
+        self.interrupts += 1
+        self.interrupted_at = asyncio.get_running_loop().time()
+
+    @property
+    def end_pts(self):
+        """pts at which the audio queued so far finishes playing"""
+        return self.frames * self.frame_size + len(self.buffer)
+
+    @property
+    def depth(self):
+        """Queued audio in seconds"""
+        return len(self.buffer) / self.sample_rate
+
+    async def next_frame(self):
+        """Wait for the next frame slot and return (samples, pts)"""
+        loop = asyncio.get_running_loop()
+        if self.start_time is None:
+            self.start_time = loop.time()
+
+        due = self.start_time + self.frames * self.frame_duration
+        now = loop.time()
+        if due > now:
+            await asyncio.sleep(due - now)
+        elif now - due > self.max_lag:
+            self.catch_up(now - due)
+
+        pts = self.frames * self.frame_size
+        self.frames += 1
+        return self.pull(loop.time()), pts
+
+    def catch_up(self, lag):
+        """Jump the clock forward after a stall and drop queued silence"""
+        skipped = int(lag / self.frame_duration)
+        self.frames += skipped
+        self.stalls += 1
+        dropped = 0
+        while dropped < skipped and len(self.buffer) >= self.frame_size and self.buffer.peek_level() <= self.silence_level:
+            self.buffer.discard(self.frame_size)
+            dropped += 1
+        self.dropped_silence += dropped
+        logger.debug("Playout stalled %.0fms, skipped %d frames, dropped %d silent", 1000 * lag, skipped, dropped)
+
+    def pull(self, now):
+        """Return the samples to play in this frame slot"""
+        if self.interrupted_at is not None:
+            return self.pull_interrupted(now)
+
+        queued = len(self.buffer)
+
+        if self.state == IDLE:
+            if queued == 0:
+                return self.buffer.silence
+            # fast start on the first chunk of a reply
+            self.state = PLAYING
+
+        elif self.state == BUFFERING:
+            if queued >= self.target:
+                # audio resumed after running dry mid-reply
+                self.underruns += 1
+                self.stable_frames = 0
+                self.target = min(self.max_target, self.target + self.frame_size)
+                self.state = PLAYING
+            elif now - self.buffering_since < self.idle_timeout:
+                return self.buffer.silence
+            elif queued == 0:
+                # nothing more came, the reply is over
+                self.state = IDLE
+                return self.buffer.silence
+            else:
+                # play out the tail of the reply
+                self.state = PLAYING
+                return self.read(now)
+
+        if queued < self.frame_size:
+            self.state = BUFFERING
+            self.buffering_since = now
+            return self.buffer.silence
+
+        return self.read(now)
+
+    def pull_interrupted(self, now):
+        """Play the fade out frame, if any, and record the time to silence"""
+        silent_at = now + self.frame_duration if self.fading else now
+        self.silence_last = silent_at - self.interrupted_at
+        self.silence_max = max(self.silence_max, self.silence_last)
+        self.interrupted_at = None
+        if self.fading:
+            self.fading = False
+            return self.fade_frame
+        return self.buffer.silence
+
+    def read(self, now):
+        """Take the next frame from the buffer"""
+        samples = self.buffer.read()
+        self.record_latency(now)
+
+        self.stable_frames += 1
+        if self.stable_frames >= 500 and self.target > self.min_target:
+            self.target = max(self.min_target, self.target - self.frame_size)
+            self.stable_frames = 0
+        return samples
+
+    def record_latency(self, now):
+        """Record arrival to playout latency for chunks that started playing"""
+        played = self.buffer.total_out
+        while self.arrivals and self.arrivals[0][0] < played:
+            _, arrival = self.arrivals.popleft()
+            self.latency_last = now - arrival
+            self.latency_max = max(self.latency_max, self.latency_last)
+            self.latency_total += self.latency_last
+            self.latency_count += 1
+
+    def stats(self):
+        """Return buffer depth, underrun and latency metrics"""
+        return {
+            "state": self.state,
+            "depth_ms": 1000 * self.depth,
+            "target_depth_ms": 1000 * self.target / self.sample_rate,
+            "underruns": self.underruns,
+            "interrupts": self.interrupts,
+            "time_to_silence_last_ms": 1000 * self.silence_last,
+            "time_to_silence_max_ms": 1000 * self.silence_max,
+            "stalls": self.stalls,
+            "dropped_silence_frames": self.dropped_silence,
+            "overflow_samples": self.buffer.dropped,
+            "latency_last_ms": 1000 * self.latency_last,
+            "latency_avg_ms": 1000 * self.latency_total / self.latency_count if self.latency_count else 0.0,
+            "latency_max_ms": 1000 * self.latency_max,
+        }
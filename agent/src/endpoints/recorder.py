@@ -0,0 +1,431 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Per session recordings for QA: user audio, sampled video frames, agent
+audio and agent events.
+
+A recording is a directory with, for each media stream, the payloads
+appended to one data file (raw s16le PCM, or JPEGs back to back) and an
+index of (seconds since start, offset, length) records, plus events as
+JSON lines and a meta.json describing the streams:
+
+    meta.json
+    user_audio.pcm   user_audio.idx
+    agent_audio.pcm  agent_audio.idx
+    video.jpg        video.idx
+    events.jsonl
+
+SessionRecorder copies what it is given into preallocated buffers on the
+event loop and hands full buffers to the RecordingWriter thread, which
+does all the file I/O. When the writer falls behind and a stream has no
+free buffer left, that batch is dropped and counted.
+"""
+
+import asyncio
+import collections
+import fractions
+import json
+import logging
+import mmap
+import os
+import queue
+import re
+import struct
+import threading
+import time
+
+import av
+import numpy as np
+from aiortc.contrib.media import MediaStreamTrack
+from av import AudioFrame, VideoFrame
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# seconds since the recording started, offset in the data file, length
+INDEX = struct.Struct("<dQI")
+INDEX_DTYPE = np.dtype([("t", "<f8"), ("offset", "<u8"), ("length", "<u4")])
+
+USER_AUDIO = "user_audio"
+AGENT_AUDIO = "agent_audio"
+VIDEO = "video"
+EVENTS = "events"
+
+STREAM_FILES = {
+    USER_AUDIO: "user_audio.pcm",
+    AGENT_AUDIO: "agent_audio.pcm",
+    VIDEO: "video.jpg",
+    EVENTS: "events.jsonl",
+}
+
+######################################################################
+# Writing
+######################################################################
+class RecordingWriter:
+    """
+    One background thread doing the file I/O of every recording in the
+    process, in the order jobs were submitted.
+    """
+
+    def __init__(self):
+        self.jobs = queue.SimpleQueue()
+        self.files = {}
+        self.written = 0
+        self.errors = 0
+        self.thread = threading.Thread(target=self.run, name="recorder", daemon=True)
+        self.thread.start()
+
+    def submit(self, job):
+        self.jobs.put(job)
+
+    def run(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            try:
+                job(self)
+            except Exception:
+                # only this job's write is lost, the thread goes on with the others
+                self.errors += 1
+                logger.exception("Recording write failed")
+
+    # jobs, called on the writer thread
+    def create(self, directory, meta):
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump(meta, f, indent=1)
+
+    def write(self, path, data):
+        f = self.files.get(path)
+        if f is None:
+            f = self.files[path] = open(path, "ab", buffering=0)
+        f.write(data)
+        self.written += len(data)
+
+    def close_files(self, directory):
+        for path in [p for p in self.files if os.path.dirname(p) == directory]:
+            self.files.pop(path).close()
+
+    def shutdown(self):
+        """Finish the queued writes and stop the thread"""
+        self.jobs.put(None)
+        self.thread.join()
+        for f in self.files.values():
+            f.close()
+        self.files.clear()
+
+class RecordedStream:
+    """
+    Buffers one stream of a recording: payloads go into a preallocated
+    data buffer, their index records into a small index buffer, and both
+    are written as one batch.
+    """
+
+    def __init__(self, directory, name, capacity, buffers, indexed=True):
+        self.data_path = os.path.join(directory, STREAM_FILES[name])
+        self.index_path = os.path.join(directory, name + ".idx") if indexed else None
+        self.capacity = capacity
+        # buffers the writer has finished with, appended to from its thread
+        self.free = collections.deque(bytearray(capacity) for _ in range(buffers))
+        self.buffer = self.free.popleft()
+        self.used = 0
+        self.index = bytearray()
+        self.batch = 0
+        # size of the data file once the batches handed to the writer are written
+        self.offset = 0
+
+        self.records = 0
+        self.dropped = 0
+        self.dropped_bytes = 0
+
+    def append(self, t, payload):
+        """Copy a payload into the buffer, False if it needs flushing first"""
+        size = len(payload)
+        if self.used + size > self.capacity:
+            return False
+        self.buffer[self.used:self.used + size] = payload
+        if self.index_path:
+            self.index += INDEX.pack(t, self.offset + self.used, size)
+        self.used += size
+        self.batch += 1
+        return True
+
+    def flush(self, writer):
+        """Hand the batch to the writer and take a free buffer, or drop it if there is none"""
+        if not self.used:
+            return True
+        if not self.free:
+            # the writer is behind, keep the buffer and lose this batch
+            self.dropped += self.batch
+            self.dropped_bytes += self.used
+            self.used, self.index, self.batch = 0, bytearray(), 0
+            return False
+        buffer, used, index = self.buffer, self.used, self.index
+        self.buffer, self.used, self.index = self.free.popleft(), 0, bytearray()
+        self.offset += used
+        self.records += self.batch
+        self.batch = 0
+        data_path, index_path, free = self.data_path, self.index_path, self.free
+
+        def job(w):
+            try:
+                w.write(data_path, memoryview(buffer)[:used])
+                if index_path:
+                    w.write(index_path, index)
+            finally:
+                free.append(buffer)
+
+        writer.submit(job)
+        return True
+
+class SessionRecorder:
+    """
+    Records one session into a directory of its own under `root`. Every
+    method is cheap and safe to call on the event loop; payloads larger
+    than a buffer are dropped.
+    """
+
+    def __init__(self, root, sid, writer, metrics=None, buffer_bytes=512 * 1024, buffers=2,
+                 flush_interval=1.0, user_rate=16000, agent_rate=24000):
+        name = time.strftime("%Y%m%d-%H%M%S") + "-" + re.sub(r"[^\w.-]", "_", sid)
+        self.directory = os.path.join(root, name)
+        self.writer = writer
+        self.metrics = metrics
+        self.flush_interval = flush_interval
+        self.start = time.monotonic()
+        self.last_flush = self.start
+        self.closed = False
+        self.streams = {
+            USER_AUDIO: RecordedStream(self.directory, USER_AUDIO, buffer_bytes, buffers),
+            AGENT_AUDIO: RecordedStream(self.directory, AGENT_AUDIO, buffer_bytes, buffers),
+            VIDEO: RecordedStream(self.directory, VIDEO, buffer_bytes, buffers),
+            EVENTS: RecordedStream(self.directory, EVENTS, buffer_bytes // 4, buffers, indexed=False),
+        }
+        meta = {
+            "version": FORMAT_VERSION,
+            "sid": sid,
+            "started": time.time(),
+            "streams": {
+                USER_AUDIO: {"format": "s16le", "rate": user_rate, "channels": 1},
+                AGENT_AUDIO: {"format": "s16le", "rate": agent_rate, "channels": 1},
+                VIDEO: {"format": "jpeg"},
+                EVENTS: {"format": "jsonl"},
+            },
+        }
+        directory = self.directory
+        writer.submit(lambda w: w.create(directory, meta))
+        logger.info("Recording session %s to %s", sid, directory)
+
+    def now(self):
+        return time.monotonic() - self.start
+
+    def user_audio(self, pcm):
+        self.add(USER_AUDIO, pcm)
+
+    def agent_audio(self, pcm):
+        self.add(AGENT_AUDIO, pcm)
+
+    def video_frame(self, jpeg):
+        self.add(VIDEO, jpeg)
+
+    def event(self, kind, **fields):
+        fields["t"] = round(self.now(), 4)
+        fields["event"] = kind
+        self.add(EVENTS, (json.dumps(fields) + "\n").encode())
+
+    def add(self, name, payload):
+        if self.closed:
+            return
+        stream = self.streams[name]
+        t = self.now()
+        if not stream.append(t, payload):
+            self.flush_stream(stream)
+            if not stream.append(t, payload):
+                stream.dropped += 1
+                stream.dropped_bytes += len(payload)
+                self.count("recording_dropped_bytes", len(payload))
+                return
+        self.count("recorded_bytes", len(payload))
+        if t - (self.last_flush - self.start) >= self.flush_interval:
+            self.flush()
+
+    def flush_stream(self, stream):
+        dropped = stream.dropped_bytes
+        if stream.flush(self.writer):
+            self.count("recording_flushes")
+        else:
+            self.count("recording_dropped_bytes", stream.dropped_bytes - dropped)
+
+    def flush(self):
+        """Hand everything buffered to the writer"""
+        self.last_flush = time.monotonic()
+        for stream in self.streams.values():
+            self.flush_stream(stream)
+
+    def close(self):
+        """Flush what is left and close the recording's files once it is written"""
+        if self.closed:
+            return
+        self.flush()
+        self.closed = True
+        directory = self.directory
+        self.writer.submit(lambda w: w.close_files(directory))
+        logger.info("Recording %s closed: %s", directory, self.stats())
+
+    def count(self, name, value=1):
+        if self.metrics:
+            self.metrics.inc(name, value)
+
+    def stats(self):
+        return {name: {"records": s.records, "dropped": s.dropped, "dropped_bytes": s.dropped_bytes}
+                for name, s in self.streams.items()}
+
+######################################################################
+# Reading
+######################################################################
+class Recording:
+    """
+    A recording opened for reading. Data files are memory mapped, so
+    payloads are views into the page cache and nothing is read up front.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.maps = []
+
+    def close(self):
+        for m in self.maps:
+            m.close()
+        self.maps.clear()
+
+    def map(self, filename):
+        path = os.path.join(self.directory, filename)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return memoryview(b"")
+        with open(path, "rb") as f:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.maps.append(m)
+        return memoryview(m)
+
+    def index(self, name):
+        """The index records of a stream as a structured array of t, offset and length"""
+        return np.frombuffer(self.map(name + ".idx"), dtype=INDEX_DTYPE)
+
+    def records(self, name):
+        """(seconds since start, payload view) of each record of a stream"""
+        data = self.map(STREAM_FILES[name])
+        for t, offset, length in self.index(name):
+            yield float(t), data[offset:offset + length]
+
+    def pcm(self, name):
+        """All the audio of a stream as one int16 array, without the gaps between records"""
+        return np.frombuffer(self.map(STREAM_FILES[name]), dtype=np.int16)
+
+    def events(self):
+        path = os.path.join(self.directory, STREAM_FILES[EVENTS])
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            for line in f:
+                yield json.loads(line)
+
+    def rate(self, name):
+        return self.meta["streams"][name]["rate"]
+
+class RecordedAudioTrack(MediaStreamTrack):
+    """
+    Plays the user audio of a recording as 20ms frames paced in real time,
+    the same samples on every run, then loops.
+    """
+    kind = "audio"
+
+    def __init__(self, recording, frame_duration=0.02):
+        super().__init__()
+        self.pcm = recording.pcm(USER_AUDIO)
+        self.rate = recording.rate(USER_AUDIO)
+        self.samples = int(self.rate * frame_duration)
+        self.frame_duration = frame_duration
+        self.position = 0
+        self.frames = 0
+        self.start = None
+
+    async def recv(self):
+        loop = asyncio.get_running_loop()
+        if self.start is None:
+            self.start = loop.time()
+        delay = self.start + self.frames * self.frame_duration - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        chunk = self.pcm[self.position:self.position + self.samples]
+        if len(chunk) < self.samples:
+            # loop, padding the last frame with silence
+            chunk = np.concatenate([chunk, np.zeros(self.samples - len(chunk), dtype=np.int16)])
+            self.position = 0
+        else:
+            self.position += self.samples
+        frame = AudioFrame.from_ndarray(chunk.reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = self.rate
+        frame.pts = self.frames * self.samples
+        frame.time_base = fractions.Fraction(1, self.rate)
+        self.frames += 1
+        return frame
+
+class RecordedVideoTrack(MediaStreamTrack):
+    """
+    Plays the sampled video frames of a recording at the times they were
+    recorded, repeating each until the next, then loops.
+    """
+    kind = "video"
+
+    def __init__(self, recording, fps=30):
+        super().__init__()
+        self.codec = av.CodecContext.create("mjpeg", "r")
+        self.records = list(recording.records(VIDEO))
+        self.length = (self.records[-1][0] + 1.0) if self.records else 1.0
+        self.fps = fps
+        self.frames = 0
+        self.start = None
+        self.current = None
+        self.cycle = 0
+        self.next = 0
+
+    async def recv(self):
+        loop = asyncio.get_running_loop()
+        if self.start is None:
+            self.start = loop.time()
+        delay = self.start + self.frames / self.fps - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        cycle, t = divmod(self.frames / self.fps, self.length)
+        if cycle != self.cycle:
+            self.cycle, self.next = cycle, 0
+        while self.next < len(self.records) and self.records[self.next][0] <= t:
+            self.current = self.decode(self.records[self.next][1])
+            self.next += 1
+        frame = self.current or VideoFrame(320, 240, "yuv420p")
+        frame.pts = int(self.frames * 90000 / self.fps)
+        frame.time_base = fractions.Fraction(1, 90000)
+        self.frames += 1
+        return frame
+
+    def decode(self, jpeg):
+        frames = self.codec.decode(av.Packet(bytes(jpeg)))
+        return frames[0].reformat(format="yuv420p") if frames else self.current
@@ -0,0 +1,107 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import collections
+import logging
+import secrets
+
+logger = logging.getLogger(__name__)
+
+def new_token():
+    """An unguessable resume token for a client"""
+    return secrets.token_urlsafe(16)
+
+class SessionCache:
+    """
+    Agents of clients that went away, kept for `ttl` seconds so a client
+    that reconnects with its resume token gets its conversation, and where
+    it is still open its live connection, back without starting a new agent.
+
+    At most `max_sessions` agents are kept, the least recently parked is
+    closed to make room. Expired and evicted agents are closed.
+    """
+
+    def __init__(self, ttl=30.0, max_sessions=100, metrics=None):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.metrics = metrics
+        # token -> (agent, expiry timer), oldest first
+        self.entries = collections.OrderedDict()
+        self.closing = set()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, token):
+        return token in self.entries
+
+    def put(self, token, agent):
+        """Park an agent under a resume token"""
+        if self.ttl <= 0 or self.max_sessions <= 0:
+            self.close(agent)
+            return
+        self.discard(token)
+        while len(self.entries) >= self.max_sessions:
+            oldest, (evicted, timer) = self.entries.popitem(last=False)
+            timer.cancel()
+            logger.info("Evicting parked session %s", evicted.sid)
+            self.count("sessions_evicted")
+            self.close(evicted)
+        timer = asyncio.get_running_loop().call_later(self.ttl, self.expire, token)
+        self.entries[token] = (agent, timer)
+        self.count("sessions_parked")
+
+    def pop(self, token):
+        """Take back the agent parked under a token, if it is still there"""
+        agent = self.take(token)
+        if agent is not None:
+            self.count("sessions_resumed")
+        return agent
+
+    def take(self, token):
+        entry = self.entries.pop(token, None)
+        if entry is None:
+            return None
+        agent, timer = entry
+        timer.cancel()
+        return agent
+
+    def discard(self, token):
+        agent = self.take(token)
+        if agent is not None:
+            self.close(agent)
+
+    def expire(self, token):
+        entry = self.entries.pop(token, None)
+        if entry is not None:
+            logger.info("Parked session %s expired", entry[0].sid)
+            self.count("sessions_expired")
+            self.close(entry[0])
+
+    def close(self, agent):
+        task = asyncio.create_task(agent.close())
+        self.closing.add(task)
+        task.add_done_callback(self.closing.discard)
+
+    async def clear(self):
+        """Close every parked agent"""
+        entries, self.entries = list(self.entries.values()), collections.OrderedDict()
+        for agent, timer in entries:
+            timer.cancel()
+        await asyncio.gather(*(agent.close() for agent, _ in entries), *self.closing)
+
+    def count(self, name):
+        if self.metrics:
+            self.metrics.inc(name)
@@ -39,10 +39,12 @@ class SocketEndpoint:
         @self.sio.event
         async def connect(sid, environ, auth):
             logger.info("connected client %s", sid)
-            self.webrtc_endpoint.set_sid(sid)
 
         @self.sio.event
         async def disconnect(sid, reason=None):
             logger.info("disconnected from %s, reason: %s", sid, reason)
-            await self.webrtc_endpoint.shutdown_agent()
+            # a client that hung up ends its agent, one whose connection dropped may resume it
+            dropped = reason in (self.sio.reason.PING_TIMEOUT, self.sio.reason.TRANSPORT_CLOSE,
+                                 self.sio.reason.TRANSPORT_ERROR)
+            await self.webrtc_endpoint.shutdown_agent(sid, suspend=dropped)
             logger.info("GeminiAgent cleaned up")
@@ -0,0 +1,139 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import collections
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class VoiceActivityGate:
+    """
+    Energy and zero crossing voice activity detector in front of the agent's
+    realtime audio input.
+
+    Audio is only forwarded while the user speaks. The frames just before
+    speech starts are kept as pre-roll so onsets are not clipped, and the
+    gate stays open for a hangover period after speech stops so word endings
+    and the pause the model uses to detect end of turn still go through.
+    While open, frames are batched into larger chunks to cut per message
+    overhead.
+    """
+
+    def __init__(self, sample_rate=16000, batch_duration=0.1, preroll=0.2, hangover=0.6, min_rms=300.0,
+                 noise_ratio=3.0, max_zcr=0.5):
+        self.sample_rate = sample_rate
+        # durations in samples, frames from the resampler do not all have the same length
+        self.batch_samples = max(1, round(batch_duration * sample_rate))
+        self.hangover_samples = max(1, round(hangover * sample_rate))
+        self.preroll_samples = round(preroll * sample_rate)
+        self.preroll = collections.deque()
+        self.preroll_length = 0
+        # a frame is speech when its RMS clears both the floor and the noise estimate
+        self.min_rms = min_rms
+        self.noise_ratio = noise_ratio
+        self.noise_rms = min_rms / noise_ratio
+        # fraction of sign changes above which a frame is treated as hiss
+        self.max_zcr = max_zcr
+
+        self.active = False
+        # samples of silence left before the gate closes
+        self.hang = 0
+        self.batch = []
+        self.batch_length = 0
+
+        self.frames_in = 0
+        self.bytes_in = 0
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.segments = 0
+
+    def is_speech(self, pcm):
+        """Classify a frame of 16 bit PCM as speech or not"""
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        if len(samples) == 0:
+            return False
+        x = samples.astype(np.float32)
+        rms = float(np.sqrt(np.dot(x, x) / len(x)))
+        zcr = np.count_nonzero(np.diff(np.signbit(samples))) / len(samples)
+
+        speech = rms > max(self.min_rms, self.noise_rms * self.noise_ratio) and zcr < self.max_zcr
+        if not speech:
+            # track the background level while nobody is talking
+            self.noise_rms = 0.95 * self.noise_rms + 0.05 * rms
+        return speech
+
+    def process(self, pcm):
+        """
+        Feed one frame of PCM. Returns (chunks, ended): the chunks to send
+        upstream now, and whether a speech segment just ended.
+        """
+        self.frames_in += 1
+        self.bytes_in += len(pcm)
+        samples = len(pcm) // 2
+        speech = self.is_speech(pcm)
+        chunks = []
+        ended = False
+
+        if not self.active:
+            if not speech:
+                self.preroll.append(pcm)
+                self.preroll_length += samples
+                # keep the newest frames that cover the pre-roll
+                while self.preroll and self.preroll_length - len(self.preroll[0]) // 2 >= self.preroll_samples:
+                    self.preroll_length -= len(self.preroll.popleft()) // 2
+                return chunks, ended
+            self.active = True
+            self.segments += 1
+            self.batch.extend(self.preroll)
+            self.batch_length += self.preroll_length
+            self.preroll.clear()
+            self.preroll_length = 0
+
+        self.batch.append(pcm)
+        self.batch_length += samples
+        if speech:
+            self.hang = self.hangover_samples
+        else:
+            self.hang -= samples
+
+        if self.hang <= 0:
+            self.active = False
+            ended = True
+            chunks.append(self.flush())
+        elif self.batch_length >= self.batch_samples:
+            chunks.append(self.flush())
+        return chunks, ended
+
+    def flush(self):
+        """Join the batched frames into one chunk"""
+        chunk = b"".join(self.batch)
+        self.batch.clear()
+        self.batch_length = 0
+        self.messages_sent += 1
+        self.bytes_sent += len(chunk)
+        return chunk
+
+    def stats(self):
+        """Return how much upstream traffic the gate saved"""
+        return {
+            "frames_in": self.frames_in,
+            "messages_sent": self.messages_sent,
+            "messages_saved": self.frames_in - self.messages_sent,
+            "bytes_in": self.bytes_in,
+            "bytes_sent": self.bytes_sent,
+            "bytes_saved": self.bytes_in - self.bytes_sent,
+            "speech_segments": self.segments,
+        }
@@ -0,0 +1,277 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import time
+from fractions import Fraction
+
+import av
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# pixel formats whose first plane is 8 bit luma
+LUMA_FORMATS = ("yuv420p", "yuvj420p", "yuv422p", "yuvj422p", "yuv444p", "yuvj444p", "nv12", "nv21")
+# full range 4:2:0, what the mjpeg encoder takes
+JPEG_FORMAT = "yuvj420p"
+
+def plane_array(plane):
+    """A writable (height, width) uint8 view of a frame plane, without its row padding"""
+    rows = np.asarray(memoryview(plane)).reshape(plane.height, plane.line_size)
+    return rows[:, :plane.width]
+
+def parse_mosaic(value):
+    """Parse a "COLUMNSxROWS" mosaic layout such as "2x2", None or "" for no mosaic"""
+    if not value:
+        return None
+    columns, rows = (int(n) for n in value.lower().split("x"))
+    if columns < 1 or rows < 1:
+        raise ValueError(f"bad mosaic layout {value!r}")
+    return columns, rows
+
+class JpegEncoder:
+    """
+    JPEG encodes yuvj420p frames with libav's mjpeg encoder. The codec
+    context is kept open while the frame size stays the same.
+
+    qscale is the fixed quantiser, 2 (best) to 31; 8 gives about the size
+    and quality of PIL at quality 75.
+    """
+
+    def __init__(self, qscale=8):
+        self.qscale = qscale
+        self.codec = None
+        self.pts = 0
+
+    def open(self, width, height):
+        codec = av.CodecContext.create("mjpeg", "w")
+        codec.width = width
+        codec.height = height
+        codec.pix_fmt = JPEG_FORMAT
+        codec.time_base = Fraction(1, 1)
+        codec.qmin = codec.qmax = self.qscale
+        codec.options = {"huffman": "default"}
+        self.codec = codec
+
+    def encode(self, frame):
+        if self.codec is None or (self.codec.width, self.codec.height) != (frame.width, frame.height):
+            self.open(frame.width, frame.height)
+        # the encoder wants increasing timestamps, in its own time base
+        self.pts += 1
+        frame.pts = self.pts
+        frame.time_base = self.codec.time_base
+        return b"".join(bytes(packet) for packet in self.codec.encode(frame))
+
+class Mosaic:
+    """
+    Packs frames as tiles, left to right and top to bottom, into one
+    yuvj420p canvas of `columns` x `rows` tiles of tile_width x tile_height.
+    Tiles are scaled straight into the canvas planes, nothing goes via RGB.
+    """
+
+    def __init__(self, columns, rows, tile_width, tile_height):
+        self.columns = columns
+        self.rows = rows
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.canvas = av.VideoFrame(columns * tile_width, rows * tile_height, JPEG_FORMAT)
+        self.planes = [plane_array(plane) for plane in self.canvas.planes]
+        # black, in full range luma and neutral chroma
+        self.clear()
+
+    @property
+    def full(self):
+        return self.tiles == self.columns * self.rows
+
+    def clear(self):
+        """Start over with a black canvas, so a partly filled mosaic shows no stale tiles"""
+        self.planes[0][:] = 0
+        self.planes[1][:] = self.planes[2][:] = 128
+        self.tiles = 0
+
+    def add(self, frame):
+        """Add a frame as the next tile, return True once every tile is filled"""
+        tile = frame.reformat(width=self.tile_width, height=self.tile_height, format=JPEG_FORMAT)
+        row, column = divmod(self.tiles, self.columns)
+        for n, (canvas, plane) in enumerate(zip(self.planes, tile.planes)):
+            # chroma planes are half size
+            shift = 1 if n else 0
+            w, h = self.tile_width >> shift, self.tile_height >> shift
+            canvas[row * h:(row + 1) * h, column * w:(column + 1) * w] = plane_array(plane)
+        self.tiles += 1
+        return self.full
+
+class VideoSampler:
+    """
+    Decides which incoming video frames are worth sending to the agent and
+    encodes the selected ones as JPEG.
+
+    Frames are dropped when they arrive faster than the target fps, while a
+    previous frame is still being encoded, or when their downscaled luma has
+    barely changed since the last frame that was sent. Change detection
+    reads the Y plane of the decoded frame directly; only selected frames
+    are scaled and encoded, in YUV with libav.
+
+    With a mosaic of (columns, rows) selected frames become tiles of one
+    max_size image, which is encoded and sent once every tile is filled, or
+    partly filled once columns x rows / fps seconds passed since its first
+    tile. A frame is taken then even if the scene is static, so the latest
+    view still reaches the agent.
+    """
+
+    def __init__(self, fps=1.0, max_size=768, qscale=8, change_threshold=4.0, luma_size=32, mosaic=None):
+        self.min_interval = 1.0 / fps if fps > 0 else 0.0
+        self.max_size = max_size
+        self.encoder = JpegEncoder(qscale)
+        self.mosaic_layout = mosaic
+        self.mosaic = None
+        # a partly filled mosaic is sent this long after its first tile
+        self.mosaic_period = mosaic[0] * mosaic[1] * self.min_interval if mosaic else 0.0
+        self.mosaic_started = None
+        self.mosaic_due = False
+        # mean absolute luma difference (0-255) below which a frame is static
+        self.change_threshold = change_threshold
+        self.luma_size = luma_size
+
+        self.last_sample_time = None
+        self.last_luma = None
+        self.encoding = False
+
+        self.received = 0
+        self.dropped_rate = 0
+        self.dropped_busy = 0
+        self.dropped_static = 0
+        self.encoded = 0
+        self.tiled = 0
+        self.encode_time = 0.0
+        self.encode_time_max = 0.0
+        self.last_encode_time = 0.0
+
+    def accept(self, frame, now=None):
+        """
+        Return True if the frame should be encoded and sent. An accepted
+        frame must be passed to encode() or reject().
+        """
+        self.received += 1
+        now = time.monotonic() if now is None else now
+
+        if self.encoding:
+            self.dropped_busy += 1
+            return False
+
+        if self.last_sample_time is not None and now - self.last_sample_time < self.min_interval:
+            self.dropped_rate += 1
+            return False
+
+        overdue = (self.mosaic_started is not None and self.mosaic_period > 0
+                   and now - self.mosaic_started >= self.mosaic_period)
+        luma = self.luma(frame)
+        if self.last_luma is not None and luma.shape == self.last_luma.shape and not overdue:
+            score = np.abs(luma.astype(np.int16) - self.last_luma).mean()
+            if score < self.change_threshold:
+                self.dropped_static += 1
+                return False
+
+        self.last_sample_time = now
+        self.last_luma = luma
+        if self.mosaic_layout:
+            if self.mosaic_started is None:
+                self.mosaic_started = now
+            self.mosaic_due = overdue
+        self.encoding = True
+        return True
+
+    def reject(self):
+        """Give up on an accepted frame that could not be encoded"""
+        self.encoding = False
+        self.dropped_busy += 1
+        # let the next frame through rather than comparing against a frame never sent
+        self.last_sample_time = None
+        self.last_luma = None
+        if self.mosaic is None or self.mosaic.tiles == 0:
+            # the mosaic's first tile is yet to come
+            self.mosaic_started = None
+
+    def luma(self, frame):
+        """Return a small luma thumbnail of the frame for change detection"""
+        if frame.format.name in LUMA_FORMATS:
+            plane = frame.planes[0]
+            y = np.frombuffer(plane, dtype=np.uint8).reshape(plane.height, plane.line_size)
+            y = y[:, :plane.width]
+        else:
+            y = frame.to_ndarray(format="gray")
+
+        step = max(1, min(y.shape) // self.luma_size)
+        return y[::step, ::step].copy()
+
+    def target_size(self, width, height):
+        """Scale width and height down to fit max_size, keeping the aspect ratio"""
+        longest = max(width, height)
+        if not self.max_size or longest <= self.max_size:
+            return width, height
+        scale = self.max_size / longest
+        # keep dimensions even for chroma subsampled formats
+        return max(2, int(width * scale) & ~1), max(2, int(height * scale) & ~1)
+
+    def encode(self, frame):
+        """
+        Downscale and JPEG encode a selected frame, safe to call from a worker
+        thread. With a mosaic, returns b"" while the frame only became a tile
+        and the mosaic is neither full nor due.
+        """
+        start = time.perf_counter()
+        try:
+            width, height = self.target_size(frame.width, frame.height)
+            if self.mosaic_layout:
+                return self.add_tile(frame, width, height)
+            return self.encoder.encode(frame.reformat(width=width, height=height, format=JPEG_FORMAT))
+        finally:
+            elapsed = time.perf_counter() - start
+            self.last_encode_time = elapsed
+            self.encoded += 1
+            self.encode_time += elapsed
+            self.encode_time_max = max(self.encode_time_max, elapsed)
+            self.encoding = False
+
+    def add_tile(self, frame, width, height):
+        columns, rows = self.mosaic_layout
+        tile_width = max(2, width // columns & ~1)
+        tile_height = max(2, height // rows & ~1)
+        if self.mosaic is None or (self.mosaic.tile_width, self.mosaic.tile_height) != (tile_width, tile_height):
+            self.mosaic = Mosaic(columns, rows, tile_width, tile_height)
+        self.tiled += 1
+        if not self.mosaic.add(frame) and not self.mosaic_due:
+            return b""
+        image = self.encoder.encode(self.mosaic.canvas)
+        self.mosaic.clear()
+        self.mosaic_started = None
+        return image
+
+    @property
+    def dropped(self):
+        return self.dropped_rate + self.dropped_busy + self.dropped_static
+
+    def stats(self):
+        """Return frame counters and encode timings"""
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "dropped_rate": self.dropped_rate,
+            "dropped_busy": self.dropped_busy,
+            "dropped_static": self.dropped_static,
+            "encoded": self.encoded,
+            "tiled": self.tiled,
+            "encode_time_avg_ms": 1000 * self.encode_time / self.encoded if self.encoded else 0.0,
+            "encode_time_max_ms": 1000 * self.encode_time_max,
+        }
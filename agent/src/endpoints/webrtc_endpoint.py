@@ -14,20 +14,31 @@
 
 from aiortc import RTCPeerConnection, RTCSessionDescription, RTCConfiguration, RTCIceServer
 from aiortc.contrib.media import MediaStreamTrack
-from av import AudioFrame, AudioResampler
+from av import AudioFrame
 from aiohttp import web
 import asyncio
 import json
-import os
+import uuid
 import logging
-import numpy as np
 import fractions
 
-from google.genai.types import (
-    Part,
-    Content,
-    Blob,
-)
+from google.genai.types import Blob
+from google.adk.agents.live_request_queue import LiveRequest
+
+from logging_config import SampledLogger
+from runtime_config import Config, ConfigError, Profile
+from agent.datachannel import LABEL as DATA_CHANNEL_LABEL
+
+from .admission import AdmissionController, Overloaded
+from .audio_buffer import DROP_OLDEST
+from .media_executor import MediaExecutor
+from .metrics import SessionMetrics
+from .pcm import PcmConverter, UPSTREAM_RATE
+from .playout import PlayoutScheduler
+from .recorder import RecordingWriter, SessionRecorder
+from .session_cache import SessionCache, new_token
+from .vad import VoiceActivityGate
+from .video_sampler import VideoSampler, parse_mosaic
 
 logger = logging.getLogger(__name__)
 
@@ -40,39 +51,31 @@ class AgentAudioTrack(MediaStreamTrack):
     """
     kind = "audio"
 
-    def __init__(self):
+    def __init__(self, max_buffer_seconds=30, overflow=DROP_OLDEST, metrics=None, sample_rate=24000,
+                 frame_duration=0.02, target_depth=0.04, max_depth=0.2):
         super().__init__()
-        self.audio_queue = asyncio.Queue()
-        self.sample_rate = 24000  # Gemini typically uses 24kHz
+        self.metrics = metrics or SessionMetrics()
+        self.sample_rate = sample_rate  # Gemini typically uses 24kHz
         self.channels = 1  # Mono audio
-        self.samples_per_frame = int(self.sample_rate * 0.02)  # 20ms frames
-        self.frame_duration = 0.02  # 20ms
-        self.start_time = None
-        self.buffer = bytearray()
+        self.frame_duration = frame_duration  # 20ms by default
+        # paces frames against the clock from a preallocated jitter buffer
+        self.playout = PlayoutScheduler(
+            sample_rate=self.sample_rate,
+            frame_duration=self.frame_duration,
+            target_depth=target_depth,
+            max_depth=max_depth,
+            max_buffer_seconds=max_buffer_seconds,
+            overflow=overflow
+        )
+        self.samples_per_frame = self.playout.frame_size
 
     async def recv(self):
         """
         Receive the next audio frame
         """
-        if self.start_time is None:
-            self.start_time = asyncio.get_event_loop().time()
-            self.last_frame_time = self.start_time
-
-        # Get audio data from queue (blocking)
-        while len(self.buffer) < self.samples_per_frame * 2:
-            try:
-                audio_data = await asyncio.wait_for(self.audio_queue.get(), timeout=0.1)
-                self.buffer.extend(audio_data)
-            except asyncio.TimeoutError:
-                # If no audio data available, send silence
-                self.buffer.extend(np.zeros(self.samples_per_frame, dtype=np.int16).tobytes())
-
-        # Get a frame's worth of data from the buffer
-        frame_data = self.buffer[:self.samples_per_frame * 2]
-        self.buffer = self.buffer[self.samples_per_frame * 2:]
-
-        # Convert bytes to numpy array
-        audio_array = np.frombuffer(frame_data, dtype=np.int16)
+        # Wait for this frame's slot and take its samples, silence if none are due
+        audio_array, pts = await self.playout.next_frame()
+        self.metrics.inc("audio_frames_out")
 
         # Create AudioFrame
         frame = AudioFrame.from_ndarray(
@@ -82,8 +85,7 @@ class AgentAudioTrack(MediaStreamTrack):
         )
         
         # Set timestamp
-        self.last_frame_time += self.frame_duration
-        frame.pts = int(self.last_frame_time * self.sample_rate)
+        frame.pts = pts
         frame.sample_rate = self.sample_rate
         frame.time_base = fractions.Fraction(1, self.sample_rate)
         
@@ -91,38 +93,326 @@ class AgentAudioTrack(MediaStreamTrack):
 
     async def add_audio_data(self, audio_data):
         """
-        Add audio data to the queue to be sent to the client
+        Add audio data to the jitter buffer to be sent to the client
+        """
+        self.playout.write(audio_data)
+
+    def interrupt(self, fade_out=True):
+        """
+        Stop the agent speaking within one frame, dropping any queued audio
         """
-        await self.audio_queue.put(audio_data)
+        self.playout.interrupt(fade_out)
+
+    def stats(self):
+        """Return playout buffer and latency metrics"""
+        return self.playout.stats()
 
 ######################################################################
-# WebRTC APIs
+# Per-peer WebRTC session
 ######################################################################
-class WebRTCEndpoint:
-    
-    def __init__(self, app, cors, sio):
-        logger.info("Initializing WebRTCEndpoint")
-        self.app=app
-        self.pc=None
-        self.cors = cors
-        self.sio = sio
-        self.sid = None
+class WebRTCSession:
+    """
+    State owned by a single client: its peer connection, agent audio track,
+    Gemini agent and media processing tasks
+    """
+
+    def __init__(self, sid, executor, responseType="text", vad=False, metrics=None, profile=None,
+                 recorder=None):
+        self.sid = sid
+        self.executor = executor
+        self.metrics = metrics or SessionMetrics()
+        self.responseType = responseType
+        # latency and quality settings the client picked
+        self.profile = profile or Profile()
+        self.pc = None
         self.gemini_agent = None
+        # set once the agent is running, only then can it be parked for resumption
+        self.agent_ready = False
+        # handed to the client to resume this session's agent after a reconnect
+        self.resume_token = None
         self.agent_audio_track = None
-        self.addRoutes()
-        self.resampler = AudioResampler(format='s16', layout='mono', rate=24000)
+        # the client's channel for agent messages, Socket.IO is used without one
+        self.data_channel = None
+        video = self.profile.video
+        self.video_sampler = VideoSampler(fps=video.fps, max_size=video.max_size, qscale=video.qscale,
+                                          change_threshold=video.change_threshold,
+                                          mosaic=parse_mosaic(video.mosaic))
+        # optional gate that only forwards audio while the user is speaking
+        self.vad = VoiceActivityGate(sample_rate=UPSTREAM_RATE) if vad else None
+        # SessionRecorder when this session is recorded for QA
+        self.recorder = recorder
+        self.tasks = set()
+        self.closed = False
+        # rate limited log for per-frame messages
+        self.frame_log = SampledLogger(logger, sid)
+        # loop time of the /offer request and milliseconds from it to each milestone
+        self.offer_time = None
+        self.timings = {}
+
+    def mark(self, name):
+        """Record the time from the offer to the first occurrence of a milestone"""
+        if name in self.timings or self.offer_time is None:
+            return
+        elapsed = asyncio.get_event_loop().time() - self.offer_time
+        self.timings[name] = 1000 * elapsed
+        self.metrics.observe(f"offer_to_{name}_seconds", elapsed)
+        self.record("mark", name=name, ms=round(self.timings[name], 1))
+        logger.info("Session %s %s after %.1fms", self.sid, name, self.timings[name])
+
+    def record(self, kind, **fields):
+        """Add an event to the session's recording, if it is recorded"""
+        if self.recorder:
+            self.recorder.event(kind, **fields)
+
+    def collect_metrics(self):
+        """Refresh queue depth and playout gauges before a metrics scrape"""
+        live_request_queue = self.gemini_agent and self.gemini_agent.live_request_queue
+        if live_request_queue:
+            self.metrics.set("live_queue_depth", live_request_queue.queue.qsize())
+        if self.agent_audio_track:
+            playout = self.agent_audio_track.playout
+            self.metrics.set("playout_depth_seconds", playout.depth)
+            self.metrics.set("playout_underruns", playout.underruns)
+            self.metrics.set("playout_overflow_samples", playout.buffer.dropped)
+            self.metrics.set("playout_latency_seconds", playout.latency_last)
+
+    def start_task(self, coro):
+        """Start a media task that is cancelled when the session closes"""
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    async def close(self):
+        """Close the agent, media tasks and peer connection of this session"""
+        if self.closed:
+            return
+        self.closed = True
+        logger.info("Closing session %s, timings %s", self.sid, self.timings)
+
+        current = asyncio.current_task()
+        for task in list(self.tasks):
+            if task is not current:
+                task.cancel()
 
-    def set_sid(self, sid):
-        """Set the socket io sid"""
-        self.sid = sid
-        logger.info(f"Socket.IO session set: {sid}")
+        if self.agent_audio_track:
+            logger.info("Playout stats for session %s: %s", self.sid, self.agent_audio_track.stats())
 
-    async def shutdown_agent(self):
-        """Shutdown the Gemini agent"""
         if self.gemini_agent:
             await self.gemini_agent.close()
             self.gemini_agent = None
-            logger.info("GeminiAgent shut down")
+
+        if self.pc is not None:
+            pc, self.pc = self.pc, None
+            await pc.close()
+
+        if self.recorder:
+            self.recorder.close()
+
+    async def send_audio_to_client(self, audio_data):
+        """
+        Send audio data from Gemini agent to the client via WebRTC
+        """
+        if self.agent_audio_track:
+            self.mark("first_agent_audio")
+            if self.recorder:
+                self.recorder.agent_audio(audio_data)
+            await self.agent_audio_track.add_audio_data(audio_data)
+        else:
+            logger.warning("No agent audio track available to send audio")
+
+    def interrupt(self):
+        """Drop pending agent audio after the user interrupted the agent"""
+        self.record("interrupt")
+        if self.agent_audio_track:
+            self.agent_audio_track.interrupt()
+
+    def audio_position(self):
+        """pts of the agent audio track at which the audio queued so far ends"""
+        return self.agent_audio_track.playout.end_pts if self.agent_audio_track else 0
+
+    def use_data_channel(self, channel):
+        """Send agent messages over the client's data channel, and back over Socket.IO if it closes"""
+        logger.info("Data channel %s open for session %s", channel.label, self.sid)
+        self.metrics.inc("datachannel_opened")
+        self.data_channel = channel
+
+        @channel.on("close")
+        def on_close():
+            logger.info("Data channel closed for session %s", self.sid)
+            if self.gemini_agent:
+                self.gemini_agent.update_transport()
+
+        if self.gemini_agent:
+            self.gemini_agent.update_transport()
+
+    async def process_audio_track(self, track):
+        """Process incoming audio track and send to GeminiAgent"""
+        logger.info("Processing audio track for session %s", self.sid)
+        # resampler state belongs to this track, set up from its first frame
+        converter = PcmConverter(UPSTREAM_RATE)
+        mime_type = f"audio/pcm;rate={UPSTREAM_RATE}"
+
+        try:
+            while True:
+                frame = await track.recv()
+                if frame is None:
+                    break
+                self.metrics.inc("audio_frames_in")
+
+                # a 20ms frame resamples in tens of microseconds, less than
+                # the hop to the media executor and back would cost
+                audio_data = converter.convert(frame)
+                
+                if not audio_data:
+                    continue
+                if self.recorder:
+                    self.recorder.user_audio(audio_data)
+
+                # Drop silence and batch speech into larger chunks
+                if self.vad:
+                    chunks, ended = self.vad.process(audio_data)
+                else:
+                    chunks, ended = (audio_data,), False
+
+                # Push to GeminiAgent's live request queue
+                if self.gemini_agent and self.gemini_agent.live_request_queue:
+                    for chunk in chunks:
+                        self.metrics.inc("audio_chunks_sent")
+                        self.gemini_agent.live_request_queue.send_realtime(Blob(data=chunk, mime_type=mime_type))
+                        self.frame_log.debug("Pushed audio chunk to queue: %d bytes", len(chunk))
+                    if ended:
+                        # let the model flush its input now the user went quiet
+                        await self.gemini_agent.live_request_queue.send_control(LiveRequest(audio_stream_end=True))
+                
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing audio track: {e}")
+        finally:
+            logger.info("Audio track stats for session %s: %s", self.sid, converter.stats())
+            if self.vad:
+                logger.info("Voice activity stats for session %s: %s", self.sid, self.vad.stats())
+
+    async def process_video_track(self, track):
+        """Process incoming video track and send sampled frames to GeminiAgent"""
+        logger.info("Processing video track for session %s", self.sid)
+        
+        try:
+            while True:
+                frame = await track.recv()
+                if frame is None:
+                    break
+
+                self.metrics.inc("video_frames_in")
+
+                # Skip frames that are too soon, unchanged or arrive mid-encode
+                if not self.video_sampler.accept(frame):
+                    self.metrics.inc("video_frames_dropped")
+                    continue
+
+                # Encode off the event loop and keep receiving meanwhile
+                self.start_task(self.send_video_frame(frame))
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing video track: {e}")
+        finally:
+            logger.info("Video track stats for session %s: %s", self.sid, self.video_sampler.stats())
+
+    async def send_video_frame(self, frame):
+        """Encode a sampled video frame on the media executor and send it to GeminiAgent"""
+        # Convert video frame to image data (JPEG format)
+        image_data = await self.executor.try_run(self.video_sampler.encode, frame)
+        if image_data is None:
+            self.video_sampler.reject()
+            self.metrics.inc("video_frames_dropped")
+            return
+        self.metrics.inc("video_frames_encoded")
+        self.metrics.observe("video_encode_seconds", self.video_sampler.last_encode_time)
+        if not image_data:
+            # kept as a mosaic tile, sent with the rest of the mosaic
+            return
+        if self.recorder:
+            self.recorder.video_frame(image_data)
+
+        # Push to GeminiAgent's live request queue
+        if self.gemini_agent and self.gemini_agent.live_request_queue:
+            self.gemini_agent.live_request_queue.send_realtime(Blob(data=image_data, mime_type="image/jpeg"))
+            self.frame_log.debug("Pushed video frame to queue: %d bytes", len(image_data))
+
+######################################################################
+# WebRTC APIs
+######################################################################
+class WebRTCEndpoint:
+    
+    def __init__(self, app, cors, sio, agents, metrics, config=None, routes=True, loop_lag=None):
+        logger.info("Initializing WebRTCEndpoint")
+        self.app=app
+        self.cors = cors
+        self.sio = sio
+        self.metrics = metrics
+        self.config = config or Config()
+        # shared agent runners and pre-created agent sessions, by agent name
+        self.agents = agents
+        # active sessions keyed by Socket.IO sid (or a generated peer id)
+        self.sessions = {}
+        # agents of clients that went away, by resume token
+        self.resumable = SessionCache(self.config.server.resume_ttl, self.config.server.max_resumable,
+                                      metrics.process)
+        # shared thread pool for JPEG encoding
+        self.executor = MediaExecutor(workers=self.config.server.executor_workers or None)
+        # writes the recordings of sessions whose profile asks for one
+        self.recording_writer = RecordingWriter() if self.config.recorder.directory else None
+        # admits, degrades, queues or turns away new sessions by the load of the worker,
+        # a parked agent keeps its live connection to the model and counts as a session
+        self.admission = AdmissionController(self.config.admission,
+                                             lambda: len(self.sessions) + len(self.resumable), loop_lag,
+                                             self.executor, self.config.profiles, metrics.process)
+        # set while the worker drains, new offers are turned away
+        self.draining = False
+        self.metrics.add_collector(self.collect_metrics)
+        # False when /offer was registered before this endpoint could be loaded
+        if routes:
+            self.addRoutes()
+
+    def get_session(self, sid):
+        """Return the session registered for a sid, if any"""
+        return self.sessions.get(sid)
+
+    async def close_session(self, sid, suspend=False):
+        """
+        Close and unregister the session for a sid. With suspend a running
+        agent is parked so the client can resume it with its token.
+        """
+        session = self.sessions.pop(sid, None)
+        if session is not None:
+            self.metrics.remove(sid, session.metrics)
+            if suspend and session.agent_ready and session.gemini_agent:
+                agent, session.gemini_agent = session.gemini_agent, None
+                agent.detach()
+                self.resumable.put(session.resume_token, agent)
+                logger.info("Session %s suspended, resumable for %ss", sid, self.resumable.ttl)
+            await session.close()
+            logger.info("Session %s closed, %d active", sid, len(self.sessions))
+
+    async def shutdown_agent(self, sid, suspend=False):
+        """Shutdown the session of a client, keeping its agent for a while if it dropped"""
+        await self.close_session(sid, suspend=suspend)
+
+    def collect_metrics(self):
+        """Refresh process and session gauges before a metrics scrape"""
+        self.metrics.process.set("sessions", len(self.sessions))
+        self.metrics.process.set("resumable_sessions", len(self.resumable))
+        self.metrics.process.set("media_jobs_pending", self.executor.pending)
+        self.metrics.process.set("media_jobs_rejected", self.executor.rejected)
+        self.metrics.process.set("media_job_seconds", self.executor.job_seconds)
+        self.admission.collect_metrics()
+        if self.recording_writer:
+            self.metrics.process.set("recording_write_errors", self.recording_writer.errors)
+        for session in list(self.sessions.values()):
+            session.collect_metrics()
 
     def addRoutes(self):
         offerRoute = self.app.router.add_post("/offer", self.offer)
@@ -130,168 +420,237 @@ class WebRTCEndpoint:
         
     async def shutdown(self):
         logger.info("Shutting down WebRTCEndpoint")
-        if ( self.pc is not None ):
-            coros = self.pc.close()
-            await asyncio.gather(*coros)
+        sessions, self.sessions = list(self.sessions.values()), {}
+        await asyncio.gather(*(session.close() for session in sessions))
+        await self.resumable.clear()
+        self.executor.shutdown()
+        if self.recording_writer:
+            self.recording_writer.shutdown()
+
+    async def drain(self, timeout=600):
+        """Stop taking offers and wait for live sessions to end, then shut down"""
+        self.draining = True
+        logger.info("Draining %d sessions", len(self.sessions))
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.sessions and loop.time() < deadline:
+            await asyncio.sleep(0.5)
+        if self.sessions:
+            logger.warning("Drain timed out with %d sessions", len(self.sessions))
+        await self.shutdown()
+
+    def create_recorder(self, sid, profile, metrics):
+        """A SessionRecorder if sessions of this profile are recorded"""
+        if not (self.recording_writer and profile.record):
+            return None
+        recorder = self.config.recorder
+        return SessionRecorder(recorder.directory, sid, self.recording_writer, metrics,
+                               buffer_bytes=recorder.buffer_bytes, buffers=recorder.buffers,
+                               flush_interval=recorder.flush_interval,
+                               agent_rate=profile.audio.output_rate)
 
     # route for webrtc offer
     async def offer(self, request):
+        offer_time = asyncio.get_event_loop().time()
         logger.info("Received offer request")
+        if self.draining:
+            # the client retries and is routed to another worker
+            return web.Response(status=503, headers={"Retry-After": "1"}, text="draining")
         params = await request.json()
-        logger.info("Offer received %s", params)
+        logger.info("Offer received from %s, responseType=%s, profile=%s",
+                    params.get("socketId"), params.get("responseType"), params.get("profile"))
+
+        # settings for this client, from a profile of the config
+        try:
+            profile = self.config.profile(params.get("profile"))
+        except ConfigError as e:
+            return web.Response(status=400, text=str(e))
+
+        # the socket io sid of the client identifies the session
+        sid = params.get("socketId") or uuid.uuid4().hex
+        token = params.get("resumeToken")
+
+        # a client replacing its session or resuming its agent adds no load,
+        # anyone else waits for room and may get a degraded profile
+        requested = profile
+        admitting = not (sid in self.sessions or (token and token in self.resumable))
+        if admitting:
+            try:
+                profile = await self.admission.admit(profile)
+            except Overloaded as e:
+                return web.Response(status=503, headers={"Retry-After": str(e.retry_after)}, text=str(e))
+
+        try:
+            # a new offer from the same client replaces its previous session,
+            # which it can resume when it passes the token it was given
+            await self.close_session(sid, suspend=bool(token))
+            resumed_agent = self.resumable.pop(token) if token else None
+
+            # either "text" or "audio"
+            responseType = params.get("responseType", "text")
+
+            # only stream user audio upstream while they are speaking
+            vad = params.get("vad")
+            vad = profile.audio.vad if vad is None else bool(vad)
+
+            sessionMetrics = self.metrics.session(sid)
+            session = WebRTCSession(sid, self.executor, responseType, vad, sessionMetrics, profile,
+                                    self.create_recorder(sid, profile, sessionMetrics))
+            session.offer_time = offer_time
+            session.resume_token = new_token()
+            self.sessions[sid] = session
+        finally:
+            if admitting:
+                self.admission.admitted()
+
+        if resumed_agent:
+            # reattach the agent the client had before it went away
+            logger.info("Resuming agent for session %s", sid)
+            session.gemini_agent = resumed_agent
+            session.start_task(self.resume_agent(session))
+        else:
+            # Start the GeminiAgent for this session while we negotiate
+            session.gemini_agent = self.agents.create_agent(self.sio, sid, session, responseType, profile)
+            session.start_task(self.start_agent(session))
+
+        # a session whose offer cannot be negotiated is closed, its agent with it
+        negotiated = False
+        try:
+            description = await self.negotiate(session, params)
+            negotiated = True
+        except (KeyError, ValueError) as e:
+            logger.warning("Invalid offer for session %s: %r", sid, e)
+            return web.Response(status=400, text=f"invalid offer: {e!r}")
+        finally:
+            if not negotiated and self.sessions.get(sid) is session:
+                await self.close_session(sid)
+        
+        session.mark("answer")
+        logger.info("start streaming audio")
+        return web.Response(
+            content_type="application/json",
+            text=json.dumps(
+                {"sdp": description.sdp,
+                 "type": description.type,
+                 "resumeToken": session.resume_token,
+                 "resumed": resumed_agent is not None,
+                 "degraded": profile is not requested}
+            ),
+        )
 
-        self.pc=RTCPeerConnection(        
+    async def negotiate(self, session, params):
+        """Set up the session's peer connection from the client's offer and return the answer"""
+        sid = session.sid
+        pc = RTCPeerConnection(        
             configuration=RTCConfiguration(
-                iceServers=[
-                    RTCIceServer(urls="stun:stun1.l.google:19302"),
-                    RTCIceServer(urls="stun:stun2.l.google:19302")
-                    # RTCIceServer("turn:192.168.1.30:3478?transport=udp", "swarm", "swarm123"),
-                ]
+                iceServers=[RTCIceServer(urls=url) for url in self.config.server.ice_servers]
             ))
-
-        # either "text" or "audio"
-        responseType = params.get("responseType", "text")
+        session.pc = pc
 
         offer = RTCSessionDescription(sdp=params["sdp"], type=params["type"])
 
-        @self.pc.on("connectionstatechange")
+        @pc.on("connectionstatechange")
         async def on_connectionstatechange():
-            logger.info("Connection state change event received")
             # “connected”, “connecting”, “closed”, “failed”, “new”.
-            if self.pc is None:
-                logger.info("Connection state is None")
-                return
-            else:
-                logger.info("Connection state is %s", self.pc.connectionState)
+            logger.info("Connection state for %s is %s", sid, pc.connectionState)
 
-            if self.pc.connectionState == "failed" or self.pc.connectionState == "closed":
-                await self.pc.close()
-                self.pc = None
+            # a failed connection dropped and the client may resume, a closed one hung up
+            if pc.connectionState == "failed" or pc.connectionState == "closed":
+                if self.sessions.get(sid) is session:
+                    await self.close_session(sid, suspend=pc.connectionState == "failed")
 
-        @self.pc.on("iceconnectionstatechange")
+        @pc.on("iceconnectionstatechange")
         async def on_iceconnectionstatechange():
-            logger.info("Ice connection state change event received")
             # “checking”, “completed”, “closed”, “failed”, “new”.
-            if self.pc is None:
-                logger.info("Ice connection state is None")
-                return
-            else:
-                logger.info("Ice connection state is %s", self.pc.iceConnectionState)
-
-            if self.pc.iceConnectionState == "failed" or self.pc.iceConnectionState == "closed":
-                await self.pc.close()
-                self.pc = None
-
-        @self.pc.on("icegatheringstate")
-        async def on_icegatheringstate():
-            logger.info("Ice gathering state change event received")
+            logger.info("Ice connection state for %s is %s", sid, pc.iceConnectionState)
+
+            if pc.iceConnectionState == "failed" or pc.iceConnectionState == "closed":
+                if self.sessions.get(sid) is session:
+                    await self.close_session(sid, suspend=pc.iceConnectionState == "failed")
+
+        @pc.on("icegatheringstatechange")
+        async def on_icegatheringstatechange():
             # “complete”, “gathering”, “new”.
-            if self.pc is None:
-                logger.info("Ice gathering state is None")
-                return
-            else:
-                logger.info("Ice gathering state is %s", self.pc.iceGatheringState)
+            logger.info("Ice gathering state for %s is %s", sid, pc.iceGatheringState)
 
-        @self.pc.on("track")
+        @pc.on("datachannel")
+        def on_datachannel(channel):
+            # opened by clients that take agent messages over WebRTC
+            if channel.label == DATA_CHANNEL_LABEL:
+                session.use_data_channel(channel)
+
+        @pc.on("track")
         async def on_track(track):
-            logger.info("Track %s received", track.kind)
+            logger.info("Track %s received for session %s", track.kind, sid)
             
             if track.kind == "audio":
                 logger.info("Starting audio processing task")
-                asyncio.create_task(self.process_audio_track(track))
-            elif track.kind == "video":
+                session.start_task(session.process_audio_track(track))
+            elif track.kind == "video" and session.profile.video.enabled:
                 logger.info("Starting video processing task")
-                asyncio.create_task(self.process_video_track(track))
+                session.start_task(session.process_video_track(track))
 
         # Create and add agent audio track for sending audio to client
-        self.agent_audio_track = AgentAudioTrack()
-        self.pc.addTrack(self.agent_audio_track)
+        audio = session.profile.audio
+        session.agent_audio_track = AgentAudioTrack(max_buffer_seconds=audio.max_buffer_seconds,
+                                                    metrics=session.metrics, sample_rate=audio.output_rate,
+                                                    frame_duration=audio.frame_duration,
+                                                    target_depth=audio.target_depth, max_depth=audio.max_depth)
+        pc.addTrack(session.agent_audio_track)
         logger.info("Added agent audio track to peer connection")
 
         # handle offer
-        await self.pc.setRemoteDescription(offer)
-        logger.info("Offer set %s", offer.sdp)
+        await pc.setRemoteDescription(offer)
+        logger.debug("Offer set %s", offer.sdp)
+
+        if not session.profile.video.enabled:
+            # audio only, a degraded session: answered inactive, the video is neither sent nor decoded
+            for transceiver in pc.getTransceivers():
+                if transceiver.kind == "video":
+                    transceiver.direction = "inactive"
         
         # send answer
-        answer = await self.pc.createAnswer()
-        logger.info("Answer created %s", answer.sdp)
+        answer = await pc.createAnswer()
+        logger.debug("Answer created %s", answer.sdp)
 
-        await self.pc.setLocalDescription(answer)
-        logger.info("local description =%s", self.pc.localDescription.sdp)
-        
-        # Initialize GeminiAgent for this session
-        from agent.agent import GeminiAgent
-        self.gemini_agent = GeminiAgent(
-            self.sio, 
-            self.sid, 
-            self, 
-            responseType
-        )
-        
-        # Start the GeminiAgent
-        await self.gemini_agent.start()
-        logger.info("GeminiAgent initialized and started for session %s", self.sid)
+        await pc.setLocalDescription(answer)
+        logger.debug("local description =%s", pc.localDescription.sdp)
+        return pc.localDescription
 
-        logger.info("start streaming audio")
-        return web.Response(
-            content_type="application/json",
-            text=json.dumps(
-                {"sdp": self.pc.localDescription.sdp, 
-                 "type": self.pc.localDescription.type}
-            ),
-        )
-
-    async def send_audio_to_client(self, audio_data):
-        """
-        Send audio data from Gemini agent to the client via WebRTC
-        """
-        if self.agent_audio_track:
-            await self.agent_audio_track.add_audio_data(audio_data)
-        else:
-            logger.warning("No agent audio track available to send audio")
-
-    async def process_audio_track(self, track):
-        """Process incoming audio track and send to GeminiAgent"""
-        logger.info("Processing audio track")
-        
+    async def start_agent(self, session):
+        """Start the session's GeminiAgent alongside WebRTC negotiation"""
+        gemini_agent = session.gemini_agent
         try:
-            while True:
-                frame = await track.recv()
-                if frame is None:
-                    break
-
-                mono_frames = self.resampler.resample(frame)
-                
-                # Push to GeminiAgent's live request queue
-                if self.gemini_agent and self.gemini_agent.live_request_queue:
-                    audio_data = mono_frames[0].to_ndarray().tobytes()
-                    self.gemini_agent.live_request_queue.send_realtime(Blob(data=audio_data, mime_type="audio/pcm"))
-                    logger.debug(f"Pushed audio frame to queue: {len(audio_data)} bytes")
-                
+            await gemini_agent.start()
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.error(f"Error processing audio track: {e}")
-
-    async def process_video_track(self, track):
-        """Process incoming video track and send to GeminiAgent"""
-        logger.info("Processing video track")
-        
+            logger.error(f"Error starting GeminiAgent for session {session.sid}: {e}")
+            if self.sessions.get(session.sid) is session:
+                await self.close_session(session.sid)
+            return
+        if session.closed:
+            # the client went away while the agent was starting
+            await gemini_agent.close()
+            return
+        session.agent_ready = True
+        session.mark("agent_started")
+        logger.info("GeminiAgent initialized and started for session %s, %d active", session.sid, len(self.sessions))
+
+    async def resume_agent(self, session):
+        """Reattach a parked GeminiAgent to the session of the client that resumed"""
+        gemini_agent = session.gemini_agent
+        # the client may come back asking for another modality or profile
+        gemini_agent.attach(self.sio, session.sid, session, session.responseType, session.profile.queues)
         try:
-            while True:
-                frame = await track.recv()
-                if frame is None:
-                    break
-                
-                # Convert video frame to image data (JPEG format)
-                pil_image = frame.to_image()
-                import io
-                img_buffer = io.BytesIO()
-                pil_image.save(img_buffer, format='JPEG')
-                image_data = img_buffer.getvalue()
-                
-                # Push to GeminiAgent's live request queue
-                if self.gemini_agent and self.gemini_agent.live_request_queue:
-                    self.gemini_agent.live_request_queue.send_realtime(Blob(data=image_data, mime_type="image/jpeg"))
-                    logger.debug(f"Pushed video frame to queue: {len(image_data)} bytes")
-
+            await gemini_agent.resume()
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
-            logger.error(f"Error processing video track: {e}")
+            logger.error(f"Error resuming GeminiAgent for session {session.sid}: {e}")
+            if self.sessions.get(session.sid) is session:
+                await self.close_session(session.sid)
+            return
+        session.agent_ready = True
+        session.mark("agent_resumed")
+        logger.info("GeminiAgent resumed for session %s, %d active", session.sid, len(self.sessions))
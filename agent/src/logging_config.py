@@ -0,0 +1,105 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import time
+
+log_format = "%(asctime)s::%(levelname)s::%(name)s::"\
+             "%(filename)s::%(lineno)d::%(message)s"
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the session id when a record has one"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        session = getattr(record, "session", None)
+        if session is not None:
+            entry["session"] = session
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+def setup_logging(level=logging.INFO, json_output=False, stream=None):
+    """
+    Route all logging through a queue so the event loop never blocks on log
+    I/O. The message, its args and any traceback are still rendered on the
+    calling thread by QueueHandler.prepare(), so it shows the values as they
+    were when logged; the formatter (timestamp, layout, JSON) and the write
+    run on a background listener thread. Returns the listener, which is
+    stopped at exit.
+    """
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter() if json_output else logging.Formatter(log_format))
+
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+
+    def stop():
+        # flush what is queued, unless the listener was already stopped
+        if getattr(listener, "_thread", None) is not None:
+            listener.stop()
+    atexit.register(stop)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(level)
+    return listener
+
+class SampledLogger:
+    """
+    Rate limited logging for per-frame and per-event messages of a session.
+
+    At most one message per interval is logged, carrying the number of
+    messages suppressed since the last one. Nothing is formatted when the
+    level is disabled or the message is suppressed.
+    """
+
+    def __init__(self, logger, session=None, interval=5.0):
+        self.logger = logger
+        self.extra = {"session": session}
+        self.interval = interval
+        self.last = float("-inf")
+        self.suppressed = 0
+
+    def log(self, level, msg, *args):
+        if not self.logger.isEnabledFor(level):
+            return
+        now = time.monotonic()
+        if now - self.last < self.interval:
+            self.suppressed += 1
+            return
+        self.last = now
+        if self.suppressed:
+            msg += " (%d similar suppressed)"
+            args += (self.suppressed,)
+            self.suppressed = 0
+        self.logger.log(level, msg, *args, extra=self.extra)
+
+    def debug(self, msg, *args):
+        self.log(logging.DEBUG, msg, *args)
+
+    def info(self, msg, *args):
+        self.log(logging.INFO, msg, *args)
@@ -12,15 +12,27 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+# first, so the startup profile covers the imports below
+from startup import StartupProfile
+
+import argparse
 import asyncio
+import os
+import signal
+import sys
 import socketio
 from aiohttp import web
 import aiohttp_cors
 import logging
 
-log_format = "%(asctime)s::%(levelname)s::%(name)s::"\
-             "%(filename)s::%(lineno)d::%(message)s"
-logging.basicConfig(level=logging.INFO, format=log_format)
+from logging_config import setup_logging
+from runtime_config import ConfigError, load_config
+
+# logs go through a queue to a background writer, LOG_FORMAT=json for JSON lines
+setup_logging(
+    level=os.environ.get("LOG_LEVEL", "INFO").upper(),
+    json_output=os.environ.get("LOG_FORMAT", "text") == "json"
+)
 logger = logging.getLogger(__name__)
 
 # Initialize Socket.IO server with CORS enabled for all origins
@@ -45,26 +57,128 @@ cors = aiohttp_cors.setup(app, defaults={
     )
 })
 
-async def init():
+async def init(host="0.0.0.0", port=8080):
     runner = web.AppRunner(app)
     await runner.setup()
 
-    port = 8080
     logger.info("starting server on port %s",port)
-    site = web.TCPSite(runner, host="0.0.0.0", port=port, ssl_context=None)
+    site = web.TCPSite(runner, host=host, port=port, ssl_context=None)
     await site.start()
 
-if __name__ == "__main__":
+def parse_args(argv=None):
+    # unset options are taken from the config
+    parser = argparse.ArgumentParser(description="Live agent server")
+    parser.add_argument("--config", default=os.environ.get("LIVE_CONFIG"),
+                        help="TOML or JSON config file, see runtime_config.py")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--workers", type=int,
+                        help="worker processes behind a sticky router, 0 for one per core")
+    parser.add_argument("--drain-timeout", type=float,
+                        help="seconds a stopping worker waits for live calls to end")
+    # set by the supervisor for the processes it starts
+    parser.add_argument("--worker-id", type=int, default=None, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def run(args, agentPool=None, worker_command=None):
+    """
+    Serve until stopped. agentPool and worker_command let benchmarks run the
+    server with a scripted live agent, in this process and in its workers.
+    """
+    configPath = getattr(args, "config", None)
+    config = load_config(configPath)
+    # command line options win over the config
+    for name in ("host", "port", "workers", "drain_timeout"):
+        if getattr(args, name, None) is not None:
+            setattr(config.server, name, getattr(args, name))
+    server = config.server
+    workers = server.workers or os.cpu_count()
+    if server.socketio_serializer == "msgpack":
+        try:
+            from socketio.msgpack_packet import MsgPackPacket
+        except ImportError:
+            raise ConfigError("socketio_serializer = \"msgpack\" needs the msgpack package") from None
+        sio.packet_class = MsgPackPacket
+
+    if workers > 1 and args.worker_id is None:
+        from supervisor import Supervisor
+        logger.info("starting %d live agent workers...", workers)
+        if worker_command is None and configPath:
+            worker_command = [sys.executable, os.path.abspath(__file__), "--config", configPath]
+        Supervisor(workers, port=server.port, host=server.host, drain_timeout=server.drain_timeout,
+                   command=worker_command).run()
+        return
+
     logger.info("starting live agent...")
+    startupProfile = StartupProfile()
 
+    # light endpoints only, the media stack and the ADK load in the background
     import endpoints
-    webrtcEndpoint = endpoints.WebRTCEndpoint(app, cors, sio)
-    socketEndpoint = endpoints.SocketEndpoint(sio, webrtcEndpoint)  # Pass webrtc_endpoint
+
+    # process and per session metrics, served on /metrics
+    metrics = endpoints.MetricsRegistry()
+    loopLagMonitor = endpoints.LoopLagMonitor(metrics.process)
+    endpoints.MetricsEndpoint(app, cors, metrics)
+    # /healthz and /ready, and /offer answering 503 until the server is ready
+    healthEndpoint = endpoints.HealthEndpoint(app, cors, startupProfile)
+    healthEndpoint.defer("POST", "/offer")
+
+    if args.worker_id is not None:
+        # sids carry the worker id so the supervisor can route by them
+        from supervisor import install_worker_sids
+        install_worker_sids(sio, args.worker_id)
+
+    loaded = {}
+
+    async def load():
+        # imports on a thread, the loop keeps answering probes
+        await loop.run_in_executor(None, startupProfile.preload)
+        from agent.agent import AgentRegistry
+
+        # one runner per configured agent, with agent sessions created ahead of time
+        if agentPool:
+            # a given pool stands in for every agent
+            agents = AgentRegistry({name: agentPool for name in config.agents})
+        else:
+            agents = AgentRegistry.from_config(config.agents, server.agent_pool_size)
+        webrtcEndpoint = endpoints.WebRTCEndpoint(app, cors, sio, agents, metrics, config, routes=False,
+                                                  loop_lag=loopLagMonitor)
+        endpoints.SocketEndpoint(sio, webrtcEndpoint)  # Pass webrtc_endpoint
+        await agents.start()
+        startupProfile.mark("agents_started")
+
+        loaded["webrtc"] = webrtcEndpoint
+        healthEndpoint.serve("/offer", webrtcEndpoint.offer)
+        healthEndpoint.set_ready()
+        for name, seconds in startupProfile.phases.items():
+            metrics.process.set(f"startup_{name}_seconds", seconds)
 
     async def startup():
-        await init()
+        loopLagMonitor.start()
+        await init(server.host, server.port)
+        startupProfile.mark("bound")
+        loop.create_task(load()).add_done_callback(loaded_or_exit)
+
+    def loaded_or_exit(task):
+        if not task.cancelled() and task.exception():
+            # not ready ever, exit so the worker or container is restarted
+            logger.error("Startup failed: %r", task.exception())
+            loaded["failed"] = True
+            loop.stop()
+
+    async def drain():
+        # finish live calls before exiting, new offers get a 503
+        if "webrtc" in loaded:
+            await loaded["webrtc"].drain(server.drain_timeout)
+        loop.stop()
 
     loop=asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
+    loop.add_signal_handler(signal.SIGTERM, lambda: asyncio.ensure_future(drain()))
     loop.run_until_complete(startup())
     loop.run_forever()
+    if loaded.get("failed"):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,284 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Typed runtime configuration, loaded once at startup from a TOML or JSON
+file (--config or LIVE_CONFIG) with environment overrides on top.
+
+Server settings apply to the process. Agents and profiles are named; a
+client picks a profile with the "profile" param of /offer, and every
+profile starts from the "default" profile and overrides what it sets.
+
+Any setting can be overridden as LIVE_<PATH> with "__" between the parts
+of its path, e.g. LIVE_SERVER__PORT=9090 or
+LIVE_PROFILES__DEFAULT__VIDEO__FPS=2. Variables whose first part is not a
+section of the config are left alone. The older PORT, WORKERS, RESUME_TTL,
+MAX_RESUMABLE and VIDEO_MOSAIC variables still work.
+"""
+
+import copy
+import json
+import os
+import re
+import tomllib
+import typing
+from dataclasses import dataclass, field, fields, is_dataclass
+
+ENV_PREFIX = "LIVE_"
+
+# older environment variables and the settings they set
+ENV_ALIASES = {
+    "PORT": ("server", "port"),
+    "WORKERS": ("server", "workers"),
+    "RESUME_TTL": ("server", "resume_ttl"),
+    "MAX_RESUMABLE": ("server", "max_resumable"),
+    "VIDEO_MOSAIC": ("profiles", "default", "video", "mosaic"),
+}
+
+class ConfigError(ValueError):
+    """A configuration file, variable or profile that is not valid"""
+
+@dataclass
+class AgentConfig:
+    """An agent definition, what the ADK Agent is built from"""
+    name: str = "google_search_agent"
+    model: str = "gemini-2.0-flash-exp"
+    description: str = "Agent to answer questions."
+    instruction: str = "Answer the users questions."
+
+@dataclass
+class AudioConfig:
+    """Agent audio played out to the client, and the user audio gate"""
+    # PCM rate of the model's audio
+    output_rate: int = 24000
+    frame_duration: float = 0.02
+    # jitter buffer depth the playout aims for and the most it lets build up
+    target_depth: float = 0.04
+    max_depth: float = 0.2
+    max_buffer_seconds: float = 30.0
+    # default for the "vad" param of /offer
+    vad: bool = False
+
+@dataclass
+class VideoConfig:
+    """Sampling and encoding of the client's video"""
+    # False to answer the client's video inactive, so none is received or decoded
+    enabled: bool = True
+    fps: float = 1.0
+    max_size: int = 768
+    qscale: int = 8
+    change_threshold: float = 4.0
+    # "COLUMNSxROWS" to send frames as tiles of one image, "" for none
+    mosaic: str = ""
+
+@dataclass
+class QueueConfig:
+    """Depths of the live request queue and the Socket.IO emitter"""
+    video_frames: int = 2
+    audio_bytes: int = 96000
+    control: int = 16
+    emit_window: float = 0.03
+    emit_max_backlog: int = 8
+    emit_max_pending: int = 16384
+    # seconds a slow client may stay behind before its held text is dropped
+    emit_max_wait: float = 0.5
+    # "json" for messages as JSON strings, what the app parses today, "object"
+    # for dicts encoded by the Socket.IO serializer (with msgpack, binary)
+    emit_payload: str = "json"
+
+@dataclass
+class Profile:
+    """Per session settings, picked by a client in /offer"""
+    agent: str = "default"
+    audio: AudioConfig = field(default_factory=AudioConfig)
+    video: VideoConfig = field(default_factory=VideoConfig)
+    queues: QueueConfig = field(default_factory=QueueConfig)
+    # record sessions of this profile, when recorder.directory is set
+    record: bool = False
+
+@dataclass
+class RecorderConfig:
+    """Session recordings for QA, see endpoints/recorder.py"""
+    # recordings go in a directory per session under this one, "" for none
+    directory: str = ""
+    # per stream buffer size and how many a stream has before it drops
+    buffer_bytes: int = 524288
+    buffers: int = 2
+    # seconds between writes of partly filled buffers
+    flush_interval: float = 1.0
+
+@dataclass
+class ServerConfig:
+    host: str = "0.0.0.0"
+    port: int = 8080
+    # worker processes behind a sticky router, 0 for one per core
+    workers: int = 1
+    drain_timeout: float = 600.0
+    # media executor threads, 0 for one per core up to 8
+    executor_workers: int = 0
+    # agent sessions created ahead of time, per agent
+    agent_pool_size: int = 4
+    resume_ttl: float = 30.0
+    max_resumable: int = 100
+    # "default" for JSON Socket.IO packets, "msgpack" for binary ones (needs the
+    # msgpack package and a msgpack parser in the clients)
+    socketio_serializer: str = "default"
+    ice_servers: list[str] = field(default_factory=lambda: [
+        "stun:stun1.l.google:19302",
+        "stun:stun2.l.google:19302",
+    ])
+
+@dataclass
+class AdmissionConfig:
+    """When /offer admits, degrades, queues or turns away, see endpoints/admission.py"""
+    # False to admit every offer with the profile it asks for
+    enabled: bool = True
+    # live sessions at which new ones are degraded, and at which they wait, 0 for no limit
+    degrade_sessions: int = 0
+    max_sessions: int = 0
+    # event loop lag, the worst of the last second, at which the same happens
+    degrade_loop_lag: float = 0.05
+    max_loop_lag: float = 0.2
+    # mean run time of a media job (JPEG encoding), the same
+    degrade_media_seconds: float = 0.1
+    max_media_seconds: float = 0.5
+    # how long an offer may wait for room and how many may wait
+    queue_timeout: float = 3.0
+    queue_size: int = 8
+    # Retry-After of offers turned away, in seconds
+    retry_after: int = 2
+    # profile of degraded sessions, "" for the asked for one without video
+    degraded_profile: str = ""
+
+@dataclass
+class Config:
+    server: ServerConfig = field(default_factory=ServerConfig)
+    recorder: RecorderConfig = field(default_factory=RecorderConfig)
+    admission: AdmissionConfig = field(default_factory=AdmissionConfig)
+    agents: dict[str, AgentConfig] = field(default_factory=lambda: {"default": AgentConfig()})
+    profiles: dict[str, Profile] = field(default_factory=lambda: {"default": Profile()})
+
+    def profile(self, name=None):
+        """The named profile, the default one for None"""
+        try:
+            return self.profiles[name or "default"]
+        except KeyError:
+            raise ConfigError(f"unknown profile {name!r}") from None
+
+# top level sections of the config, the only LIVE_ variables read as settings
+SECTIONS = {f.name for f in fields(Config)}
+
+def load_config(path=None, environ=None):
+    """Read the config file, if any, apply environment overrides and check the result"""
+    environ = os.environ if environ is None else environ
+    path = path or environ.get("LIVE_CONFIG")
+    data = read_file(path) if path else {}
+
+    for name, value in environ.items():
+        if name in ENV_ALIASES:
+            set_path(data, ENV_ALIASES[name], value)
+        elif name.startswith(ENV_PREFIX):
+            path = name[len(ENV_PREFIX):].lower().split("__")
+            # other LIVE_ variables (LIVE_CONFIG, LIVE_RELOAD, ...) are not settings
+            if path[0] in SECTIONS:
+                set_path(data, path, value)
+
+    # every agent and profile starts from the defaults, profiles from the default profile
+    agents = data.get("agents") or {}
+    profiles = data.get("profiles") or {}
+    for section in (agents, profiles):
+        if not isinstance(section, dict) or not all(isinstance(v, dict) for v in section.values()):
+            raise ConfigError("agents and profiles must be tables of settings")
+    agents.setdefault("default", {})
+    default = profiles.setdefault("default", {})
+    data["agents"] = agents
+    data["profiles"] = {name: merge(default, profile) for name, profile in profiles.items()}
+
+    config = build(Config, data, "config")
+    check(config)
+    return config
+
+def read_file(path):
+    try:
+        with open(path, "rb") as f:
+            if path.endswith(".json"):
+                return json.load(f)
+            return tomllib.load(f)
+    except (OSError, ValueError) as e:
+        raise ConfigError(f"cannot read config {path}: {e}") from e
+
+def set_path(data, path, value):
+    for key in path[:-1]:
+        data = data.setdefault(key, {})
+    data[path[-1]] = value
+
+def merge(base, override):
+    """base with the settings of override on top, recursively"""
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def build(tp, value, where):
+    """Convert parsed or environment values to the type of a setting"""
+    origin = typing.get_origin(tp)
+    if is_dataclass(tp):
+        if not isinstance(value, dict):
+            raise ConfigError(f"{where} must be a table of settings")
+        types = typing.get_type_hints(tp)
+        names = {f.name for f in fields(tp)}
+        for key in value:
+            if key not in names:
+                raise ConfigError(f"unknown setting {where}.{key}")
+        return tp(**{key: build(types[key], v, f"{where}.{key}") for key, v in value.items()})
+    if origin is dict:
+        _, item = typing.get_args(tp)
+        return {key: build(item, v, f"{where}.{key}") for key, v in value.items()}
+    if origin is list:
+        if isinstance(value, str):
+            value = [v.strip() for v in value.split(",") if v.strip()]
+        return [str(v) for v in value]
+    if tp is bool:
+        if isinstance(value, str):
+            if value.lower() not in ("1", "true", "yes", "on", "0", "false", "no", "off", ""):
+                raise ConfigError(f"{where} must be true or false, not {value!r}")
+            return value.lower() in ("1", "true", "yes", "on")
+        return bool(value)
+    try:
+        return tp(value)
+    except (TypeError, ValueError):
+        raise ConfigError(f"{where} must be {tp.__name__}, not {value!r}") from None
+
+def check(config):
+    for name, profile in config.profiles.items():
+        if profile.agent not in config.agents:
+            raise ConfigError(f"profile {name} uses unknown agent {profile.agent!r}")
+        if profile.video.mosaic and not re.fullmatch(r"[1-9]\d*x[1-9]\d*", profile.video.mosaic.lower()):
+            raise ConfigError(f"profile {name} has a bad mosaic {profile.video.mosaic!r}, use e.g. 2x2")
+        if profile.audio.frame_duration <= 0 or profile.audio.output_rate <= 0:
+            raise ConfigError(f"profile {name} needs a positive audio frame duration and rate")
+        if profile.queues.emit_payload not in ("json", "object"):
+            raise ConfigError(f"profile {name} has an unknown emit_payload {profile.queues.emit_payload!r}, "
+                              f"use json or object")
+    if config.server.socketio_serializer not in ("default", "msgpack"):
+        raise ConfigError(f"unknown socketio_serializer {config.server.socketio_serializer!r}, "
+                          f"use default or msgpack")
+    degraded = config.admission.degraded_profile
+    if degraded and degraded not in config.profiles:
+        raise ConfigError(f"admission uses unknown degraded profile {degraded!r}")
+    if config.recorder.buffer_bytes <= 0 or config.recorder.buffers <= 0:
+        raise ConfigError("recorder needs a positive buffer_bytes and buffers")
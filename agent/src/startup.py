@@ -0,0 +1,79 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Startup profile of the server. main.py imports this module first, so
+times are from the start of main.py: when the port was bound, how long
+each heavy module took to import, and when the server became ready.
+
+The server binds its port and answers /healthz and /ready before the
+media stack and the ADK are loaded; `preload` imports them on a thread
+meanwhile, and /ready only succeeds once every request path is loaded.
+"""
+
+import importlib
+import logging
+import sys
+import time
+
+# as early as this module can take it
+STARTED = time.perf_counter()
+
+logger = logging.getLogger(__name__)
+
+# what the /offer path and the agents need, in import order; each one is
+# timed with what it imports that the ones before it did not
+PRELOAD = (
+    "numpy",
+    "av",
+    "aiortc",
+    "google.genai",
+    "google.adk.agents",
+    "google.adk.runners",
+    "endpoints.webrtc_endpoint",
+    "agent.agent",
+)
+
+class StartupProfile:
+    """Milestones and import times of one server start, in seconds from STARTED"""
+
+    def __init__(self, start=STARTED):
+        self.start = start
+        self.phases = {}
+        self.imports = {}
+        self.ready = False
+
+    def mark(self, phase):
+        """Record the time of a startup phase"""
+        self.phases[phase] = time.perf_counter() - self.start
+        logger.info("Startup %s after %.0fms", phase, 1000 * self.phases[phase])
+
+    def preload(self, modules=PRELOAD):
+        """Import modules one by one, timing each. Run it on a thread to keep the loop free"""
+        for name in modules:
+            if name in sys.modules:
+                self.imports[name] = 0.0
+                continue
+            start = time.perf_counter()
+            importlib.import_module(name)
+            self.imports[name] = time.perf_counter() - start
+        self.mark("preloaded")
+
+    def report(self):
+        """The profile in milliseconds, as served by /ready"""
+        return {
+            "ready": self.ready,
+            "phases_ms": {name: round(1000 * t, 1) for name, t in self.phases.items()},
+            "imports_ms": {name: round(1000 * t, 1) for name, t in self.imports.items()},
+        }
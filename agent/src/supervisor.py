@@ -0,0 +1,297 @@
+# Copyright 2024-2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from aiohttp import web, WSMsgType
+import aiohttp
+import asyncio
+import itertools
+import json
+import logging
+import os
+import signal
+import sys
+
+logger = logging.getLogger(__name__)
+
+# hop by hop headers that must not be forwarded by the router
+HOP_HEADERS = {"connection", "keep-alive", "proxy-authenticate", "proxy-authorization", "te",
+               "trailer", "transfer-encoding", "upgrade", "content-length", "host"}
+
+######################################################################
+# Worker side: sids that name their worker
+######################################################################
+def worker_of(sid):
+    """Return the worker id encoded in a sid, or None"""
+    if sid and sid.startswith("w") and "." in sid:
+        try:
+            return int(sid[1:sid.index(".")])
+        except ValueError:
+            return None
+    return None
+
+def install_worker_sids(sio, worker_id):
+    """
+    Prefix every Engine.IO and Socket.IO sid generated by this process with
+    the worker id, so the router can send all of a client's requests, its
+    /offer included, to the worker that holds its session without any
+    shared state.
+    """
+    generate_id = sio.eio.generate_id
+    sio.eio.generate_id = lambda: f"w{worker_id}.{generate_id()}"
+
+######################################################################
+# Supervisor: worker processes behind a sticky router
+######################################################################
+class Worker:
+
+    def __init__(self, id, port, process):
+        self.id = id
+        self.port = port
+        self.process = process
+        # draining workers keep their sessions but get no new clients
+        self.draining = False
+        self.retiring = False
+        self.connections = 0
+
+class Supervisor:
+    """
+    Runs N copies of main.py as worker processes and a router in front of
+    them on the public port.
+
+    New Socket.IO connections go to the least loaded worker that is not
+    draining. Everything after that carries a sid naming its worker, either
+    in the Engine.IO query string or as socketId in the /offer body, so it
+    lands on the same worker. WebRTC media flows straight to the worker.
+
+    SIGHUP restarts the workers one at a time: a replacement is started,
+    then the old worker is drained and exits once its calls have ended.
+    SIGTERM and SIGINT drain all workers and exit.
+    """
+
+    def __init__(self, workers, port=8080, host="0.0.0.0", base_port=9000, drain_timeout=600, command=None):
+        self.size = workers
+        # how to start a worker, worker options are appended
+        self.command = command or [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")]
+        self.port = port
+        self.host = host
+        self.base_port = base_port
+        self.drain_timeout = drain_timeout
+        self.workers = {}
+        self.ids = itertools.count()
+        self.client = None
+        self.stopping = False
+        self.app = web.Application()
+        self.app.router.add_route("*", "/{path:.*}", self.route)
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        stopped = loop.create_future()
+        loop.add_signal_handler(signal.SIGHUP, lambda: asyncio.ensure_future(self.rolling_restart()))
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, lambda: asyncio.ensure_future(self.stop(stopped)))
+        loop.run_until_complete(self.start())
+        loop.run_until_complete(stopped)
+
+    async def start(self):
+        self.client = aiohttp.ClientSession(auto_decompress=False)
+        try:
+            spawned = await asyncio.gather(*(self.spawn() for _ in range(self.size)), return_exceptions=True)
+            for result in spawned:
+                if isinstance(result, BaseException):
+                    raise result
+
+            runner = web.AppRunner(self.app)
+            await runner.setup()
+            logger.info("router on port %s for %d workers", self.port, self.size)
+            await web.TCPSite(runner, host=self.host, port=self.port).start()
+        except BaseException:
+            # workers run in their own sessions and would outlive the supervisor
+            await self.kill_all()
+            await self.client.close()
+            raise
+
+    async def kill_all(self):
+        """Kill and reap every worker, for a supervisor that could not start"""
+        self.stopping = True
+        workers = list(self.workers.values())
+        for worker in workers:
+            worker.retiring = True
+            if worker.process.returncode is None:
+                worker.process.kill()
+        await asyncio.gather(*(worker.process.wait() for worker in workers))
+        logger.error("startup failed, killed %d workers", len(workers))
+
+    async def spawn(self):
+        """Start a worker process and wait until it is ready"""
+        id = next(self.ids)
+        port = self.base_port + id % 1000
+        process = await asyncio.create_subprocess_exec(
+            *self.command,
+            "--worker-id", str(id), "--port", str(port), "--host", "127.0.0.1",
+            "--drain-timeout", str(self.drain_timeout),
+            # Ctrl-C reaches only the supervisor, which drains the workers
+            start_new_session=True,
+        )
+        worker = Worker(id, port, process)
+        try:
+            await self.wait_ready(worker)
+        except RuntimeError:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        self.workers[id] = worker
+        asyncio.create_task(self.watch(worker))
+        logger.info("worker %d started on port %d, pid %d", id, port, process.pid)
+        return worker
+
+    async def wait_ready(self, worker, timeout=60):
+        """Wait until the worker's /ready succeeds, its port is bound well before"""
+        deadline = asyncio.get_running_loop().time() + timeout
+        while asyncio.get_running_loop().time() < deadline:
+            if worker.process.returncode is not None:
+                raise RuntimeError(f"worker {worker.id} exited with {worker.process.returncode}")
+            try:
+                async with self.client.get(f"http://127.0.0.1:{worker.port}/ready") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.1)
+        raise RuntimeError(f"worker {worker.id} did not start")
+
+    async def watch(self, worker):
+        """Replace a worker that exits without being asked to"""
+        code = await worker.process.wait()
+        self.workers.pop(worker.id, None)
+        if worker.retiring or self.stopping:
+            logger.info("worker %d exited", worker.id)
+            return
+        logger.error("worker %d exited with %s, restarting", worker.id, code)
+        await self.respawn()
+
+    async def respawn(self, max_delay=60):
+        """Start a replacement worker, retrying with backoff until one is ready"""
+        delay = 1
+        while not self.stopping:
+            try:
+                return await self.spawn()
+            except RuntimeError as e:
+                logger.error("%s, retrying in %ds", e, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, max_delay)
+
+    async def retire(self, worker):
+        """Drain a worker: no new clients, SIGTERM lets it finish its calls"""
+        worker.draining = True
+        worker.retiring = True
+        worker.process.send_signal(signal.SIGTERM)
+        try:
+            await asyncio.wait_for(worker.process.wait(), timeout=self.drain_timeout + 10)
+        except asyncio.TimeoutError:
+            logger.warning("worker %d did not drain in time, killing it", worker.id)
+            worker.process.kill()
+
+    async def rolling_restart(self):
+        logger.info("rolling restart of %d workers", len(self.workers))
+        for worker in list(self.workers.values()):
+            if worker.draining:
+                continue
+            try:
+                await self.spawn()
+            except RuntimeError as e:
+                # the old workers keep serving, a bad build does not take them down
+                logger.error("rolling restart stopped (%s), keeping worker %d and those after it", e, worker.id)
+                return
+            asyncio.create_task(self.retire(worker))
+
+    async def stop(self, stopped):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info("stopping, draining %d workers", len(self.workers))
+        await asyncio.gather(*(self.retire(worker) for worker in list(self.workers.values())))
+        await self.client.close()
+        stopped.set_result(None)
+
+    def pick(self):
+        """Least loaded worker that takes new clients"""
+        candidates = [w for w in self.workers.values() if not w.draining]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda w: w.connections)
+
+    async def route(self, request):
+        body = None
+        sid = request.query.get("sid")
+        if request.path == "/offer" and request.method == "POST":
+            body = await request.read()
+            try:
+                sid = json.loads(body).get("socketId")
+            except (ValueError, AttributeError):
+                sid = None
+
+        worker = self.workers.get(worker_of(sid))
+        if worker is None:
+            worker = self.pick()
+        if worker is None:
+            return web.Response(status=503, headers={"Retry-After": "1"}, text="no workers available")
+
+        if request.headers.get("Upgrade", "").lower() == "websocket":
+            return await self.proxy_websocket(request, worker)
+        return await self.proxy_http(request, worker, body)
+
+    async def proxy_http(self, request, worker, body=None):
+        url = f"http://127.0.0.1:{worker.port}{request.rel_url}"
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in HOP_HEADERS}
+        if body is None:
+            body = await request.read()
+        async with self.client.request(request.method, url, headers=headers, data=body) as response:
+            payload = await response.read()
+            headers = {k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS}
+            return web.Response(status=response.status, headers=headers, body=payload)
+
+    async def proxy_websocket(self, request, worker):
+        url = f"ws://127.0.0.1:{worker.port}{request.rel_url}"
+        headers = {k: v for k, v in request.headers.items()
+                   if k.lower() not in HOP_HEADERS and not k.lower().startswith("sec-websocket")}
+        client_ws = web.WebSocketResponse(autoping=False)
+        await client_ws.prepare(request)
+
+        worker.connections += 1
+        try:
+            async with self.client.ws_connect(url, headers=headers, autoping=False) as worker_ws:
+                await asyncio.gather(self.pump(client_ws, worker_ws), self.pump(worker_ws, client_ws))
+        except aiohttp.ClientError as e:
+            logger.warning("websocket to worker %d failed: %s", worker.id, e)
+        finally:
+            worker.connections -= 1
+            await client_ws.close()
+        return client_ws
+
+    @staticmethod
+    async def pump(source, target):
+        async for msg in source:
+            if target.closed:
+                break
+            if msg.type == WSMsgType.TEXT:
+                await target.send_str(msg.data)
+            elif msg.type == WSMsgType.BINARY:
+                await target.send_bytes(msg.data)
+            elif msg.type == WSMsgType.PING:
+                await target.ping(msg.data)
+            elif msg.type == WSMsgType.PONG:
+                await target.pong(msg.data)
+        await target.close()
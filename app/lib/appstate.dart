@@ -31,6 +31,7 @@ class AppState extends ChangeNotifier {
 
   // Response type
   String _responseType = 'text';
+  String? _resumeToken; // lets a new call pick up the agent of the last one
 
   bool get isConnected => _isConnected;
   String get connectionType => _connectionType;
@@ -82,10 +83,14 @@ class AppState extends ChangeNotifier {
 
     _webrtcClient = WebRTCClient(
       username: 'user_${DateTime.now().millisecondsSinceEpoch}',
-      socketId: 'socket_${DateTime.now().millisecondsSinceEpoch}',
+      socketId: _socketClient?.socket?.id ??
+          'socket_${DateTime.now().millisecondsSinceEpoch}',
       callStatus: _onCallStatusChanged,
       responseType: _responseType,
       onLocalStream: _onLocalStream,
+      resumeToken: _resumeToken,
+      onResumeToken: (token) => _resumeToken = token,
+      onAgentMessage: _onAgentMessage,
     );
 
     await _webrtcClient!.makeCall();
@@ -99,10 +104,14 @@ class AppState extends ChangeNotifier {
 
     _webrtcClient = WebRTCClient(
       username: 'user_${DateTime.now().millisecondsSinceEpoch}',
-      socketId: 'socket_${DateTime.now().millisecondsSinceEpoch}',
+      socketId: _socketClient?.socket?.id ??
+          'socket_${DateTime.now().millisecondsSinceEpoch}',
       callStatus: _onCallStatusChanged,
       responseType: _responseType,
       onLocalStream: _onLocalStream,
+      resumeToken: _resumeToken,
+      onResumeToken: (token) => _resumeToken = token,
+      onAgentMessage: _onAgentMessage,
     );
 
     await _webrtcClient!.makeVideoCall();
@@ -145,12 +154,28 @@ class AppState extends ChangeNotifier {
 
   void _onSocketDataReceived(Map<String, dynamic> data) {
     print('Received data: $data');
+
+    // Agent messages sent as objects rather than JSON strings
+    if (data.containsKey('mime_type') ||
+        data.containsKey('turn_complete') ||
+        data.containsKey('interrupted')) {
+      _handleAgentMessage(data);
+      notifyListeners();
+      return;
+    }
+
     String message = 'Data received: ${data.toString()}';
     _lastMessage = message;
     _messages.add(message);
     notifyListeners();
   }
 
+  // agent messages from the call's data channel
+  void _onAgentMessage(Map<String, dynamic> messageData) {
+    _handleAgentMessage(messageData);
+    notifyListeners();
+  }
+
   void _handleAgentMessage(Map<String, dynamic> messageData) {
     // Check if this is a turn completion message
     if (messageData.containsKey('turn_complete') ||
@@ -10,13 +10,20 @@
 // limitations under the License.
 import 'dart:async';
 import 'dart:convert';
+import 'dart:typed_data';
 import 'package:flutter/foundation.dart';
 import 'package:flutter_webrtc/flutter_webrtc.dart';
 import 'package:http/http.dart' as http;
 import 'package:app/utils/constants.dart' as constants;
 
+// kinds of the binary frames on the agent data channel, control kinds are flags
+const int _frameText = 0x01;
+const int _frameTurnComplete = 0x02;
+const int _frameInterrupted = 0x04;
+
 class WebRTCClient {
   RTCPeerConnection? _peerConnection;
+  RTCDataChannel? _dataChannel; // agent text and control, Socket.IO without it
   MediaStream? _remoteStream;
   MediaStream? _localStream;
   final ValueNotifier<RTCVideoRenderer?> remoteRendererNotifier = ValueNotifier(
@@ -62,6 +69,14 @@ class WebRTCClient {
   String username;
   String socketId; // the socket id of the user
   String responseType; // 'text' or 'audio'
+  String? resumeToken; // resumes the agent of an earlier call, if still there
+
+  // called with the token to resume this call's agent after a reconnect
+  Function(String token)? onResumeToken;
+
+  // called with agent messages from the data channel, in the form they
+  // have over Socket.IO plus the agent audio position they line up with
+  Function(Map<String, dynamic> message)? onAgentMessage;
 
   // widget callbacks
   Function(bool status) callStatus;
@@ -73,6 +88,9 @@ class WebRTCClient {
     required this.callStatus,
     required this.responseType,
     required this.onLocalStream,
+    this.resumeToken,
+    this.onResumeToken,
+    this.onAgentMessage,
   }) {
     remoteRendererNotifier.value = RTCVideoRenderer();
     remoteRendererNotifier.value?.initialize();
@@ -87,23 +105,37 @@ class WebRTCClient {
         .then((_) async {
           var des = await _peerConnection!.getLocalDescription();
           var headers = {'Content-Type': 'application/json'};
-          var request = http.Request(
-            'POST',
-            Uri.parse(constants.ApiPath.OFFER_URL),
-          );
-          request.body = json.encode({
+          var body = json.encode({
             "sdp": des!.sdp,
             "type": des.type,
             "username": username,
             "socketId": socketId,
             "responseType": responseType,
+            if (resumeToken != null) "resumeToken": resumeToken,
           });
 
+          Future<http.StreamedResponse> sendOffer() {
+            var request = http.Request(
+              'POST',
+              Uri.parse(constants.ApiPath.OFFER_URL),
+            );
+            request.body = body;
+            request.headers.addAll(headers);
+            return request.send();
+          }
+
           print("SENDING OFFER TO SERVER");
-          print(request.body);
+          print(body);
 
-          request.headers.addAll(headers);
-          http.StreamedResponse response = await request.send();
+          http.StreamedResponse response = await sendOffer();
+
+          // a starting, draining or full server asks to retry after a while
+          for (var attempt = 0; response.statusCode == 503 && attempt < 3; attempt++) {
+            var retryAfter = int.tryParse(response.headers['retry-after'] ?? '') ?? 1;
+            print("SERVER BUSY, RETRYING OFFER IN $retryAfter s");
+            await Future.delayed(Duration(seconds: retryAfter));
+            response = await sendOffer();
+          }
 
           print("RESPONSE FROM SERVER");
 
@@ -112,6 +144,10 @@ class WebRTCClient {
             data = await response.stream.bytesToString();
             var dataMap = await json.decode(data);
             print(dataMap);
+            if (dataMap["resumeToken"] != null) {
+              resumeToken = dataMap["resumeToken"];
+              onResumeToken?.call(resumeToken!);
+            }
             await _peerConnection!.setRemoteDescription(
               RTCSessionDescription(dataMap["sdp"], dataMap["type"]),
             );
@@ -187,6 +223,19 @@ class WebRTCClient {
       print("ICE CONNECTION STATE: $state");
     };
 
+    // agent messages over the peer connection, in step with the agent audio
+    if (onAgentMessage != null) {
+      _dataChannel = await _peerConnection!.createDataChannel(
+        'agent',
+        RTCDataChannelInit()..ordered = true,
+      );
+      _dataChannel!.onMessage = (RTCDataChannelMessage message) {
+        if (message.isBinary) {
+          onAgentMessage!(_decodeAgentFrame(message.binary));
+        }
+      };
+    }
+
     try {
       var stream = await navigator.mediaDevices.getUserMedia(mediaConstraints);
       _localStream = stream;
@@ -204,6 +253,24 @@ class WebRTCClient {
     }
   }
 
+  // a 1 byte kind, the 4 byte agent audio pts in samples, then UTF-8 text
+  Map<String, dynamic> _decodeAgentFrame(Uint8List frame) {
+    int kind = frame[0];
+    int audioPts = ByteData.sublistView(frame, 1, 5).getUint32(0);
+    if (kind & _frameText != 0) {
+      return {
+        "mime_type": "text/plain",
+        "data": utf8.decode(frame.sublist(5)),
+        "audio_pts": audioPts,
+      };
+    }
+    return {
+      "turn_complete": kind & _frameTurnComplete != 0,
+      "interrupted": kind & _frameInterrupted != 0,
+      "audio_pts": audioPts,
+    };
+  }
+
   void _setupAudioPlayback() {
     if (_remoteStream != null) {
       print("Setting up audio playback for remote stream");
@@ -251,6 +318,9 @@ class WebRTCClient {
       }
       onLocalStream(null);
 
+      await _dataChannel?.close();
+      _dataChannel = null;
+
       await _peerConnection?.close();
       _peerConnection = null;
     } catch (e) {